@@ -0,0 +1,120 @@
+import math
+import random
+
+
+# Order statistics for the extraction connections.
+#
+# MEDIAN(x) and QUANTILE(x, q) are registered as SQLite aggregates, so a report
+# gets its medians from the same GROUP BY pass as its counts and sums instead of
+# a ROW_NUMBER() / COUNT(*) OVER window query per measure. They pick the order
+# statistics with a selection algorithm (expected linear time) rather than a sort.
+#
+# QUANTILE interpolates linearly between the two closest ranks; QUANTILE(x, 0.5)
+# is MEDIAN(x), which averages the two middle values of an even-sized group just
+# like the window queries did. NULLs are skipped and an empty group gives NULL.
+
+
+def sql_sort_key(value):
+    """ORDER BY key for a value or a tuple of values (NULL < numbers < text < blobs)"""
+    if isinstance(value, tuple):
+        return tuple(sql_sort_key(v) for v in value)
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, value)
+
+
+def sql_number(value):
+    """The number SQLite arithmetic (AVG, +, *) takes a value as"""
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "replace")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def select(values, k):
+    """k-th smallest (0-based) of a list of mutually comparable values (quickselect)"""
+    while True:
+        if len(values) <= 16:
+            return sorted(values)[k]
+        pivot = random.choice(values)
+        lower = [v for v in values if v < pivot]
+        if k < len(lower):
+            values = lower
+            continue
+        equal = sum(1 for v in values if v == pivot)
+        if k < len(lower) + equal:
+            return pivot
+        k -= len(lower) + equal
+        values = [v for v in values if pivot < v]
+
+
+def quantile(values, q):
+    """q-quantile (0 <= q <= 1) of the non-NULL values, in SQL ORDER BY order"""
+    values = [v for v in values if v is not None]
+    if not values or q is None or not 0 <= q <= 1:
+        return None
+
+    numeric = all(isinstance(v, (int, float)) for v in values)
+    keys = values if numeric else [sql_sort_key(v) for v in values]
+
+    position = (len(values) - 1) * q
+    low = math.floor(position)
+    fraction = position - low
+    lower = select(keys, low)
+    lower = lower if numeric else lower[1]
+    if fraction == 0:
+        return float(sql_number(lower))
+    upper = select(keys, low + 1)
+    upper = upper if numeric else upper[1]
+    return (1 - fraction) * sql_number(lower) + fraction * sql_number(upper)
+
+
+def median(values):
+    """Median of the non-NULL values (average of the two middle ones for an even count)"""
+    return quantile(values, 0.5)
+
+
+class Median:
+    """MEDIAN(x) aggregate"""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return median(self.values)
+
+
+class Quantile:
+    """QUANTILE(x, q) aggregate (q is read from the first row of the group)"""
+
+    def __init__(self):
+        self.values = []
+        self.q = None
+
+    def step(self, value, q):
+        if self.q is None:
+            self.q = sql_number(q)
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return quantile(self.values, self.q)
+
+
+def register_aggregates(conn):
+    """Makes MEDIAN() and QUANTILE() available on a connection"""
+    conn.create_aggregate("MEDIAN", 1, Median)
+    conn.create_aggregate("QUANTILE", 2, Quantile)
+    return conn
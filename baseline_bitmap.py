@@ -0,0 +1,326 @@
+import json
+import os
+import sqlite3
+import zlib
+from collections import namedtuple
+
+import baseline_extraction
+from baseline_aggregates import sql_sort_key
+from baseline_extraction import SW_PRESSURE_TYPE_GROUPS, create_connection, database_uri, sidecar_path, write_csv
+from baseline_fusion import sql_percent, sql_round
+
+
+# Water-body bitmap index for the pressure / impact tables.
+#
+# The pressure and impact tables hold one row per water body and pressure (or
+# impact) type, and their reports are COUNT(DISTINCT euSurfaceWaterBodyCode) per
+# type, per group and per country. Here every surface water body of a country and
+# cycle gets a small integer id, and every type value gets the set of water bodies
+# that have it, stored as a bitmap (a Python int, zlib-compressed in the sidecar).
+# Distinct counts, the "number of impacts per body" histogram and cross-tabs
+# between indexes are then unions, intersections and bit counts.
+#
+# Bit 0 stands for the rows without a water body code, which COUNT(DISTINCT)
+# ignores but GROUP BY euSurfaceWaterBodyCode keeps. A body that has the same value
+# on several rows is also in the bitmaps of its 2nd, 3rd... occurrence, so the
+# row-counting reports stay exact.
+
+BitmapIndex = namedtuple("BitmapIndex", "name source code columns where")
+
+SW_PRESSURE_INDEX = BitmapIndex(
+    "sw_pressure", "SOW_SWB_SWB_swSignificantPressureType", "euSurfaceWaterBodyCode",
+    ("swSignificantPressureTypeGroup", "swSignificantPressureType"),
+    """swSignificantPressureType <> 'Unpopulated'
+       AND naturalAWBHMWB <> 'Unpopulated'
+       AND surfaceWaterBodyCategory <> 'Unpopulated'
+       AND swEcologicalStatusOrPotentialValue <> 'Unpopulated'
+       AND swEcologicalStatusOrPotentialValue <> 'inapplicable'
+       AND swChemicalStatusValue <> 'Unpopulated'""")
+
+SW_IMPACT_INDEX = BitmapIndex(
+    "sw_impact", "SOW_SWB_SWB_swSignificantImpactType", "euSurfaceWaterBodyCode",
+    ("swSignificantImpactType",),
+    """surfaceWaterBodyCategory <> 'Unpopulated'
+       AND swSignificantImpactType <> 'Unpopulated'
+       AND swEcologicalStatusOrPotentialValue <> 'Unpopulated'
+       AND swChemicalStatusValue <> 'Unpopulated'""")
+
+# Every impact row, for the number of impacts per water body
+SW_IMPACT_ROWS_INDEX = BitmapIndex(
+    "sw_impact_rows", "SOW_SWB_SWB_swSignificantImpactType", "euSurfaceWaterBodyCode",
+    ("swSignificantImpactType",), "1")
+
+BITMAP_INDEXES = (SW_PRESSURE_INDEX, SW_IMPACT_INDEX, SW_IMPACT_ROWS_INDEX)
+
+NULL_BODY = 1  # bit 0
+
+
+def encode(bitmap):
+    return zlib.compress(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little"))
+
+
+def decode(blob):
+    return int.from_bytes(zlib.decompress(blob), "little")
+
+
+def cardinality(bitmap):
+    """Number of water bodies in a bitmap (rows without a code are not counted, as in COUNT(DISTINCT))"""
+    return bin(bitmap & ~NULL_BODY).count("1")
+
+
+def union(bitmaps):
+    result = 0
+    for bitmap in bitmaps:
+        result |= bitmap
+    return result
+
+
+def build_bitmap_indexes(db_file):
+    """
+    Creates the water body ids and the bitmap indexes in the sidecar database from
+    the rows of db_file (one scan per source table).
+    """
+    conn = sqlite3.connect(database_uri(sidecar_path(db_file)), uri=True)
+    try:
+        conn.execute("ATTACH DATABASE ? AS source", (database_uri(db_file),))
+        conn.execute("DROP TABLE IF EXISTS wb_ids")
+        conn.execute("DROP TABLE IF EXISTS wb_bitmaps")
+        conn.execute("CREATE TABLE wb_ids (countryCode, cYear, code, id INTEGER)")
+        conn.execute("CREATE TABLE wb_bitmaps (bitmap_index TEXT, countryCode, cYear, value TEXT, "
+                     "occurrence INTEGER, bodies BLOB)")
+
+        # Ids are shared by all indexes, so bitmaps of different tables can be combined
+        sources = sorted({(index.source, index.code) for index in BITMAP_INDEXES})
+        codes = " UNION ".join(f"SELECT countryCode, cYear, {code} AS code FROM source.{source}"
+                               for source, code in sources)
+        ids = {}
+        for country, year, code in conn.execute(f"SELECT * FROM ({codes}) WHERE code IS NOT NULL ORDER BY 1, 2, 3"):
+            slice_ids = ids.setdefault((country, year), {})
+            slice_ids[code] = len(slice_ids) + 1
+        conn.executemany("INSERT INTO wb_ids VALUES (?, ?, ?, ?)",
+                         [(country, year, code, i) for (country, year), slice_ids in ids.items()
+                          for code, i in slice_ids.items()])
+
+        for source, code in sources:
+            indexes = [index for index in BITMAP_INDEXES if index.source == source]
+            columns = sorted({column for index in indexes for column in index.columns})
+            filters = ", ".join(f"COALESCE({index.where}, 0)" for index in indexes)
+            bitmaps = {}
+            occurrences = {}
+            for country, year, body, *values in conn.execute(
+                    f"SELECT countryCode, cYear, {code}, {', '.join(columns)}, {filters} FROM source.{source}"):
+                row = dict(zip(columns, values))
+                bit = ids[(country, year)][body] if body is not None else 0
+                for index, selected in zip(indexes, values[len(columns):]):
+                    if not selected:
+                        continue
+                    value = tuple(row[column] for column in index.columns)
+                    key = (index.name, country, year, value, bit)
+                    occurrence = occurrences[key] = occurrences.get(key, 0) + 1
+                    slot = (index.name, country, year, value, occurrence)
+                    bitmaps[slot] = bitmaps.get(slot, 0) | (1 << bit)
+
+            conn.executemany("INSERT INTO wb_bitmaps VALUES (?, ?, ?, ?, ?, ?)",
+                             [(name, country, year, json.dumps(value), occurrence, encode(bitmap))
+                              for (name, country, year, value, occurrence), bitmap in bitmaps.items()])
+            print(f"✅ Bitmap indexes of {source}: {len(bitmaps)} bitmaps")
+
+        conn.execute("CREATE INDEX wb_bitmaps_slice ON wb_bitmaps (bitmap_index, countryCode, cYear)")
+        conn.execute("CREATE INDEX wb_ids_slice ON wb_ids (countryCode, cYear)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def bitmaps_available(conn):
+    """True when the bitmap index has been built in the sidecar attached to conn"""
+    try:
+        return conn.execute("SELECT 1 FROM derived.sqlite_master WHERE type = 'table' AND name = 'wb_bitmaps'"
+                            ).fetchone() is not None
+    except sqlite3.OperationalError:  # no sidecar attached
+        return False
+
+
+def load_slots(conn, index, countryCode, cYear):
+    """{(value, occurrence): bitmap} of one index, country and cycle; value is a tuple of the index columns"""
+    return {(tuple(json.loads(value)), occurrence): decode(bodies)
+            for value, occurrence, bodies in conn.execute(
+                "SELECT value, occurrence, bodies FROM derived.wb_bitmaps "
+                "WHERE bitmap_index = ? AND countryCode = ? AND cYear = ?", (index.name, countryCode, cYear))}
+
+
+def load_bitmaps(conn, index, countryCode, cYear):
+    """{value: bitmap of the water bodies that have it} of one index, country and cycle"""
+    return {value: bitmap for (value, occurrence), bitmap in load_slots(conn, index, countryCode, cYear).items()
+            if occurrence == 1}
+
+
+def indexed_countries(conn, index, countryCode, cYear):
+    """The requested countries that have rows in the index for cYear, in ORDER BY order"""
+    rows = conn.execute(f"""
+        SELECT DISTINCT countryCode FROM derived.wb_bitmaps
+        WHERE bitmap_index = ? AND cYear = ? AND countryCode IN ({','.join('?' * len(countryCode))})
+    """, [index.name, cYear] + list(countryCode))
+    return sorted((country for (country,) in rows), key=sql_sort_key)
+
+
+def at_least(slots, all_bodies, counted, most=4):
+    """
+    Bit-sliced count of the slots whose value passes `counted`: entry k is the bitmap of
+    the bodies in at least k of them (0 <= k <= most). Each body is at most once in a slot.
+    """
+    levels = [all_bodies] + [0] * most
+    for (value, _), bitmap in slots.items():
+        if not counted(value):
+            continue
+        for k in range(most, 0, -1):
+            levels[k] |= levels[k - 1] & bitmap
+    return levels
+
+
+def crosstab(db_file, index_a, index_b, countryCode, cYear):
+    """{(value_a, value_b): number of water bodies having both} for one country and cycle"""
+    conn = create_connection(db_file)
+    if conn is None:
+        return {}
+    try:
+        a = load_bitmaps(conn, index_a, countryCode, cYear)
+        b = load_bitmaps(conn, index_b, countryCode, cYear)
+    finally:
+        conn.close()
+    return {(value_a, value_b): cardinality(bitmap_a & bitmap_b)
+            for value_a, bitmap_a in a.items() for value_b, bitmap_b in b.items() if bitmap_a & bitmap_b}
+
+
+def water_bodies(db_file, bitmap, countryCode, cYear):
+    """The water body codes of a bitmap"""
+    conn = create_connection(db_file)
+    if conn is None:
+        return []
+    try:
+        return [code for code, i in conn.execute(
+            "SELECT code, id FROM derived.wb_ids WHERE countryCode = ? AND cYear = ? ORDER BY id",
+            (countryCode, cYear)) if bitmap >> i & 1]
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Reports
+# ---------------------------------------------------------------------------
+
+
+
+def _percent(part, total):
+    """ROUND(part * 100.0 / NULLIF(total, 0), 0)"""
+    return sql_round(sql_percent(part, total))
+
+
+def swSignificant_Pressure_Type_Table2016_rows(conn, countryCode, cYear):
+    rows = []
+    for country in indexed_countries(conn, SW_PRESSURE_INDEX, countryCode, cYear):
+        bitmaps = load_bitmaps(conn, SW_PRESSURE_INDEX, country, cYear)
+        totals = {}
+        for (group, _), bitmap in bitmaps.items():
+            totals[group] = totals.get(group, 0) | bitmap
+        for (group, kind), bitmap in sorted(bitmaps.items(), key=lambda item: sql_sort_key(item[0])):
+            if group in SW_PRESSURE_TYPE_GROUPS:
+                number = cardinality(bitmap)
+                rows.append([country, group, kind, number, _percent(number, cardinality(totals[group]))])
+    return rows
+
+
+def SignificantImpactType_Table2016_rows(conn, countryCode, cYear):
+    rows = []
+    for country in indexed_countries(conn, SW_IMPACT_INDEX, countryCode, cYear):
+        bitmaps = load_bitmaps(conn, SW_IMPACT_INDEX, country, cYear)
+        total = cardinality(union(bitmaps.values()))
+        for (kind,), bitmap in sorted(bitmaps.items(), key=lambda item: sql_sort_key(item[0])):
+            number = cardinality(bitmap)
+            rows.append([country, kind, number, _percent(number, total)])
+    return rows
+
+
+def swNumber_of_Impacts_by_country_rows(conn, countryCode, cYear):
+    rows = []
+    for country in indexed_countries(conn, SW_IMPACT_ROWS_INDEX, countryCode, cYear):
+        slots = load_slots(conn, SW_IMPACT_ROWS_INDEX, country, cYear)
+        bodies = union(slots.values())
+        levels = at_least(slots, bodies, lambda value: value[0] is not None and value[0] != 'None')
+        # Every body, including the one standing for the rows without a code
+        total = bin(bodies).count("1")
+        row = [country, cYear]
+        for k in range(4):
+            number = bin(levels[k] & ~levels[k + 1]).count("1")
+            row += [number, _percent(number, total)]
+        number = bin(levels[4]).count("1")
+        rows.append(row + [number, _percent(number, total)])
+    return rows
+
+
+BITMAP_REPORTS = {
+    "swSignificant_Pressure_Type_Table2016": (
+        "4.swSignificant_Pressure_Type_Table2016.csv",
+        ['Country', 'Significant Pressure Type Group', 'Significant Pressure Type', 'Number', 'Number(%)'],
+        swSignificant_Pressure_Type_Table2016_rows),
+    "SignificantImpactType_Table2016": (
+        "4.SignificantImpactType_Table2016.csv",
+        ['Country', 'Significant Impact Type', 'Number', 'Number(%)'],
+        SignificantImpactType_Table2016_rows),
+    "swNumber_of_Impacts_by_country": (
+        "NewDash.7.swNumber_of_impacts_by_country_2016.csv",
+        ['Country', 'Year',
+         'Impact 0 - Number', 'Impact 0 - Number (%)',
+         'Impact 1 - Number', 'Impact 1 - Number (%)',
+         'Impact 2 - Number', 'Impact 2 - Number (%)',
+         'Impact 3 - Number', 'Impact 3 - Number (%)',
+         'Impact 4+ - Number', 'Impact 4+ - Number (%)'],
+        swNumber_of_Impacts_by_country_rows),
+}
+
+
+def PressureImpact_reports(db_file, countryCode, cYear, working_directory, reports=None, split_countries=False):
+    """
+    Writes the surface water pressure / impact reports from the bitmap index. Like the
+    shared-scan engines it takes a list of cycles and can split the countries into
+    per-country folders. Without a bitmap index the SQL report functions are run.
+    """
+
+    if not countryCode:
+        print("❌ No country codes provided.")
+        return
+
+    names = [name for name in BITMAP_REPORTS if reports is None or name in reports]
+    per_cycle = isinstance(cYear, (list, tuple))
+    years = list(cYear) if per_cycle else [cYear]
+    targets = {}
+    for country in (countryCode if split_countries else [None]):
+        folder = working_directory if country is None else os.path.join(working_directory, country)
+        for year in years:
+            targets[(country, year)] = os.path.join(folder, str(year)) if per_cycle else folder
+
+    conn = create_connection(db_file)
+    if conn is None:
+        print("❌ Database connection failed.")
+        return
+
+    try:
+        if not bitmaps_available(conn):
+            conn.close()
+            for (country, year), folder in targets.items():
+                os.makedirs(folder, exist_ok=True)
+                for name in names:
+                    getattr(baseline_extraction, name)(db_file, countryCode if country is None else [country],
+                                                       year, folder)
+            return
+
+        for (country, year), folder in targets.items():
+            os.makedirs(folder, exist_ok=True)
+            for name in names:
+                file_name, headers, report_rows = BITMAP_REPORTS[name]
+                rows = report_rows(conn, countryCode if country is None else [country], year)
+                write_csv(os.path.join(folder, file_name), headers, rows)
+    finally:
+        conn.close()
+
+    print(f"✅ {len(names)} pressure/impact reports written from the bitmap index ({len(targets)} output folder(s))")
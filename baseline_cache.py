@@ -0,0 +1,359 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import sqlite3
+import time
+import zlib
+from functools import partial
+from itertools import chain, groupby
+from operator import itemgetter
+
+import baseline_extraction
+
+
+# Query result cache.
+#
+# Re-running a country against an unchanged database used to recompute every
+# aggregate. The worker connections can instead answer a SELECT from an on-disk
+# cache (<database file>.cache.sqlite) keyed by content rather than by time:
+#
+#   sha256(normalised SQL, parameters, fingerprint of every table it reads)
+#
+# The table fingerprints are hashes of the table contents, computed once per
+# database file by a setup step (table_fingerprints in the sidecar). A new or
+# re-indexed database file whose tables did not change therefore keeps its cache
+# entries, and a changed table only invalidates the queries that read it.
+#
+# The cache is capped in size: entries remember when they were last used and the
+# least recently used ones are evicted after every run. Statements on the schema
+# (sqlite_master) or on tables without a fingerprint are never cached.
+#
+# Tables with countryCode and cYear columns are also fingerprinted per (country,
+# cycle) slice (slice_fingerprints). A run records which tables every task read,
+# so after a new database release only the tasks whose own slices changed have
+# to run again (see baseline_manifest). SQLite joins and sorts the rows of every
+# slice itself and they are hashed in that order, so a release that only stores
+# the same rows in another order does not count as a change.
+
+CACHE_VERSION = 2
+DEFAULT_CAPACITY = 512 * 1024 * 1024
+
+# Larger results (the raw row scans of the shared-scan engines) are streamed, not cached
+MAX_CACHED_ROWS = 100000
+# Rows an iterated cursor fetches at a time while its result may still be cached
+ITER_CHUNK = 1024
+
+# Tables of the tool itself, which no report reads and which change on every run
+UNHASHED_TABLES = {"table_fingerprints", "slice_fingerprints", "setup_migrations", "task_runtimes"}
+
+# Rows fetched at a time for the fingerprint hashes
+FINGERPRINT_CHUNK = 1000
+
+READ_STATEMENT = re.compile(r"\s*(SELECT|WITH)\b", re.I)
+IDENTIFIER = re.compile(r"\w+")
+STAGED_TABLE = re.compile(r"\b(?:temp\.)?stage_(\w+)", re.I)
+# String literals are kept as they are, any other run of whitespace becomes one space
+WHITESPACE = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|\s+""")
+
+
+def cache_path(db_file):
+    """Result cache file next to the WISE database, named after its full file name like the sidecar"""
+    return f"{db_file}.cache.sqlite"
+
+
+def normalise_sql(sql):
+    """
+    Statement text the cache key is made of: whitespace collapsed outside string literals and
+    staged TEMP tables named after their source table (they hold a slice of it, and every
+    report keeps its own WHERE clause on top)
+    """
+    sql = WHITESPACE.sub(lambda m: m.group(1) or " ", STAGED_TABLE.sub(r"\1", sql))
+    return sql.strip().rstrip(";").strip()
+
+
+def table_fingerprints(conn, schema, table):
+    """
+    (fingerprint of the table, {(countryCode, cYear): fingerprint of the slice}) from one scan;
+    the slices are only kept for tables with countryCode and cYear columns. A fingerprint is the
+    row count and the sha1 of the rows in sorted order, so it does not depend on the storage
+    order. SQLite joins the columns of every row and sorts the rows; Python only hashes them
+    a chunk at a time.
+    """
+    definition = conn.execute(f"SELECT sql FROM {schema}.sqlite_master WHERE name = ?", (table,)).fetchone()[0]
+    columns = [column[1] for column in conn.execute(f'PRAGMA {schema}.table_info("{table}")')]
+    sliced = {"countrycode", "cyear"} <= {column.lower() for column in columns}
+
+    keys = "countryCode, cYear" if sliced else "NULL, NULL"
+    line = " || x'1f' || ".join(f"ifnull(\"{column}\", x'00')" for column in columns)
+    rows, total, slices = 0, hashlib.sha1(), {}
+    # As bytes: blob columns need not be valid text
+    conn.text_factory = bytes
+    try:
+        cursor = conn.execute(f'SELECT {keys}, {line} FROM {schema}."{table}" ORDER BY 1, 2, 3')
+        for chunk in iter(partial(cursor.fetchmany, FINGERPRINT_CHUNK), []):
+            for (country, cYear), group in groupby(chunk, itemgetter(0, 1)):
+                lines = list(map(itemgetter(2), group))
+                text = b"\x1e".join(lines) + b"\x1e"
+                rows += len(lines)
+                total.update(text)
+                if sliced:
+                    key = tuple(value.decode() if isinstance(value, bytes) else str(value) for value in (country, cYear))
+                    count, digest = slices.setdefault(key, [0, hashlib.sha1()])
+                    slices[key][0] = count + len(lines)
+                    digest.update(text)
+    finally:
+        conn.text_factory = str
+
+    fingerprint = hashlib.sha1(f"{definition}\n{rows}:{total.hexdigest()}".encode()).hexdigest()
+    return fingerprint, {key: f"{count}:{digest.hexdigest()}" for key, (count, digest) in slices.items()}
+
+
+def build_table_fingerprints(db_file):
+    """
+    Creates the table_fingerprints and slice_fingerprints tables in the sidecar: content hashes
+    of every table of db_file (schema main) and of the sidecar itself (schema derived)
+    """
+    conn = sqlite3.connect(baseline_extraction.sidecar_path(db_file))
+    try:
+        conn.execute("ATTACH DATABASE ? AS source", (baseline_extraction.database_uri(db_file, immutable=True),))
+        fingerprints, slices = [], []
+        for schema, label in (("source", "main"), ("main", "derived")):
+            tables = [name for (name,) in conn.execute(
+                f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+            for table in tables:
+                if table in UNHASHED_TABLES:
+                    continue
+                fingerprint, table_slices = table_fingerprints(conn, schema, table)
+                fingerprints.append((label, table, fingerprint))
+                slices += [(label, table, country, cYear, value) for (country, cYear), value in table_slices.items()]
+
+        conn.execute("DROP TABLE IF EXISTS table_fingerprints")
+        conn.execute("DROP TABLE IF EXISTS slice_fingerprints")
+        conn.execute("CREATE TABLE table_fingerprints (schema_name TEXT, name TEXT, fingerprint TEXT, "
+                     "PRIMARY KEY (schema_name, name))")
+        conn.execute("CREATE TABLE slice_fingerprints (schema_name TEXT, name TEXT, countryCode TEXT, cYear TEXT, "
+                     "fingerprint TEXT, PRIMARY KEY (schema_name, name, countryCode, cYear))")
+        conn.executemany("INSERT INTO table_fingerprints VALUES (?, ?, ?)", fingerprints)
+        conn.executemany("INSERT INTO slice_fingerprints VALUES (?, ?, ?, ?, ?)", slices)
+        conn.commit()
+        print(f"✅ {len(fingerprints)} table fingerprints ({len(slices)} country/cycle slices) computed")
+    finally:
+        conn.close()
+
+
+def load_fingerprints(conn):
+    """{(schema, table): fingerprint} from the sidecar attached to conn, or None before the setup step ran"""
+    try:
+        return {(schema, name): fingerprint for schema, name, fingerprint
+                in conn.execute("SELECT schema_name, name, fingerprint FROM derived.table_fingerprints")}
+    except sqlite3.OperationalError:
+        return None
+
+
+def read_fingerprints(db_file):
+    """
+    ({(schema, table): fingerprint}, {(schema, table): {(countryCode, cYear): fingerprint}}) of
+    db_file from its sidecar, or None before the setup step ran
+    """
+    sidecar = baseline_extraction.sidecar_path(db_file)
+    if not os.path.exists(sidecar):
+        return None
+    conn = sqlite3.connect(baseline_extraction.database_uri(sidecar), uri=True)
+    try:
+        tables = {(schema, name): fingerprint for schema, name, fingerprint
+                  in conn.execute("SELECT schema_name, name, fingerprint FROM table_fingerprints")}
+        slices = {}
+        for schema, name, country, cYear, fingerprint in conn.execute(
+                "SELECT schema_name, name, countryCode, cYear, fingerprint FROM slice_fingerprints"):
+            slices.setdefault((schema, name), {})[country, cYear] = fingerprint
+        return tables, slices
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+
+def tables_in(text, fingerprints):
+    """
+    (schema, table) pairs of the fingerprinted tables a normalised statement reads. Every word
+    naming a table counts, so a table is never missed (comma joins, subqueries)
+    """
+    words = {word.lower() for word in IDENTIFIER.findall(text)}
+    return [(schema, table) for schema, table in sorted(fingerprints) if table.lower() in words]
+
+
+class QueryCache:
+    """The result cache of one worker process"""
+
+    def __init__(self, db_file, fingerprints, capacity=DEFAULT_CAPACITY):
+        self.path = cache_path(db_file)
+        self.fingerprints = fingerprints
+        self.capacity = capacity
+        self.conn = connect_cache(self.path)
+
+    def key(self, sql, parameters):
+        """Cache key of a statement, or None when it must not be cached"""
+        if not READ_STATEMENT.match(sql) or re.search(r"\bsqlite_(master|schema)\b", sql, re.I):
+            return None
+        text = normalise_sql(sql)
+        fingerprints = [[schema, table, self.fingerprints[schema, table]] for schema, table in tables_in(text, self.fingerprints)]
+        if not fingerprints:
+            return None
+        payload = json.dumps([CACHE_VERSION, sqlite3.sqlite_version, text, [repr(p) for p in parameters], fingerprints])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """(column names, rows) of a cached result, or None"""
+        row = self.conn.execute("SELECT columns, result FROM query_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE query_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), pickle.loads(zlib.decompress(row[1]))
+
+    def put(self, key, columns, rows):
+        result = zlib.compress(pickle.dumps(rows, protocol=4))
+        if len(result) > self.capacity // 10:
+            return
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO query_cache (key, columns, result, size, last_used, hits) "
+                              "VALUES (?, ?, ?, ?, ?, 0)", (key, json.dumps(columns), result, len(result), time.time()))
+
+
+def connect_cache(path):
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS query_cache (
+            key TEXT PRIMARY KEY,
+            columns TEXT NOT NULL,
+            result BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER NOT NULL
+        )
+    """)
+    conn.commit()
+    return conn
+
+
+class CachingCursor(sqlite3.Cursor):
+    """
+    Cursor of a CachingConnection: a cached SELECT is answered from the cache, any other
+    one runs as usual and its rows are stored once they have all been fetched. The tables
+    every SELECT reads are added to the connection's tables_read, and every statement is
+    counted in its statements and kept as its last_statement (for timeout diagnostics).
+    """
+
+    _served = None
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._served = self._pending = None
+        self.connection.statements += 1
+        self.connection.last_statement = sql
+        fingerprints = getattr(self.connection, "fingerprints", None)
+        if fingerprints and READ_STATEMENT.match(sql):
+            self.connection.tables_read.update(tables_in(normalise_sql(sql), fingerprints))
+        cache = getattr(self.connection, "query_cache", None)
+        key = cache.key(sql, parameters) if cache is not None else None
+        if key is None:
+            return super().execute(sql, parameters)
+
+        hit = cache.get(key)
+        if hit is not None:
+            self._columns, rows = hit
+            self._served = iter(rows)
+            return self
+
+        super().execute(sql, parameters)
+        self._pending = (cache, key, [column[0] for column in super().description or ()], [])
+        return self
+
+    def _collect(self, rows, done):
+        cache, key, columns, buffer = self._pending
+        buffer.extend(rows)
+        if len(buffer) > MAX_CACHED_ROWS:
+            self._pending = None
+        elif done:
+            self._pending = None
+            cache.put(key, columns, buffer)
+
+    @property
+    def description(self):
+        if self._served is not None:
+            return tuple((column, None, None, None, None, None, None) for column in self._columns)
+        return super().description
+
+    def fetchone(self):
+        if self._served is not None:
+            return next(self._served, None)
+        row = super().fetchone()
+        if self._pending is not None:
+            self._collect([] if row is None else [row], row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        if self._served is not None:
+            return [row for _, row in zip(range(size), self._served)]
+        rows = super().fetchmany(size)
+        if self._pending is not None:
+            self._collect(rows, len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        if self._served is not None:
+            return list(self._served)
+        rows = super().fetchall()
+        if self._pending is not None:
+            self._collect(rows, True)
+        return rows
+
+    def __iter__(self):
+        # Iterating must not cost a Python call per row: a result that may still be cached is
+        # fetched in chunks, and once it cannot be (not cacheable, or past MAX_CACHED_ROWS)
+        # the rest is read by the sqlite3 cursor itself
+        if self._served is not None:
+            return self._served
+        return chain.from_iterable(self._chunks())
+
+    def _chunks(self):
+        while self._pending is not None:
+            rows = self.fetchmany(ITER_CHUNK)
+            if not rows:
+                return
+            yield rows
+        yield iter(partial(sqlite3.Cursor.fetchone, self), None)
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+
+def evict(db_file, capacity=DEFAULT_CAPACITY):
+    """Drops the least recently used results until the cache fits in capacity bytes"""
+    path = cache_path(db_file)
+    if not os.path.exists(path):
+        return
+    conn = connect_cache(path)
+    try:
+        kept, evicted = 0, []
+        for key, size in conn.execute("SELECT key, size FROM query_cache ORDER BY last_used DESC"):
+            if kept + size <= capacity:
+                kept += size
+            else:
+                evicted.append((key,))
+        with conn:
+            conn.executemany("DELETE FROM query_cache WHERE key = ?", evicted)
+        entries = conn.execute("SELECT COUNT(*) FROM query_cache").fetchone()[0]
+        if evicted:
+            conn.execute("VACUUM")
+        print(f"🗄️ Query result cache: {entries} results, {kept / 1024 / 1024:.1f} MB"
+              + (f" ({len(evicted)} least recently used evicted)" if evicted else ""))
+    finally:
+        conn.close()
@@ -0,0 +1,119 @@
+import sqlite3
+from collections import namedtuple
+
+from baseline_extraction import create_connection, database_uri, sidecar_path
+
+
+# Status / category aggregate cubes.
+#
+# Most status and category reports are COUNT / SUM(cArea) / SUM(cLength) over a few
+# low-cardinality columns of the water body tables. The cubes below hold those
+# measures for every combination of their dimensions, once per database, in the
+# sidecar. A few hundred cube cells then stand in for the raw rows: the shared-scan
+# engines answer the reports that only need these dimensions from the cube, and
+# drill_down() answers ad-hoc questions in milliseconds.
+#
+# A cube is built from the rows of the WISE database, so its setup step is tied to
+# the database fingerprint and rebuilt whenever the database file changes.
+
+Cube = namedtuple("Cube", "name source dimensions measures")
+
+SW_STATUS_CUBE = Cube(
+    "sw_status_cube", "SOW_SWB_SurfaceWaterBody",
+    ("countryCode", "cYear", "surfaceWaterBodyCategory", "naturalAWBHMWB",
+     "swEcologicalStatusOrPotentialValue", "swChemicalStatusValue"),
+    {"bodies": "COUNT(*)", "codes": "COUNT(euSurfaceWaterBodyCode)",
+     "cLength": "SUM(cLength)", "cArea": "SUM(cArea)"})
+
+GW_STATUS_CUBE = Cube(
+    "gw_status_cube", "SOW_GWB_GroundWaterBody",
+    ("countryCode", "cYear", "gwQuantitativeStatusValue", "gwChemicalStatusValue", "geologicalFormation"),
+    {"bodies": "COUNT(*)", "codes": "COUNT(euGroundWaterBodyCode)", "cArea": "SUM(cArea)"})
+
+# Source table -> cube
+CUBES = {cube.source: cube for cube in (SW_STATUS_CUBE, GW_STATUS_CUBE)}
+
+
+def build_cubes(db_file):
+    """
+    Creates the aggregate cubes in the sidecar database from the rows of db_file.
+    """
+    conn = sqlite3.connect(database_uri(sidecar_path(db_file)), uri=True)
+    try:
+        conn.execute("ATTACH DATABASE ? AS source", (database_uri(db_file),))
+        for cube in CUBES.values():
+            dimensions = ", ".join(cube.dimensions)
+            measures = ", ".join(f"{sql} AS {name}" for name, sql in cube.measures.items())
+            conn.execute(f"DROP TABLE IF EXISTS {cube.name}")
+            conn.execute(f"""
+                CREATE TABLE {cube.name} AS
+                SELECT {dimensions}, {measures}
+                FROM source.{cube.source}
+                GROUP BY {dimensions}
+            """)
+            conn.execute(f"CREATE INDEX {cube.name}_country_year ON {cube.name} (countryCode, cYear)")
+            cells = conn.execute(f"SELECT COUNT(*) FROM {cube.name}").fetchone()[0]
+            print(f"✅ {cube.name}: {cells} cells built from {cube.source}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def cube_available(conn, cube):
+    """True when the cube has been built in the sidecar attached to conn"""
+    try:
+        return conn.execute("SELECT 1 FROM derived.sqlite_master WHERE type = 'table' AND name = ?",
+                            (cube.name,)).fetchone() is not None
+    except sqlite3.OperationalError:  # no sidecar attached
+        return False
+
+
+def serves(cube, accumulator):
+    """
+    True when a shared-scan accumulator can be fed cube cells instead of raw rows: it
+    counts with the `bodies` weight of each row and only reads cube columns.
+    """
+    return (getattr(accumulator, "weighted", False)
+            and set(accumulator.columns) <= set(cube.dimensions) | set(cube.measures))
+
+
+def drill_down(db_file, cube, by=("countryCode",), measures=None, **filters):
+    """
+    Rolls `cube` up to the `by` dimensions and returns one dict per group with the
+    summed measures. Keyword filters fix a dimension to a value (or a tuple of values).
+    Drilling down is adding a dimension to `by`, usually while filtering on the parent:
+
+        drill_down(db, SW_STATUS_CUBE, ["countryCode"], cYear=2016)
+        drill_down(db, SW_STATUS_CUBE, ["surfaceWaterBodyCategory", "swChemicalStatusValue"],
+                   cYear=2016, countryCode="DE")
+    """
+    measures = list(cube.measures) if measures is None else list(measures)
+    unknown = [name for name in list(by) + list(filters) if name not in cube.dimensions]
+    unknown += [name for name in measures if name not in cube.measures]
+    if unknown:
+        raise ValueError(f"{cube.name} has no column(s) {', '.join(unknown)}")
+
+    clauses, params = [], []
+    for dimension, value in filters.items():
+        values = value if isinstance(value, (list, tuple, set)) else (value,)
+        clauses.append(f"{dimension} IN ({','.join('?' * len(values))})")
+        params += list(values)
+
+    columns = list(by) + [f"SUM({name}) AS {name}" for name in measures]
+    query = f"SELECT {', '.join(columns)} FROM derived.{cube.name}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    if by:
+        query += f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}"
+
+    conn = create_connection(db_file)
+    if conn is None:
+        return []
+    try:
+        if not cube_available(conn, cube):
+            raise LookupError(f"{cube.name} has not been built for {db_file}; run the setup steps first")
+        cur = conn.execute(query, params)
+        names = [description[0] for description in cur.description]
+        return [dict(zip(names, row)) for row in cur]
+    finally:
+        conn.close()
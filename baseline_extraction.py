@@ -1,69 +1,387 @@
 import csv
 import os
 import sqlite3
+import time
+import traceback
+from collections import namedtuple
+from pathlib import Path
+
+import baseline_cache
+from baseline_aggregates import register_aggregates
+from baseline_fingerprint import wal_pending
+
+
+# PRAGMAs of the per-worker extraction connections (see open_worker_connection)
+DEFAULT_PRAGMAS = {
+    "mmap_size": 256 * 1024 * 1024,  # bytes of the database file mapped into memory
+    "cache_size": -64 * 1024,        # negative values are KiB: 64 MiB page cache
+    "temp_store": "MEMORY",          # GROUP BY / DISTINCT / ORDER BY temp b-trees stay in RAM
+    "query_only": 1,                 # reports never write
+}
+
+# (db_file, connection) opened by the pool initializer of the current worker process
+_worker_connection = None
+
+# (countries, cycles, shared tables, {table: staged table}) of the run the worker connection serves
+_stage = None
+
+# Time budget of the task the worker is running (see start_time_budget)
+_budget = None
+
+# SQLite VM instructions between two deadline checks of the progress handler
+PROGRESS_OPS = 100_000
+
+
+class SharedConnection(sqlite3.Connection):
+    """A worker connection that survives the conn.close() at the end of every report"""
+
+    def close(self):
+        pass
+
+
+class CachingConnection(SharedConnection):
+    """
+    A worker connection that records the fingerprinted tables its SELECTs read and answers
+    them from the query result cache when it can
+    """
+
+    fingerprints = None
+    query_cache = None
+    statements = 0
+    last_statement = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tables_read = set()
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or baseline_cache.CachingCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+
+def database_uri(db_file, immutable=False):
+    """
+    SQLite URI of the database file. immutable opens it with mode=ro&immutable=1:
+    no locks, no hot-journal or change checks, so only use it once nothing writes the file.
+    A file with commits still in its write-ahead log is never opened immutable, as those
+    commits would not be seen.
+    """
+    uri = Path(os.path.abspath(db_file)).as_uri()
+    return f"{uri}?mode=ro&immutable=1" if immutable and not wal_pending(db_file) else uri
+
+
+def sidecar_path(db_file):
+    """
+    Small SQLite file next to the WISE database that holds the tables this tool derives
+    (swRBD_Europe_data), so the source database itself is never written to. It keeps the
+    full file name (wise.sqlite.derived.sqlite), so wise.sqlite and wise.db get a sidecar each.
+    """
+    return f"{db_file}.derived.sqlite"
+
+
+def attach_sidecar(conn, db_file, immutable=False):
+    """ATTACHes the sidecar database of db_file as schema `derived`, once it has been created"""
+    sidecar = sidecar_path(db_file)
+    if os.path.exists(sidecar):
+        conn.execute("ATTACH DATABASE ? AS derived", (database_uri(sidecar, immutable),))
+
+
+def share_connection(db_file, conn):
+    """Makes create_connection hand out conn for db_file in this process (None stops sharing)"""
+    global _worker_connection
+    _worker_connection = None if conn is None else (db_file, conn)
+
+
+def open_worker_connection(db_file, pragmas=None, immutable=True, stage=None, result_cache=None):
+    """
+    Pool initializer: opens one tuned connection per worker process, which
+    create_connection hands out to every report the worker runs. stage is the
+    (countries, cycles, tables) of the run: staged() may copy the run's slice of
+    those tables to TEMP tables.
+    result_cache is the size cap in bytes of the query result cache (None: no cache).
+    """
+    global _stage
+    _stage = None if stage is None else (set(stage[0]), set(stage[1]), set(stage[2]), {})
+
+    settings = dict(DEFAULT_PRAGMAS)
+    settings.update(pragmas or {})
+
+    conn = sqlite3.connect(database_uri(db_file, immutable), uri=True, check_same_thread=False,
+                           factory=CachingConnection)
+    register_aggregates(conn)
+    attach_sidecar(conn, db_file, immutable)
+    for name, value in settings.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    conn.fingerprints = baseline_cache.load_fingerprints(conn)
+    if result_cache and conn.fingerprints:
+        conn.query_cache = baseline_cache.QueryCache(db_file, conn.fingerprints, result_cache)
+    share_connection(db_file, conn)
+
+
+def pop_tables_read():
+    """The (schema, table) pairs the worker connection has read since the last call"""
+    if _worker_connection is None or not isinstance(_worker_connection[1], CachingConnection):
+        return []
+    conn = _worker_connection[1]
+    tables, conn.tables_read = sorted(conn.tables_read), set()
+    return tables
+
+
+def start_time_budget(seconds):
+    """
+    Gives the task the worker is about to run `seconds` of wall time (None: no limit). Once
+    they are used up, the progress handler of the worker connection interrupts the query
+    that is running and every query after it, so one runaway query cannot hold the worker.
+    Python code between the queries is not interrupted.
+    """
+    global _budget
+    _budget = None
+    if seconds is None or _worker_connection is None:
+        return
+    conn = _worker_connection[1]
+    start = time.monotonic()
+    _budget = {"seconds": seconds, "start": start, "deadline": start + seconds,
+               "statements": conn.statements, "interrupted": None}
+    conn.set_progress_handler(_check_budget, PROGRESS_OPS)
+
+
+def _check_budget():
+    if _budget is None or time.monotonic() < _budget["deadline"]:
+        return 0
+    if _budget["interrupted"] is None:
+        _budget["interrupted"] = _interruption_diagnostics()
+    return 1
+
+
+def _interruption_diagnostics():
+    """Where the task was when its first query was interrupted: report frames, query, progress"""
+    conn = _worker_connection[1]
+    # The frames of the report below the task runner, without the cursor / connection wrappers
+    frames = traceback.extract_stack()[:-2]
+    runner = max((i for i, frame in enumerate(frames) if frame.name == "run_function"), default=-1)
+    frames = [frame for frame in frames[runner + 1:]
+              if os.path.basename(frame.filename) != "baseline_cache.py" and frame.name != "execute"]
+    return {
+        "budget": round(_budget["seconds"], 3),
+        "elapsed": round(time.monotonic() - _budget["start"], 3),
+        "where": " → ".join(f"{frame.name} ({os.path.basename(frame.filename)}:{frame.lineno})" for frame in frames),
+        "query": " ".join((conn.last_statement or "").split())[:300],
+        "queries": conn.statements - _budget["statements"],
+        "tables": [f"{schema}.{table}" for schema, table in sorted(conn.tables_read)],
+    }
+
+
+def out_of_time():
+    """True once the running task has used up its time budget and its queries are being interrupted"""
+    return _budget is not None and _budget["interrupted"] is not None
+
+
+def end_time_budget():
+    """
+    Ends the time budget of the task: None when it finished within it, otherwise the
+    diagnostics taken when its query was interrupted (budget and elapsed seconds, the
+    report frames it was in, the query, how many queries it ran and the tables they read)
+    """
+    global _budget
+    budget, _budget = _budget, None
+    if budget is None:
+        return None
+    _worker_connection[1].set_progress_handler(None, 0)
+    return budget["interrupted"]
+
+
+def staged(db_file, table, countryCode, cYear):
+    """
+    Table a report reads its (countryCode, cYear) rows of `table` from. On a worker
+    connection whose run covers them this is a TEMP copy of the run's slice of the
+    table (every country and cycle of the run), made the first time a report asks
+    for it, so the reports of a run filter the big source table once per worker
+    instead of once per query. The reports keep their own WHERE clauses, which
+    pick their rows out of the slice. Elsewhere, and for the tables the run does
+    not share between tasks, it is the table itself.
+    """
+    if _stage is None or _worker_connection is None or _worker_connection[0] != db_file:
+        return table
+    countries, cYears, shared, tables = _stage
+    if table not in shared or cYear not in cYears or not set(countryCode) <= countries:
+        return table
+
+    if table not in tables:
+        conn = _worker_connection[1]
+        name = f"stage_{table}"
+        query_only = conn.execute("PRAGMA query_only").fetchone()[0]
+        # TEMP tables live in the connection's own temp database; the WISE database stays read-only
+        conn.execute("PRAGMA query_only = 0")
+        try:
+            conn.execute(f"""
+                CREATE TEMP TABLE {name} AS
+                SELECT * FROM main.{table}
+                WHERE cYear IN ({','.join('?' * len(cYears))})
+                  AND countryCode IN ({','.join('?' * len(countries))})
+            """, sorted(cYears) + sorted(countries))
+            conn.execute(f"CREATE INDEX temp.{name}_country_year ON {name} (countryCode, cYear)")
+        except sqlite3.Error as e:
+            if out_of_time():
+                raise  # interrupted: the next task may still stage it
+            print(f"⚠️ Could not stage {table}, reading it directly: {e}")
+            conn.execute(f"DROP TABLE IF EXISTS temp.{name}")
+            name = table
+        finally:
+            conn.execute(f"PRAGMA query_only = {query_only}")
+        tables[table] = name
+    return tables[table]
 
 
 def create_connection(db_file):
     """Creates a read-only database connection"""
+    if _worker_connection is not None and _worker_connection[0] == db_file:
+        return _worker_connection[1]
+
     if not os.path.exists(db_file):
         print(f"❌ Error: Database file '{db_file}' does not exist.")
         return None
     
     try:
-        conn = sqlite3.connect(f"file:{db_file}", uri=True, check_same_thread=False)
+        conn = sqlite3.connect(database_uri(db_file), uri=True, check_same_thread=False)
+        register_aggregates(conn)
+        attach_sidecar(conn, db_file)
         return conn
     except sqlite3.Error as e:
         print(f"❌ Database connection error: {e}")
         return None
 
-def createIndexies(db_file):
+def write_csv(output_file, headers, rows, encoding=None):
+    """Writes the header row and the data rows of a report to a CSV file"""
+    with open(output_file, 'w+', newline='', encoding=encoding) as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+def percent_of_group_sql(query, value, group_by, order_by, digits=0):
+    """
+    Wraps a query so that it also returns `percent`: `value` as a percentage of the
+    total of its group (the rows sharing the group_by columns). The percentages are
+    rounded to `digits` with the largest remainder method, so every group adds up to
+    exactly 100; the leftover units go to the largest remainders (ties in order_by order).
+    A group whose total is 0 or NULL gets 0, which is what the reports wrote before
+    for a division by zero.
+    """
+    scale = 10 ** digits
+    partition = ", ".join(group_by)
+    order = ", ".join(order_by)
+    return f"""
+        WITH Shares AS (
+            SELECT q.*,
+                   {value} * {100 * scale}.0 / NULLIF(SUM({value}) OVER (PARTITION BY {partition}), 0) AS share_units
+            FROM ({query}) q
+        ),
+        Floored AS (
+            SELECT s.*,
+                   CAST(share_units AS INTEGER) AS floor_units,
+                   ROW_NUMBER() OVER (PARTITION BY {partition}
+                                      ORDER BY share_units - CAST(share_units AS INTEGER) DESC, {order}) AS remainder_rank
+            FROM Shares s
+        )
+        SELECT f.*,
+               CASE WHEN share_units IS NULL THEN 0
+                    ELSE ROUND((floor_units + (remainder_rank <= {100 * scale} - SUM(floor_units) OVER (PARTITION BY {partition})))
+                               * 1.0 / {scale}, {digits})
+               END AS percent
+        FROM Floored f
+    """
+
+# Percentage denominators of the reports: the total of `measure` over the `where`
+# rows of `table`, per country and cycle. build_denominators() computes all of them
+# once per database in the sidecar (a setup step), so the reports look their totals
+# up instead of re-scanning the table for a TotalCounts / TotalArea CTE.
+Denominator = namedtuple("Denominator", "name table measure where")
+
+DENOMINATORS = {denominator.name: denominator for denominator in (
+    Denominator("gw_quantitative_failing_area", "SOW_GWB_GroundWaterBody", "SUM(cArea)",
+                "gwAssociatedProtectedArea <> 'Unpopulated' AND gwQuantitativeStatusValue = '3'"),
+    Denominator("gw_chemical_failing_area", "SOW_GWB_gwChemicalReasonsForFailure", "SUM(cArea)",
+                "gwAtRiskChemical NOT IN ('Annex 0', 'Unpopulated') AND gwChemicalStatusValue = '3'"),
+    Denominator("gw_quantitative_exemption_area", "SOW_GWB_gwQuantitativeExemptionPressure", "SUM(cArea)", "1"),
+    Denominator("gw_pressure_area", "SOW_GWB_gwSignificantPressureType", "SUM(cArea)",
+                "gwSignificantPressureType <> 'Unpopulated'"),
+    Denominator("gw_impact_area", "SOW_GWB_gwSignificantImpactType", "SUM(cArea)",
+                "gwQuantitativeStatusValue <> 'Unpopulated' AND gwChemicalStatusValue <> 'Unpopulated'"),
+    Denominator("gw_impact_other_area", "SOW_GWB_gwSignificantImpactOther", "SUM(cArea)", "1"),
+    Denominator("gw_pressure_other_area", "SOW_GWB_gwSignificantPressureOther", "SUM(cArea)", "1"),
+    Denominator("sw_impact_other_count", "SOW_SWB_swSignificantImpactOther", "COUNT(swSignificantImpactOther)",
+                "surfaceWaterBodyCategory <> 'Unpopulated'"),
+    Denominator("sw_pressure_other_count", "SOW_SWB_swSignificantPressureOther", "COUNT(swSignificantPressureOther)", "1"),
+    Denominator("sw_failing_rbsp_bodies", "SOW_SWB_FailingRBSP", "COUNT(DISTINCT euSurfaceWaterBodyCode)",
+                "swFailingRBSP <> 'None'"),
+)}
+
+def build_denominators(db_file):
+    """
+    Creates the denominators table in the sidecar database from the rows of db_file.
+    """
+    conn = sqlite3.connect(database_uri(sidecar_path(db_file)), uri=True)
+    try:
+        conn.execute("ATTACH DATABASE ? AS source", (database_uri(db_file),))
+        conn.execute("DROP TABLE IF EXISTS denominators")
+        conn.execute("CREATE TABLE denominators (name TEXT, countryCode, cYear, total)")
+        for denominator in DENOMINATORS.values():
+            conn.execute(f"""
+                INSERT INTO denominators
+                SELECT ?, countryCode, cYear, {denominator.measure}
+                FROM source.{denominator.table}
+                WHERE {denominator.where}
+                GROUP BY countryCode, cYear
+            """, (denominator.name,))
+        conn.execute("CREATE INDEX denominators_name_country_year ON denominators (name, countryCode, cYear)")
+        conn.commit()
+        print(f"✅ {len(DENOMINATORS)} report denominators computed")
+    finally:
+        conn.close()
+
+def denominator(conn, name):
+    """
+    FROM-clause source of the per-(countryCode, cYear) `total` of a denominator: the
+    sidecar table when the setup step has run, the aggregate over the table otherwise.
+    """
+    try:
+        built = conn.execute("SELECT 1 FROM derived.sqlite_master WHERE type = 'table' AND name = 'denominators'"
+                             ).fetchone() is not None
+    except sqlite3.OperationalError:  # no sidecar attached
+        built = False
+    if built:
+        return f"(SELECT countryCode, cYear, total FROM derived.denominators WHERE name = '{name}')"
+    d = DENOMINATORS[name]
+    return (f"(SELECT countryCode, cYear, {d.measure} AS total FROM {d.table} "
+            f"WHERE {d.where} GROUP BY countryCode, cYear)")
+
+def reportedCountries(db_file, cYear):
+    """Returns the country codes that reported surface water or groundwater bodies for cYear"""
     conn = create_connection(db_file)
-    cur = conn.cursor()
+    if conn is None:
+        print("❌ Database connection failed.")
+        return []
 
-    INDEX_COLUMNS = {
-    "cYear": ["countryCode", "euRBDCode"],  # Common composite index
-    "euSurfaceWaterBodyCode": ["cYear", "countryCode", "euRBDCode"],  # SWB Tables
-    "euGroundWaterBodyCode": ["cYear", "countryCode", "euRBDCode"],  # GWB Tables
-    }
-    # Fetch all table names
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
-    tables = [row[0] for row in cur.fetchall()]
-
-    # Loop through each table and extract columns
-    for table in tables:
-    # Get existing indexes for the table
-        cur.execute(f"SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='{table}';")
-        existing_indexes = {row[0] for row in cur.fetchall()}
-
-        # Fetch columns for the current table
-        cur.execute(f"PRAGMA table_info({table});")
-        columns = [row[1] for row in cur.fetchall()]
-
-        for base_col, related_cols in INDEX_COLUMNS.items():
-            if base_col in columns:
-                index_name = f"idx_{table}_{base_col}"
-                index_columns = [base_col] + [col for col in related_cols if col in columns]
-                index_columns_str = ", ".join(index_columns)
-
-                if index_name in existing_indexes:
-                    print(f"Skipping existing index: {index_name}")
-                    continue
-
-                sql = f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({index_columns_str});"
-                cur.execute(sql)
-                print(f"Created index on {table}: {index_columns_str}")
-
-    # Commit and close
-    conn.commit()
-    print("Index process completed")
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT countryCode FROM SOW_SWB_SurfaceWaterBody WHERE cYear = ?
+            UNION
+            SELECT countryCode FROM SOW_GWB_GroundWaterBody WHERE cYear = ?
+            ORDER BY countryCode
+        """, (cYear, cYear))
+        return [row[0] for row in cur.fetchall() if row[0]]
+    finally:
+        conn.close()
 
 def updateTables(db_file):
     """
     Cleans up whitespace (spaces, tabs, newlines) from C_StatusFailing and C_StatusKnown columns
-    in the swRBD_Europe_data table.
+    in the swRBD_Europe_data table of the sidecar database.
     """
 
-    conn = create_connection(db_file)
+    conn = create_connection(sidecar_path(db_file))
     if conn is None:
         print("❌ Database connection failed.")
         return
@@ -92,10 +410,10 @@ def updateTables(db_file):
 
 def create_and_populate_swRBD_Europe_data(db_file):
     """
-    Creates the swRBD_Europe_data table and populates it with predefined data.
+    Creates the swRBD_Europe_data table in the sidecar database and populates it with predefined data.
     """
 
-    conn = sqlite3.connect(db_file)
+    conn = sqlite3.connect(sidecar_path(db_file))
     cur = conn.cursor()
 
     # **Drop the table if it exists**
@@ -340,7 +658,7 @@ def rbdCodeNames(db_file, countryCode, cYear, working_directory):
         # Constructing SQL query with placeholders
         query = '''
             SELECT DISTINCT NUTS0, euRBDCode, rbdName
-            FROM swRBD_Europe_data
+            FROM derived.swRBD_Europe_data
             WHERE NUTS0 IN ({})
             ORDER BY euRBDCode;
         '''.format(', '.join(['?'] * len(countryCode)))
@@ -396,30 +714,6 @@ def WISE_SOW_SurfaceWaterBody_SWB_Table(db_file, countryCode, cYear, working_dir
             FROM FilteredData
             GROUP BY countryCode
         ),
-        MedianLength AS (
-            SELECT countryCode, AVG(cLength) AS median_length
-            FROM (
-                SELECT countryCode, cLength, 
-                       ROW_NUMBER() OVER (PARTITION BY countryCode ORDER BY cLength) AS row_num,
-                       COUNT(*) OVER (PARTITION BY countryCode) AS total_count
-                FROM FilteredData
-                WHERE cLength IS NOT NULL
-            )
-            WHERE row_num = (total_count + 1) / 2 OR row_num = (total_count / 2) + 1
-            GROUP BY countryCode
-        ),
-        MedianArea AS (
-            SELECT countryCode, AVG(cArea) AS median_area
-            FROM (
-                SELECT countryCode, cArea, 
-                       ROW_NUMBER() OVER (PARTITION BY countryCode ORDER BY cArea) AS row_num,
-                       COUNT(*) OVER (PARTITION BY countryCode) AS total_count
-                FROM FilteredData
-                WHERE cArea IS NOT NULL
-            )
-            WHERE row_num = (total_count + 1) / 2 OR row_num = (total_count / 2) + 1
-            GROUP BY countryCode
-        ),
         AggregatedData AS (
             SELECT f.countryCode, ? AS cYear,
                    COUNT(f.euSurfaceWaterBodyCode) AS num_swb,
@@ -427,18 +721,16 @@ def WISE_SOW_SurfaceWaterBody_SWB_Table(db_file, countryCode, cYear, working_dir
                    ROUND(SUM(f.cLength), 0) AS total_length_km,
                    ROUND(SUM(f.cLength) * 100.0 / t.total_length, 0) AS length_percent,
                    ROUND(SUM(f.cArea), 0) AS total_area_km2,
-                   ROUND(SUM(f.cArea) * 100.0 / t.total_area, 0) AS area_percent
+                   ROUND(SUM(f.cArea) * 100.0 / t.total_area, 0) AS area_percent,
+                   ROUND(COALESCE(MEDIAN(f.cLength), 0), 0) AS median_length,
+                   ROUND(COALESCE(MEDIAN(f.cArea), 0), 0) AS median_area
             FROM FilteredData f
             JOIN TotalCounts t ON f.countryCode = t.countryCode
             GROUP BY f.countryCode
         )
-        SELECT a.*, 
-               ROUND(COALESCE(mL.median_length, 0), 0) AS median_length, 
-               ROUND(COALESCE(mA.median_area, 0), 0) AS median_area
-        FROM AggregatedData a
-        LEFT JOIN MedianLength mL ON a.countryCode = mL.countryCode
-        LEFT JOIN MedianArea mA ON a.countryCode = mA.countryCode
-        ORDER BY a.countryCode;
+        SELECT *
+        FROM AggregatedData
+        ORDER BY countryCode;
     """
 
     # Execute query with parameters
@@ -533,7 +825,7 @@ def Surface_water_bodies_Ecological_exemptions_and_pressures(db_file, countryCod
             SELECT countryCode, euSurfaceWaterBodyCode, swEcologicalExemptionTypeGroup,
                    swEcologicalExemptionType, swEcologicalExemptionPressureGroup,
                    swEcologicalExemptionPressure
-            FROM SOW_SWB_SWE_swEcologicalExemptionPressure
+            FROM {staged(db_file, 'SOW_SWB_SWE_swEcologicalExemptionPressure', countryCode, cYear)}
             WHERE cYear = ?
             AND countryCode IN ({','.join('?' * len(countryCode))})
         ),
@@ -589,70 +881,7 @@ def Surface_water_bodies_Ecological_exemptions_Type(db_file, countryCode, cYear,
     query = f"""
         WITH FilteredData AS (
             SELECT countryCode, euSurfaceWaterBodyCode, swEcologicalExemptionTypeGroup, swEcologicalExemptionType
-            FROM SOW_SWB_SWEcologicalExemptionType
-            WHERE cYear = ?
-            AND countryCode IN ({','.join('?' * len(countryCode))})
-            AND swEcologicalExemptionTypeGroup IN ({','.join('?' * len(swEcologicalExemptionTypeGroup))})
-            AND swEcologicalExemptionTypeGroup NOT IN ("None", "Unpopulated")
-        ),
-        TotalCounts AS (
-            SELECT countryCode, swEcologicalExemptionTypeGroup, COUNT(DISTINCT euSurfaceWaterBodyCode) AS total
-            FROM FilteredData
-            GROUP BY countryCode, swEcologicalExemptionTypeGroup
-        ),
-        ExemptionCounts AS (
-            SELECT countryCode, swEcologicalExemptionTypeGroup, swEcologicalExemptionType,
-                   COUNT(DISTINCT euSurfaceWaterBodyCode) AS Number
-            FROM FilteredData
-            GROUP BY countryCode, swEcologicalExemptionTypeGroup, swEcologicalExemptionType
-        )
-        SELECT ec.countryCode, ? AS cYear, ec.swEcologicalExemptionTypeGroup, ec.swEcologicalExemptionType, 
-               ec.Number,
-               ROUND(ec.Number * 100.0 / tc.total, 2) AS "Number (%)"
-        FROM ExemptionCounts ec
-        JOIN TotalCounts tc 
-        ON ec.countryCode = tc.countryCode AND ec.swEcologicalExemptionTypeGroup = tc.swEcologicalExemptionTypeGroup
-        ORDER BY ec.countryCode, ec.swEcologicalExemptionTypeGroup, ec.swEcologicalExemptionType;
-    """
-
-    # Execute query
-    cur.execute(query, [cYear] + countryCode + swEcologicalExemptionTypeGroup + [cYear])
-    data = cur.fetchall()
-
-    # Write results to CSV
-    with open(output_file, 'w+', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(headers)
-        writer.writerows(data)
-
-    conn.close()
-
-def Surface_water_bodies_Ecological_exemptions_Type(db_file, countryCode, cYear, working_directory):
-    """Optimized function to extract ecological exemption type data using CTEs."""
-    
-    if not countryCode:
-        print("❌ No country codes provided.")
-        return
-
-    output_file = os.path.join(working_directory, f"6.Surface_water_bodies_Ecological_exemptions_Type{cYear}.csv")
-
-    headers = ["Country", "Year", "Ecological Exemption Type Group", "Ecological Exemption Type", "Number", "Number (%)"]
-
-    conn = create_connection(db_file)
-    if conn is None:
-        print("❌ Database connection failed.")
-        return
-
-    cur = conn.cursor()
-
-    # List of exemption types to filter
-    swEcologicalExemptionTypeGroup = ["Article4(4)", "Article4(5)", "Article4(6)", "Article4(7)"]
-
-    # Optimized Query Using CTEs
-    query = f"""
-        WITH FilteredData AS (
-            SELECT countryCode, euSurfaceWaterBodyCode, swEcologicalExemptionTypeGroup, swEcologicalExemptionType
-            FROM SOW_SWB_SWEcologicalExemptionType
+            FROM {staged(db_file, 'SOW_SWB_SWEcologicalExemptionType', countryCode, cYear)}
             WHERE cYear = ?
             AND countryCode IN ({','.join('?' * len(countryCode))})
             AND swEcologicalExemptionTypeGroup IN ({','.join('?' * len(swEcologicalExemptionTypeGroup))})
@@ -768,7 +997,7 @@ def SWB_Chemical_exemption_type(db_file, countryCode, cYear, working_directory):
         WITH FilteredData AS (
             SELECT DISTINCT countryCode, euSurfaceWaterBodyCode, surfaceWaterBodyCategory,
                             swChemicalExemptionTypeGroup, swChemicalExemptionType, cArea
-            FROM SOW_SWB_SWP_SWChemicalExemptionType
+            FROM {staged(db_file, 'SOW_SWB_SWP_SWChemicalExemptionType', countryCode, cYear)}
             WHERE cYear = ?
             AND countryCode IN ({','.join('?' * len(countryCode))})
             AND swEcologicalStatusOrPotentialValue <> 'unknown'
@@ -1515,12 +1744,10 @@ def swRBsPollutants(db_file, countryCode, cYear, working_directory):
     query = f"""
         WITH TotalCounts AS (
             SELECT countryCode, 
-                   COUNT(DISTINCT euSurfaceWaterBodyCode) AS total_count
-            FROM SOW_SWB_FailingRBSP
+                   total AS total_count
+            FROM {denominator(conn, 'sw_failing_rbsp_bodies')}
             WHERE cYear = ? 
               AND countryCode IN ({','.join('?' * len(countryCode))}) 
-              AND swFailingRBSP <> 'None'
-            GROUP BY countryCode
         )
         SELECT f.countryCode, 
                f.swFailingRBSP,
@@ -1816,7 +2043,7 @@ def swChemicalStatusExpectedAchievementDate(db_file, countryCode, cYear, working
 
 def GroundWaterBodyCategory2016(db_file, countryCode, cYear, working_directory):
     """
-    Extracts Ground Water Body Categories using CTEs and manual median calculations.
+    Extracts Ground Water Body Categories using CTEs and the MEDIAN() aggregate.
     """
 
     if not countryCode:
@@ -1846,34 +2073,21 @@ def GroundWaterBodyCategory2016(db_file, countryCode, cYear, working_directory):
                    SUM(cArea) AS total_area
             FROM FilteredData
         ),
-        MedianArea AS (
-            SELECT countryCode, AVG(cArea) AS median_area
-            FROM (
-                SELECT countryCode, cArea, 
-                       ROW_NUMBER() OVER (PARTITION BY countryCode ORDER BY cArea) AS row_num,
-                       COUNT(*) OVER (PARTITION BY countryCode) AS total_count
-                FROM FilteredData
-                WHERE cArea IS NOT NULL
-            )
-            WHERE row_num = (total_count + 1) / 2 OR row_num = (total_count / 2) + 1
-            GROUP BY countryCode
-        ),
         GroundwaterStats AS (
             SELECT countryCode, 
                    ? AS cYear,
                    COUNT(groundWaterBodyName) AS Number,
                    ROUND(COUNT(groundWaterBodyName) * 100.0 / NULLIF(tc.total_number, 0), 0) AS Number_Percent,
                    ROUND(SUM(cArea), 0) AS Area,
-                   ROUND(SUM(cArea) * 100.0 / NULLIF(tc.total_area, 0), 0) AS Area_Percent
+                   ROUND(SUM(cArea) * 100.0 / NULLIF(tc.total_area, 0), 0) AS Area_Percent,
+                   ROUND(COALESCE(MEDIAN(cArea), 0), 0) AS Median_Area
             FROM FilteredData
             JOIN TotalCounts tc ON 1=1
             GROUP BY countryCode
         )
-        SELECT gs.*, 
-               ROUND(COALESCE(mA.median_area, 0), 0) AS Median_Area
-        FROM GroundwaterStats gs
-        LEFT JOIN MedianArea mA ON gs.countryCode = mA.countryCode
-        ORDER BY gs.countryCode;
+        SELECT *
+        FROM GroundwaterStats
+        ORDER BY countryCode;
     """
 
     # Execute query
@@ -1914,7 +2128,7 @@ def Groundwater_bodies_Chemical_Exemption_Type(db_file, countryCode, cYear, work
                    gwChemicalExemptionTypeGroup, 
                    gwChemicalExemptionType, 
                    cArea
-            FROM SOW_GWB_GWP_GWChemicalExemptionType
+            FROM {staged(db_file, 'SOW_GWB_GWP_GWChemicalExemptionType', countryCode, cYear)}
             WHERE cYear = ?
               AND gwChemicalStatusValue NOT IN ('2', 'missing', 'unpopulated')
               AND countryCode IN ({','.join('?' * len(countryCode))})
@@ -1975,11 +2189,10 @@ def Groundwater_bodies_Quantitative_Exemption_Type(db_file, countryCode, cYear,
 
     query = f"""
         WITH TotalArea AS (
-            SELECT countryCode, SUM(cArea) AS total_area
-            FROM SOW_GWB_gwQuantitativeExemptionPressure
+            SELECT countryCode, total AS total_area
+            FROM {denominator(conn, 'gw_quantitative_exemption_area')}
             WHERE cYear = ? 
               AND countryCode IN ({','.join('?' * len(countryCode))})
-            GROUP BY countryCode
         )
         SELECT f.countryCode,
                f.gwQuantitativeExemptionTypeGroup,
@@ -2242,76 +2455,37 @@ def gwQuantitativeStatusValue_gwChemicalStatusValue(db_file, countryCode, cYear,
 
     cur = conn.cursor()
 
-    # **🚀 Optimized Query for Quantitative Status**
-    quantitative_query = f"""
-        WITH TotalArea AS (
-            SELECT countryCode, 
-                   SUM(cArea) AS total_area
-            FROM SOW_GWB_GroundWaterBody
-            WHERE cYear = ? 
-              AND countryCode IN ({','.join('?' * len(countryCode))}) 
-            GROUP BY countryCode
-        ),
-        QuantitativeStatus AS (
-            SELECT f.countryCode, 
-                   f.cYear,
-                   f.gwQuantitativeStatusValue,
-                   ROUND(SUM(f.cArea), 0) AS Area_km2
-            FROM SOW_GWB_GroundWaterBody f
-            WHERE f.cYear = ? 
-              AND f.countryCode IN ({','.join('?' * len(countryCode))}) 
-              AND f.gwQuantitativeStatusValue IN ("2", "3", "unknown")
-            GROUP BY f.countryCode, f.cYear, f.gwQuantitativeStatusValue
-        )
-        SELECT qs.countryCode, 
-               qs.cYear,
-               qs.gwQuantitativeStatusValue,
-               qs.Area_km2,
-               ROUND(qs.Area_km2 * 100.0 / NULLIF(ta.total_area, 0), 0) AS Area_Percent
-        FROM QuantitativeStatus qs
-        JOIN TotalArea ta 
-          ON qs.countryCode = ta.countryCode
-        ORDER BY qs.countryCode, qs.gwQuantitativeStatusValue;
-    """
+    # **🚀 One scan for both tables: the country total and the area of every status value
+    # are conditional sums of the same rows, one column pair per value**
+    quantitative_values = ["2", "3", "unknown"]
+    chemical_values = ["2", "3"]
+    status_columns = []
+    for column, values in (("gwQuantitativeStatusValue", quantitative_values), ("gwChemicalStatusValue", chemical_values)):
+        for value in values:
+            area = f"ROUND(SUM(CASE WHEN {column} = '{value}' THEN cArea END), 0)"
+            status_columns += [f"COUNT(CASE WHEN {column} = '{value}' THEN 1 END)", area,
+                               f"ROUND({area} * 100.0 / NULLIF(SUM(cArea), 0), 0)"]
 
-    cur.execute(quantitative_query, [cYear] + countryCode + [cYear] + countryCode)
-    quantitative_data = cur.fetchall()
-
-    # **🚀 Optimized Query for Chemical Status Percentage**
-    chemical_query = f"""
-        WITH TotalArea AS (
-            SELECT countryCode, 
-                   SUM(cArea) AS total_area
-            FROM SOW_GWB_GroundWaterBody
-            WHERE cYear = ? 
-              AND countryCode IN ({','.join('?' * len(countryCode))}) 
-            GROUP BY countryCode
-        ),
-        ChemicalStatus AS (
-            SELECT f.countryCode, 
-                   f.cYear,
-                   f.gwChemicalStatusValue,
-                   ROUND(SUM(f.cArea), 0) AS Area_km2
-            FROM SOW_GWB_GroundWaterBody f
-            WHERE f.cYear = ? 
-              AND f.countryCode IN ({','.join('?' * len(countryCode))}) 
-              AND f.gwChemicalStatusValue IN ("2", "3")
-            GROUP BY f.countryCode, f.cYear, f.gwChemicalStatusValue
-        )
-        SELECT cs.countryCode, 
-               cs.cYear AS Year,
-               cs.gwChemicalStatusValue AS "Chemical Status Value",
-               cs.Area_km2 AS "Area (km^2)",
-               ROUND(cs.Area_km2 * 100.0 / NULLIF(ta.total_area, 0), 0) AS "Area (%)"
-        FROM ChemicalStatus cs
-        JOIN TotalArea ta 
-          ON cs.countryCode = ta.countryCode
-        ORDER BY cs.countryCode, cs.gwChemicalStatusValue;
+    query = f"""
+        SELECT countryCode, 
+               cYear,
+               {', '.join(status_columns)}
+        FROM SOW_GWB_GroundWaterBody
+        WHERE cYear = ? 
+          AND countryCode IN ({','.join('?' * len(countryCode))}) 
+        GROUP BY countryCode
+        ORDER BY countryCode;
     """
 
-    # Execute query
-    cur.execute(chemical_query, [cYear] + countryCode + [cYear] + countryCode)
-    chemical_data = cur.fetchall()
+    cur.execute(query, [cYear] + countryCode)
+    quantitative_data, chemical_data = [], []
+    for country, year, *cells in cur.fetchall():
+        for data, values in ((quantitative_data, quantitative_values), (chemical_data, chemical_values)):
+            for value in values:
+                rows, area, percent = cells[:3]
+                cells = cells[3:]
+                if rows:
+                    data.append((country, year, value, area, percent))
 
     # **📌 Write Quantitative Status Data to CSV**
     quantitative_output_file = os.path.join(working_directory, f"22.gwQuantitativeStatusValue_Percent_Country_{cYear}.csv")
@@ -2415,13 +2589,10 @@ def SOW_GWB_gwQuantitativeReasonsForFailure_Table(db_file, countryCode, cYear, w
     query = f"""
         WITH TotalArea AS (
             SELECT countryCode, 
-                   SUM(cArea) AS total_area
-            FROM SOW_GWB_GroundWaterBody
+                   total AS total_area
+            FROM {denominator(conn, 'gw_quantitative_failing_area')}
             WHERE cYear = ? 
               AND countryCode IN ({','.join('?' * len(countryCode))}) 
-              AND gwAssociatedProtectedArea <> 'Unpopulated' 
-              AND gwQuantitativeStatusValue = '3'
-            GROUP BY countryCode
         )
         SELECT f.countryCode, 
                f.cYear,
@@ -2470,13 +2641,10 @@ def SOW_GWB_gwChemicalReasonsForFailure_Table(db_file, countryCode, cYear, worki
     query = f"""
         WITH TotalArea AS (
             SELECT countryCode, 
-                   SUM(cArea) AS total_area
-            FROM SOW_GWB_gwChemicalReasonsForFailure
+                   total AS total_area
+            FROM {denominator(conn, 'gw_chemical_failing_area')}
             WHERE cYear = ? 
               AND countryCode IN ({','.join('?' * len(countryCode))}) 
-              AND gwAtRiskChemical NOT IN ('Annex 0', 'Unpopulated') 
-              AND gwChemicalStatusValue = '3'
-            GROUP BY countryCode
         )
         SELECT f.countryCode, 
                f.cYear,
@@ -3063,6 +3231,15 @@ def swNumber_of_Impacts_by_country(db_file, countryCode, cYear, working_director
 
     conn.close()
 
+# Pressure type groups of the surface water pressure type table
+SW_PRESSURE_TYPE_GROUPS = (
+    "P1 - Point sources", "P2 - Diffuse sources", "P2-7 - Diffuse - Atmospheric deposition ",
+    "P3 - Abstraction", "P4 - Hydromorphology", "P5 - Introduced species and litter",
+    "P6 - Groundwater recharge or water level", "P7 - Anthropogenic pressure - Other",
+    "P8 - Anthropogenic pressure - Unknown", "P9 - Anthropogenic pressure - Historical pollution",
+    "P0 - No significant anthropogenic pressure",
+)
+
 def swSignificant_Pressure_Type_Table2016(db_file, countryCode, cYear, working_directory):
     """
     Extracts the significant pressure types for surface water bodies.
@@ -3078,14 +3255,6 @@ def swSignificant_Pressure_Type_Table2016(db_file, countryCode, cYear, working_d
 
     cur = conn.cursor()
 
-    # Define all relevant pressure types
-    swSignificantPressureTypeGroup = [
-        "P1 - Point sources", "P2 - Diffuse sources", "P2-7 - Diffuse - Atmospheric deposition ",
-        "P3 - Abstraction", "P4 - Hydromorphology", "P5 - Introduced species and litter",
-        "P6 - Groundwater recharge or water level", "P7 - Anthropogenic pressure - Other",
-        "P8 - Anthropogenic pressure - Unknown", "P9 - Anthropogenic pressure - Historical pollution",
-        "P0 - No significant anthropogenic pressure"
-    ]
 
     # 🚀 **Optimized Query using CTE**
     query = f"""
@@ -3123,11 +3292,11 @@ def swSignificant_Pressure_Type_Table2016(db_file, countryCode, cYear, working_d
           AND f.swEcologicalStatusOrPotentialValue <> 'Unpopulated'
           AND f.swEcologicalStatusOrPotentialValue <> 'inapplicable'
           AND f.swChemicalStatusValue <> 'Unpopulated'
-          AND f.swSignificantPressureTypeGroup IN ({','.join('?' * len(swSignificantPressureTypeGroup))})
+          AND f.swSignificantPressureTypeGroup IN ({','.join('?' * len(SW_PRESSURE_TYPE_GROUPS))})
         GROUP BY f.countryCode, f.swSignificantPressureTypeGroup, f.swSignificantPressureType;
     """
 
-    cur.execute(query, [cYear] + countryCode + [cYear] + countryCode + swSignificantPressureTypeGroup)
+    cur.execute(query, [cYear] + countryCode + [cYear] + countryCode + list(SW_PRESSURE_TYPE_GROUPS))
     data = cur.fetchall()
 
     # **📌 Write Data to CSV**
@@ -3215,12 +3384,10 @@ def swSignificantImpactType_Table_Other2016(db_file, countryCode, cYear, working
     query = f"""
         WITH TotalCounts AS (
             SELECT countryCode, 
-                   COUNT(swSignificantImpactOther) AS total_count
-            FROM SOW_SWB_swSignificantImpactOther
+                   total AS total_count
+            FROM {denominator(conn, 'sw_impact_other_count')}
             WHERE cYear = ?
               AND countryCode IN ({','.join('?' * len(countryCode))})
-              AND surfaceWaterBodyCategory <> 'Unpopulated'
-            GROUP BY countryCode
         )
         SELECT f.countryCode, 
                f.swSignificantImpactOther,
@@ -3279,11 +3446,10 @@ def swSignificantPressureType_Table_Other(db_file, countryCode, cYear, working_d
     query = f"""
         WITH TotalCounts AS (
             SELECT countryCode, 
-                   COUNT(swSignificantPressureOther) AS total_count
-            FROM SOW_SWB_swSignificantPressureOther
+                   total AS total_count
+            FROM {denominator(conn, 'sw_pressure_other_count')}
             WHERE cYear = ?
               AND countryCode IN ({','.join('?' * len(countryCode))})
-            GROUP BY countryCode
         )
         SELECT f.countryCode, 
                f.swSignificantPressureOther,
@@ -3461,13 +3627,10 @@ def gwSignificantImpactType2016(db_file, countryCode, cYear, working_directory):
     query = f"""
         WITH TotalCountryArea AS (
             SELECT countryCode, 
-                   SUM(cArea) AS country_total_area
-            FROM SOW_GWB_gwSignificantImpactType
+                   total AS country_total_area
+            FROM {denominator(conn, 'gw_impact_area')}
             WHERE cYear = ?
               AND countryCode IN ({','.join('?' * len(countryCode))}) 
-              AND gwQuantitativeStatusValue <> 'Unpopulated'
-              AND gwChemicalStatusValue <> 'Unpopulated'
-            GROUP BY countryCode
         ),
         TotalGlobalArea AS (
             SELECT SUM(country_total_area) AS global_total_area
@@ -3532,11 +3695,10 @@ def gwSignificantImpactType_Other(db_file, countryCode, cYear, working_directory
     query = f"""
         WITH TotalCountryArea AS (
             SELECT countryCode, 
-                   SUM(cArea) AS country_total_area
-            FROM SOW_GWB_gwSignificantImpactOther
+                   total AS country_total_area
+            FROM {denominator(conn, 'gw_impact_other_area')}
             WHERE cYear = ?
               AND countryCode IN ({','.join('?' * len(countryCode))}) 
-            GROUP BY countryCode
         ),
         TotalGlobalArea AS (
             SELECT SUM(country_total_area) AS global_total_area
@@ -3599,11 +3761,10 @@ def SOW_GWB_gwSignificantPressureType_NumberOfImpact_by_country(db_file, country
     query = f"""
         WITH TotalCountryArea AS (
             SELECT countryCode, 
-                   SUM(cArea) AS country_total_area
-            FROM SOW_GWB_gwSignificantPressureOther
+                   total AS country_total_area
+            FROM {denominator(conn, 'gw_pressure_other_area')}
             WHERE cYear = ?
               AND countryCode IN ({','.join('?' * len(countryCode))}) 
-            GROUP BY countryCode
         ),
         TotalGlobalArea AS (
             SELECT SUM(country_total_area) AS global_total_area
@@ -3653,14 +3814,12 @@ def gwSignificantPressureType2016(db_file, countryCode, cYear, working_directory
     cur = conn.cursor()
 
     # **Retrieve total area per country (only for impacted groundwater bodies)**
-    cur.execute("""
-        SELECT countryCode, SUM(cArea) AS total_country_area
-        FROM SOW_GWB_gwSignificantPressureType
+    cur.execute(f"""
+        SELECT countryCode, total AS total_country_area
+        FROM {denominator(conn, 'gw_pressure_area')}
         WHERE cYear = ? 
-          AND countryCode IN ({})
-          AND gwSignificantPressureType <> 'Unpopulated'
-        GROUP BY countryCode
-    """.format(",".join(["?"] * len(countryCode))), [cYear] + countryCode)
+          AND countryCode IN ({','.join('?' * len(countryCode))})
+    """, [cYear] + countryCode)
     
     country_area_dict = {row[0]: row[1] for row in cur.fetchall()}  # Store total impacted area per country
 
@@ -3782,19 +3941,7 @@ def SOW_GWB_gwPollutant_Table(db_file, countryCode, cYear, working_directory):
 
     cur = conn.cursor()
 
-    # **Retrieve total impacted area per country**
-    cur.execute("""
-        SELECT countryCode, SUM(cArea) AS total_impacted_area
-        FROM SOW_GWB_gwPollutant
-        WHERE cYear = ? 
-          AND countryCode IN ({})
-          AND gwPollutantCausingFailure = 'Yes'
-        GROUP BY countryCode
-    """.format(",".join(["?"] * len(countryCode))), [cYear] + countryCode)
-
-    country_area_dict = {row[0]: row[1] for row in cur.fetchall()}  # Store total impacted area per country
-
-    # **🚀 Optimized Query using CTE**
+    # **🚀 Rounded area per pollutant and its share of the country's total (sums to 100% per country)**
     query = f"""
         SELECT f.countryCode, 
                f.gwPollutantCode,
@@ -3803,32 +3950,22 @@ def SOW_GWB_gwPollutant_Table(db_file, countryCode, cYear, working_directory):
         WHERE f.cYear = ? 
           AND f.countryCode IN ({','.join('?' * len(countryCode))}) 
           AND f.gwPollutantCausingFailure = 'Yes'
-        GROUP BY f.countryCode, f.gwPollutantCode;
+        GROUP BY f.countryCode, f.gwPollutantCode
     """
+    query = percent_of_group_sql(query, "Pollutant_Area", ["countryCode"], ["countryCode", "gwPollutantCode"])
 
-    cur.execute(query, [cYear] + countryCode)
+    cur.execute(f"""
+        SELECT countryCode, gwPollutantCode, Pollutant_Area, percent
+        FROM ({query})
+        ORDER BY countryCode, gwPollutantCode
+    """, [cYear] + countryCode)
     data = cur.fetchall()
 
-    # **📌 Compute the Correct `Area (%)` Per Country (Ensuring it sums to 100%)**
-    formatted_data = []
-    for country, pollutant, pollutant_area in data:
-        total_area = country_area_dict.get(country, 0)  # Avoid division by zero
-        impact_percentage = round((pollutant_area * 100.0) / total_area, 0) if total_area else 0
-        formatted_data.append([country, pollutant, pollutant_area, impact_percentage])
-
-    # **📌 Normalize Percentages to 100% per Country**
-    country_sums = {}
-    for row in formatted_data:
-        country_sums[row[0]] = country_sums.get(row[0], 0) + row[3]
-
-    for row in formatted_data:
-        row[3] = round((row[3] * 100) / country_sums[row[0]], 0) if country_sums[row[0]] else 0
-
     # **📌 Write Data to CSV**
     with open(output_file, 'w+', newline='') as f:
         writer = csv.writer(f)
         writer.writerow(headers)
-        writer.writerows(formatted_data)
+        writer.writerows(data)
 
     conn.close()
             
@@ -3851,37 +3988,28 @@ def Surface_water_bodies_Failing_notUnknown_by_Country(db_file, countryCode, cYe
 
     cur = conn.cursor()
 
-    # 🚀 **Optimized Query Using CTEs**
+    # 🚀 **One scan: failing ('3') bodies are a subset of the known ones, summed conditionally**
     query = f"""
-        WITH TotalKnown AS (
+        WITH StatusArea AS (
             SELECT countryCode, 
-                   SUM(cArea) AS known_status
+                   SUM(cArea) AS known_status,
+                   SUM(CASE WHEN swChemicalStatusValue = '3' THEN cArea END) AS failing_status
             FROM SOW_SWB_SurfaceWaterBody
             WHERE cYear = ?
               AND countryCode IN ({','.join('?' * len(countryCode))})
               AND swChemicalStatusValue <> 'Unpopulated'
             GROUP BY countryCode
-        ),
-        FailingCounts AS (
-            SELECT countryCode, 
-                   SUM(cArea) AS failing_status
-            FROM SOW_SWB_SurfaceWaterBody
-            WHERE cYear = ?
-              AND countryCode IN ({','.join('?' * len(countryCode))})
-              AND swChemicalStatusValue = '3'  -- Only failing status
-            GROUP BY countryCode
         )
-        SELECT tk.countryCode, 
-               ROUND(tk.known_status, 0) AS Known_Status,
-               ROUND(COALESCE(fc.failing_status, 0), 0) AS Failing_Status,
-               ROUND(COALESCE(fc.failing_status, 0) * 100.0 / NULLIF(tk.known_status, 0), 0) AS Failing_Percentage
-        FROM TotalKnown tk
-        LEFT JOIN FailingCounts fc ON tk.countryCode = fc.countryCode
-        ORDER BY tk.countryCode;
+        SELECT countryCode, 
+               ROUND(known_status, 0) AS Known_Status,
+               ROUND(COALESCE(failing_status, 0), 0) AS Failing_Status,
+               ROUND(COALESCE(failing_status, 0) * 100.0 / NULLIF(known_status, 0), 0) AS Failing_Percentage
+        FROM StatusArea
+        ORDER BY countryCode;
     """
 
     # Execute query
-    cur.execute(query, [cYear] + countryCode + [cYear] + countryCode)
+    cur.execute(query, [cYear] + countryCode)
     data = cur.fetchall()
 
     # **Write to CSV**
@@ -4101,19 +4229,7 @@ def Surface_water_bodies_QE1_Biological_quality_elements_assessment(db_file, cou
 
     cur = conn.cursor()
 
-    # **Retrieve total number of surface water bodies per country and QE1 code**
-    cur.execute("""
-        SELECT countryCode, qeCode, COUNT(euSurfaceWaterBodyCode) AS total_count
-        FROM SOW_SWB_QualityElement
-        WHERE cYear = ? 
-          AND countryCode IN ({})
-          AND qeCode LIKE 'QE1%'
-        GROUP BY countryCode, qeCode
-    """.format(",".join(["?"] * len(countryCode))), [cYear] + countryCode)
-
-    country_qe_totals = {(row[0], row[1]): row[2] for row in cur.fetchall()}  # Store total counts per country and QE1 code
-
-    # **🚀 Optimized Query for Data Extraction**
+    # **🚀 Number per monitoring result and its share of the country & QE1 code total (sums to 100%)**
     query = f"""
         SELECT f.countryCode, 
                f.qeMonitoringResults, 
@@ -4123,34 +4239,23 @@ def Surface_water_bodies_QE1_Biological_quality_elements_assessment(db_file, cou
         WHERE f.cYear = ? 
           AND f.countryCode IN ({','.join('?' * len(countryCode))}) 
           AND f.qeCode LIKE 'QE1%'
-        GROUP BY f.countryCode, f.qeMonitoringResults, f.qeCode;
+        GROUP BY f.countryCode, f.qeMonitoringResults, f.qeCode
     """
+    query = percent_of_group_sql(query, "Number", ["countryCode", "qeCode"],
+                                 ["countryCode", "qeMonitoringResults", "qeCode"])
 
-    cur.execute(query, [cYear] + countryCode)
+    cur.execute(f"""
+        SELECT countryCode, qeMonitoringResults, qeCode, Number, percent
+        FROM ({query})
+        ORDER BY countryCode, qeMonitoringResults, qeCode
+    """, [cYear] + countryCode)
     data = cur.fetchall()
 
-    # **📌 Compute the Correct `Number (%)` Per Country & QE1 Code**
-    formatted_data = []
-    for country, monitoring_result, qe_code, number in data:
-        total_count = country_qe_totals.get((country, qe_code), 0)  # Avoid division by zero
-        percentage = round((number * 100.0) / total_count, 0) if total_count else 0
-        formatted_data.append([country, monitoring_result, qe_code, number, percentage])
-
-    # **📌 Normalize Percentages to 100% per Country & QE1 Code**
-    country_qe_sums = {}
-    for row in formatted_data:
-        key = (row[0], row[2])  # (Country, QE1 Code)
-        country_qe_sums[key] = country_qe_sums.get(key, 0) + row[4]
-
-    for row in formatted_data:
-        key = (row[0], row[2])
-        row[4] = round((row[4] * 100) / country_qe_sums[key], 0) if country_qe_sums[key] else 0
-
     # **📌 Write Data to CSV**
     with open(output_file, 'w+', newline='') as f:
         writer = csv.writer(f)
         writer.writerow(headers)
-        writer.writerows(formatted_data)
+        writer.writerows(data)
 
     conn.close()
 
@@ -4169,19 +4274,7 @@ def Surface_water_bodies_QE2_assessment(db_file, countryCode, cYear, working_dir
 
     cur = conn.cursor()
 
-    # **Retrieve total number of surface water bodies per country and QE2 code**
-    cur.execute("""
-        SELECT countryCode, qeCode, COUNT(euSurfaceWaterBodyCode) AS total_count
-        FROM SOW_SWB_QualityElement
-        WHERE cYear = ? 
-          AND countryCode IN ({})
-          AND qeCode LIKE 'QE2%'
-        GROUP BY countryCode, qeCode
-    """.format(",".join(["?"] * len(countryCode))), [cYear] + countryCode)
-    
-    country_qe_totals = {(row[0], row[1]): row[2] for row in cur.fetchall()}  # Store total counts per country and QE2 code
-
-    # **🚀 Optimized Query for Data Extraction**
+    # **🚀 Number per monitoring result and its share of the country & QE2 code total (sums to 100%)**
     query = f"""
         SELECT f.countryCode, 
                f.qeMonitoringResults, 
@@ -4191,34 +4284,23 @@ def Surface_water_bodies_QE2_assessment(db_file, countryCode, cYear, working_dir
         WHERE f.cYear = ? 
           AND f.countryCode IN ({','.join('?' * len(countryCode))}) 
           AND f.qeCode LIKE 'QE2%'
-        GROUP BY f.countryCode, f.qeMonitoringResults, f.qeCode;
+        GROUP BY f.countryCode, f.qeMonitoringResults, f.qeCode
     """
+    query = percent_of_group_sql(query, "Number", ["countryCode", "qeCode"],
+                                 ["countryCode", "qeMonitoringResults", "qeCode"])
 
-    cur.execute(query, [cYear] + countryCode)
+    cur.execute(f"""
+        SELECT countryCode, qeMonitoringResults, qeCode, Number, percent
+        FROM ({query})
+        ORDER BY countryCode, qeMonitoringResults, qeCode
+    """, [cYear] + countryCode)
     data = cur.fetchall()
 
-    # **📌 Compute the Correct `Number (%)` Per Country & QE2 Code**
-    formatted_data = []
-    for country, monitoring_result, qe_code, number in data:
-        total_count = country_qe_totals.get((country, qe_code), 0)  # Avoid division by zero
-        percentage = round((number * 100.0) / total_count, 0) if total_count else 0
-        formatted_data.append([country, monitoring_result, qe_code, number, percentage])
-
-    # **📌 Normalize Percentages to 100% per Country & QE2 Code**
-    country_qe_sums = {}
-    for row in formatted_data:
-        key = (row[0], row[2])  # (Country, QE2 Code)
-        country_qe_sums[key] = country_qe_sums.get(key, 0) + row[4]
-
-    for row in formatted_data:
-        key = (row[0], row[2])
-        row[4] = round((row[4] * 100) / country_qe_sums[key], 0) if country_qe_sums[key] else 0
-
     # **📌 Write Data to CSV**
     with open(output_file, 'w+', newline='') as f:
         writer = csv.writer(f)
         writer.writerow(headers)
-        writer.writerows(formatted_data)
+        writer.writerows(data)
 
     conn.close()
 
@@ -4257,33 +4339,28 @@ def Surface_water_bodies_QE3_assessment(db_file, countryCode, cYear, working_dir
     # Possible monitoring results
     monitoring_results = ["Monitoring", "Grouping", "Expert judgement", "Unpopulated"]
 
+    # Shares are taken over all monitoring results of the country & code, then the listed ones are kept
     query = f"""
-        WITH TotalCounts AS (
-            SELECT countryCode, qeCode, COUNT(euSurfaceWaterBodyCode) AS total_count
-            FROM SOW_SWB_QualityElement
-            WHERE cYear = ? 
-              AND countryCode IN ({','.join('?' * len(countryCode))})
-              AND qeCode IN ({','.join('?' * len(qe_codes))})
-            GROUP BY countryCode, qeCode
-        )
         SELECT f.countryCode, 
                f.qeMonitoringResults, 
                f.qeCode, 
-               COUNT(f.euSurfaceWaterBodyCode) AS Number,
-               ROUND(
-                   COUNT(f.euSurfaceWaterBodyCode) * 100.0 / NULLIF(t.total_count, 0), 1
-               ) AS Percentage
+               COUNT(f.euSurfaceWaterBodyCode) AS Number
         FROM SOW_SWB_QualityElement f
-        JOIN TotalCounts t 
-          ON f.countryCode = t.countryCode AND f.qeCode = t.qeCode
         WHERE f.cYear = ? 
           AND f.countryCode IN ({','.join('?' * len(countryCode))}) 
           AND f.qeCode IN ({','.join('?' * len(qe_codes))})
-          AND f.qeMonitoringResults IN ({','.join('?' * len(monitoring_results))})
-        GROUP BY f.countryCode, f.qeMonitoringResults, f.qeCode;
+        GROUP BY f.countryCode, f.qeMonitoringResults, f.qeCode
     """
 
-    cur.execute(query, [cYear] + countryCode + qe_codes + [cYear] + countryCode + qe_codes + monitoring_results)
+    cur.execute(f"""
+        SELECT countryCode, qeMonitoringResults, qeCode, Number, percent
+        FROM (
+            SELECT *, ROUND(Number * 100.0 / NULLIF(SUM(Number) OVER (PARTITION BY countryCode, qeCode), 0), 1) AS percent
+            FROM ({query})
+        )
+        WHERE qeMonitoringResults IN ({','.join('?' * len(monitoring_results))})
+        ORDER BY countryCode, qeMonitoringResults, qeCode
+    """, [cYear] + countryCode + qe_codes + monitoring_results)
     data = cur.fetchall()
 
     # **📌 Write Data to CSV**
@@ -4329,33 +4406,28 @@ def Surface_water_bodies_QE3_3_assessment(db_file, countryCode, cYear, working_d
     # Possible monitoring results
     monitoring_results = ["Monitoring", "Grouping", "Expert judgement", "Unpopulated"]
 
+    # Shares are taken over all monitoring results of the country & code, then the listed ones are kept
     query = f"""
-        WITH TotalCounts AS (
-            SELECT countryCode, qeCode, COUNT(euSurfaceWaterBodyCode) AS total_count
-            FROM SOW_SWB_QualityElement
-            WHERE cYear = ? 
-              AND countryCode IN ({','.join('?' * len(countryCode))})
-              AND qeCode IN ({','.join('?' * len(qe_codes))})
-            GROUP BY countryCode, qeCode
-        )
         SELECT f.countryCode, 
                f.qeMonitoringResults, 
                f.qeCode, 
-               COUNT(f.euSurfaceWaterBodyCode) AS Number,
-               ROUND(
-                   COUNT(f.euSurfaceWaterBodyCode) * 100.0 / NULLIF(t.total_count, 0), 0
-               ) AS Percentage
+               COUNT(f.euSurfaceWaterBodyCode) AS Number
         FROM SOW_SWB_QualityElement f
-        JOIN TotalCounts t 
-          ON f.countryCode = t.countryCode AND f.qeCode = t.qeCode
         WHERE f.cYear = ? 
           AND f.countryCode IN ({','.join('?' * len(countryCode))}) 
           AND f.qeCode IN ({','.join('?' * len(qe_codes))})
-          AND f.qeMonitoringResults IN ({','.join('?' * len(monitoring_results))})
-        GROUP BY f.countryCode, f.qeMonitoringResults, f.qeCode;
+        GROUP BY f.countryCode, f.qeMonitoringResults, f.qeCode
     """
 
-    cur.execute(query, [cYear] + countryCode + qe_codes + [cYear] + countryCode + qe_codes + monitoring_results)
+    cur.execute(f"""
+        SELECT countryCode, qeMonitoringResults, qeCode, Number, percent
+        FROM (
+            SELECT *, ROUND(Number * 100.0 / NULLIF(SUM(Number) OVER (PARTITION BY countryCode, qeCode), 0), 0) AS percent
+            FROM ({query})
+        )
+        WHERE qeMonitoringResults IN ({','.join('?' * len(monitoring_results))})
+        ORDER BY countryCode, qeMonitoringResults, qeCode
+    """, [cYear] + countryCode + qe_codes + monitoring_results)
     data = cur.fetchall()
 
     # **📌 Write Data to CSV**
@@ -4382,49 +4454,23 @@ def sw_delineation_of_the_management_units_in_the_1st_and_2nd_RBMP(db_file, coun
 
     cur = conn.cursor()
 
-    # **🚀 Optimized SQL Query using CTE**
+    # **🚀 One scan: the total and both evolution groups are conditional counts of the same rows**
     query = f"""
-        WITH TotalCounts AS (
-            SELECT countryCode, 
-                   cYear, 
-                   COUNT(euSurfaceWaterBodyCode) AS total_count
-            FROM SOW_SWB_SurfaceWaterBody
-            WHERE cYear = ? 
-              AND countryCode IN ({','.join('?' * len(countryCode))})
-            GROUP BY countryCode, cYear
-        ),
-        Unchange AS (
-            SELECT countryCode, 
-                   cYear, 
-                   COUNT(euSurfaceWaterBodyCode) AS UnchangeCount
-            FROM SOW_SWB_SurfaceWaterBody
-            WHERE cYear = ? 
-              AND countryCode IN ({','.join('?' * len(countryCode))})
-              AND wiseEvolutionType IN ('noChange', 'changeCode', 'change')
-            GROUP BY countryCode, cYear
-        ),
-        Other AS (
-            SELECT countryCode, 
-                   cYear, 
-                   COUNT(euSurfaceWaterBodyCode) AS OtherCount
-            FROM SOW_SWB_SurfaceWaterBody
-            WHERE cYear = ? 
-              AND countryCode IN ({','.join('?' * len(countryCode))})
-              AND wiseEvolutionType NOT IN ('noChange', 'changeCode', 'change')
-            GROUP BY countryCode, cYear
-        )
-        SELECT t.countryCode, 
-               t.cYear, 
-               COALESCE(u.UnchangeCount, 0) AS Unchanged, 
-               ROUND(COALESCE(u.UnchangeCount, 0) * 100.0 / NULLIF(t.total_count, 0), 0) AS Unchanged_Percent,
-               COALESCE(o.OtherCount, 0) AS Other, 
-               ROUND(COALESCE(o.OtherCount, 0) * 100.0 / NULLIF(t.total_count, 0), 0) AS Other_Percent
-        FROM TotalCounts t
-        LEFT JOIN Unchange u ON t.countryCode = u.countryCode AND t.cYear = u.cYear
-        LEFT JOIN Other o ON t.countryCode = o.countryCode AND t.cYear = o.cYear;
-    """
-
-    cur.execute(query, [cYear] + countryCode + [cYear] + countryCode + [cYear] + countryCode)
+        SELECT countryCode, 
+               cYear, 
+               COUNT(CASE WHEN wiseEvolutionType IN ('noChange', 'changeCode', 'change') THEN euSurfaceWaterBodyCode END) AS Unchanged, 
+               ROUND(COUNT(CASE WHEN wiseEvolutionType IN ('noChange', 'changeCode', 'change') THEN euSurfaceWaterBodyCode END) * 100.0
+                     / NULLIF(COUNT(euSurfaceWaterBodyCode), 0), 0) AS Unchanged_Percent,
+               COUNT(CASE WHEN wiseEvolutionType NOT IN ('noChange', 'changeCode', 'change') THEN euSurfaceWaterBodyCode END) AS Other, 
+               ROUND(COUNT(CASE WHEN wiseEvolutionType NOT IN ('noChange', 'changeCode', 'change') THEN euSurfaceWaterBodyCode END) * 100.0
+                     / NULLIF(COUNT(euSurfaceWaterBodyCode), 0), 0) AS Other_Percent
+        FROM SOW_SWB_SurfaceWaterBody
+        WHERE cYear = ? 
+          AND countryCode IN ({','.join('?' * len(countryCode))})
+        GROUP BY countryCode, cYear;
+    """
+
+    cur.execute(query, [cYear] + countryCode)
     data = cur.fetchall()
 
     # **📌 Write Data to CSV**
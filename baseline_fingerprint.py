@@ -0,0 +1,29 @@
+import hashlib
+import os
+
+
+# Identity of a database file.
+#
+# The setup steps and the run manifests tell whether the WISE database is still
+# the same file by a cheap fingerprint of it, without reading its tables. This
+# module imports nothing of the tool, so every other module can use it.
+
+
+def wal_pending(db_file):
+    """True when db_file has a non-empty -wal file: commits not yet checkpointed into the file itself"""
+    wal = f"{db_file}-wal"
+    return os.path.exists(wal) and os.path.getsize(wal) > 0
+
+
+def database_fingerprint(db_file):
+    """
+    Cheap identity of a SQLite file: its 100-byte header (file change counter,
+    schema cookie, page size and count) plus its size. Any committed write changes it,
+    including the commits still in its write-ahead log (the header and size of the -wal file).
+    """
+    with open(db_file, 'rb') as f:
+        header = f.read(100) + str(os.path.getsize(db_file)).encode()
+    if wal_pending(db_file):
+        with open(f"{db_file}-wal", 'rb') as f:
+            header += f.read(32) + str(os.path.getsize(f"{db_file}-wal")).encode()
+    return hashlib.sha1(header).hexdigest()
@@ -0,0 +1,1039 @@
+import os
+from collections import namedtuple
+from functools import lru_cache
+from decimal import Decimal, ROUND_HALF_UP
+
+import baseline_cube
+from baseline_aggregates import median as sql_median, sql_sort_key
+from baseline_extraction import create_connection, write_csv
+
+
+# Shared-scan report engines.
+#
+# Most report functions in baseline_extraction filter the same big table with the
+# same `cYear = ? AND countryCode IN (...)` clause and then aggregate it in a
+# slightly different way. The engines below read that slice once, feed every row
+# to the accumulators of all reports and write exactly the same CSV files as the
+# individual functions. The helpers reproduce SQLite semantics (NULL handling,
+# SUM/ROUND/ORDER BY behaviour) so the numbers stay byte-for-byte identical.
+#
+# Every row carries a `bodies` weight: 1 for a raw row, the number of water bodies
+# for a cell of the aggregate cubes (baseline_cube). Accumulators marked `weighted`
+# count with it, so the ones that only need cube columns are answered from the cube.
+
+
+def sql_round(value, digits=0):
+    """ROUND(value, digits) with SQLite semantics (always REAL, halves away from zero)"""
+    if value is None:
+        return None
+    value = float(value)
+    if not -4503599627370496.0 <= value <= 4503599627370496.0:
+        return value
+    if digits <= 0:
+        return float(int(value + (-0.5 if value < 0 else 0.5)))
+    return float(Decimal(repr(value)).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP))
+
+
+def sql_sum(total, value):
+    """Adds a value to a running SUM() (NULLs are skipped, an empty SUM stays NULL)"""
+    if value is None:
+        return total
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            try:
+                value = float(value)
+            except ValueError:
+                value = 0.0
+    return value if total is None else total + value
+
+
+def sql_percent(part, total):
+    """part * 100.0 / NULLIF(total, 0)"""
+    if part is None or total is None or total == 0:
+        return None
+    return part * 100.0 / total
+
+
+def ordered(groups):
+    """Items of an aggregation dict in GROUP BY / ORDER BY order"""
+    return sorted(groups.items(), key=lambda item: sql_sort_key(item[0]))
+
+
+def percent_of_group(items, group_of, digits=0):
+    """
+    Percentages of ordered (key, value) items within the groups given by group_of(key),
+    rounded with the largest remainder method so every group adds up to exactly 100.
+    Items of a group whose total is 0 get 0.
+    Python twin of baseline_extraction.percent_of_group_sql (same floats, same ties).
+    """
+    scale = 10 ** digits
+    totals = {}
+    for key, value in items:
+        totals[group_of(key)] = totals.get(group_of(key), 0) + value
+
+    shares = []
+    for key, value in items:
+        total = totals[group_of(key)]
+        shares.append(value * float(100 * scale) / total if total else None)
+
+    floors = {}
+    ranked = {}
+    for i, ((key, _), share) in enumerate(zip(items, shares)):
+        group = group_of(key)
+        if share is not None:
+            floors[group] = floors.get(group, 0) + int(share)
+            ranked.setdefault(group, []).append((-(share - int(share)), i))
+
+    bonus = set()
+    for group, remainders in ranked.items():
+        bonus.update(i for _, i in sorted(remainders)[:100 * scale - floors[group]])
+
+    return [0 if share is None else sql_round((int(share) + (i in bonus)) * 1.0 / scale, digits)
+            for i, share in enumerate(shares)]
+
+
+def bump(groups, key, n=1):
+    groups[key] = groups.get(key, 0) + n
+
+
+def known(value, *excluded):
+    """`value NOT IN (excluded)`, which is never true for NULL"""
+    return value is not None and value not in excluded
+
+
+WDF_CODES = ("RW", "LW", "TW", "CW", "TeW")
+WATER_BODY_TYPES = ("Natural water body", "Heavily modified water body", "Artificial water body")
+ECO_STATUS = ("1", "2", "3", "4", "5", "unknown")
+ACHIEVEMENT_DATES = ("Good status already achieved", "Less stringent objectives already achieved",
+                     "2016--2021", "2022--2027", "Beyond 2027", "Unknown")
+
+
+# ---------------------------------------------------------------------------
+# Surface water reports over SOW_SWB_SurfaceWaterBody
+# ---------------------------------------------------------------------------
+
+class SWB_Table:
+    """WISE_SOW_SurfaceWaterBody_SWB_Table"""
+    columns = ("euSurfaceWaterBodyCode", "cLength", "cArea")
+
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, r):
+        g = self.groups.get(r.countryCode)
+        if g is None:
+            g = self.groups[r.countryCode] = [0, None, None, [], []]
+        if r.euSurfaceWaterBodyCode is not None:
+            g[0] += 1
+        g[1] = sql_sum(g[1], r.cLength)
+        g[2] = sql_sum(g[2], r.cArea)
+        if r.cLength is not None:
+            g[3].append(r.cLength)
+        if r.cArea is not None:
+            g[4].append(r.cArea)
+
+    def outputs(self, cYear):
+        headers = ['Country', 'Year', 'Number', 'Number (%)', 'Length (km)', 'Length (%)',
+                   'Area (km^2)', 'Area (%)', 'Median Length (km)', 'Median Area (km^2)']
+        rows = []
+        for country, (count, length, area, lengths, areas) in ordered(self.groups):
+            median_length = sql_median(lengths)
+            median_area = sql_median(areas)
+            rows.append([country, cYear, count, sql_round(sql_percent(count, count)),
+                         sql_round(length), sql_round(sql_percent(length, length)),
+                         sql_round(area), sql_round(sql_percent(area, area)),
+                         sql_round(0 if median_length is None else median_length),
+                         sql_round(0 if median_area is None else median_area)])
+        return [(f"1.surfaceWaterBodyNumberAndSite{cYear}.csv", headers, rows, None)]
+
+
+class SWB_Category:
+    """WISE_SOW_SurfaceWaterBody_SWB_Category"""
+    columns = ("surfaceWaterBodyCategory", "naturalAWBHMWB")
+    weighted = True
+
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, r):
+        if r.surfaceWaterBodyCategory in WDF_CODES and r.naturalAWBHMWB in WATER_BODY_TYPES:
+            bump(self.groups, (r.countryCode, r.surfaceWaterBodyCategory, r.naturalAWBHMWB), r.bodies)
+
+    def outputs(self, cYear):
+        headers = ["Country", "Year", "Surface Water Body Category", "Type", "Total"]
+        rows = [[country, cYear, category, kind, total]
+                for (country, category, kind), total in ordered(self.groups)]
+        return [(f"3.surfaceWaterBodyCategory{cYear}.csv", headers, rows, None)]
+
+
+class SWB_ChemicalStatus_Table:
+    """WISE_SOW_SurfaceWaterBody_SWB_ChemicalStatus_Table"""
+    columns = ("euSurfaceWaterBodyCode", "swChemicalStatusValue", "cLength", "cArea",
+               "surfaceWaterBodyCategory", "naturalAWBHMWB")
+
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, r):
+        if (r.swChemicalStatusValue in ("2", "3")
+                and known(r.surfaceWaterBodyCategory, 'Unpopulated')
+                and known(r.naturalAWBHMWB, 'Unpopulated', 'Unknown')):
+            g = self.groups.get((r.countryCode, r.swChemicalStatusValue))
+            if g is None:
+                g = self.groups[(r.countryCode, r.swChemicalStatusValue)] = [set(), None, None]
+            if r.euSurfaceWaterBodyCode is not None:
+                g[0].add(r.euSurfaceWaterBodyCode)
+            g[1] = sql_sum(g[1], r.cLength)
+            if r.surfaceWaterBodyCategory != 'RW':
+                g[2] = sql_sum(g[2], r.cArea)
+
+    def outputs(self, cYear):
+        headers = ['Country', 'Year', "Chemical Status Value", 'Number', 'Number(%)', 'Length (km)',
+                   'Length(%)', 'Area (km^2)', 'Area(%)']
+        groups = ordered(self.groups)
+        totals = {}
+        for (country, _), (codes, length, area) in groups:
+            t = totals.setdefault(country, [None, None, None])
+            t[0] = sql_sum(t[0], len(codes))
+            t[1] = sql_sum(t[1], length)
+            t[2] = sql_sum(t[2], area)
+        rows = []
+        for (country, status), (codes, length, area) in groups:
+            total_count, total_length, total_area = totals[country]
+            rows.append([country, cYear, status, len(codes),
+                         sql_round(sql_percent(len(codes), total_count)),
+                         sql_round(length), sql_round(sql_percent(length, total_length)),
+                         sql_round(area), sql_round(sql_percent(area, total_area))])
+        return [(f"12.surfaceWaterBodyChemicalStatusGood{cYear}.csv", headers, rows, None)]
+
+
+class SWB_ChemicalStatus_by_Category:
+    """SurfaceWaterBody_ChemicalStatus_Table_by_Category"""
+    columns = ("surfaceWaterBodyCategory", "swChemicalStatusValue")
+    weighted = True
+
+    def __init__(self):
+        self.groups = {}
+        self.totals = {}
+
+    def add(self, r):
+        if known(r.swChemicalStatusValue, 'Unpopulated') and r.surfaceWaterBodyCategory in WDF_CODES:
+            bump(self.groups, (r.countryCode, r.surfaceWaterBodyCategory, r.swChemicalStatusValue), r.bodies)
+            bump(self.totals, (r.countryCode, r.surfaceWaterBodyCategory), r.bodies)
+
+    def outputs(self, cYear):
+        headers = ['Country', 'Year', 'Surface Water Body Category', 'Chemical Status Value', 'Number', 'Number(%)']
+        rows = [[country, cYear, category, status, n,
+                 sql_round(sql_percent(n, self.totals[(country, category)]))]
+                for (country, category, status), n in ordered(self.groups)
+                if status in ("2", "3", "unknown")]
+        return [(f"12.SurfaceWaterBody_SWB_ChemicalStatus_Table_by_Category{cYear}.csv", headers, rows, None)]
+
+
+class SWB_EcologicalStatusGroup:
+    """Surface_water_bodies_Ecological_status_or_potential_groupGoodHigh / groupFailling"""
+    columns = ("swEcologicalStatusOrPotentialValue", "cLength", "cArea",
+               "surfaceWaterBodyCategory", "naturalAWBHMWB")
+    weighted = True
+
+    def __init__(self, statuses, file_name):
+        self.statuses = statuses
+        self.file_name = file_name
+        self.groups = {}
+
+    def add(self, r):
+        if (r.swEcologicalStatusOrPotentialValue in self.statuses
+                and known(r.surfaceWaterBodyCategory, 'Unpopulated')
+                and known(r.naturalAWBHMWB, 'Unknown', 'Unpopulated')):
+            g = self.groups.get(r.countryCode)
+            if g is None:
+                g = self.groups[r.countryCode] = [0, None, None]
+            g[0] += r.bodies
+            if r.surfaceWaterBodyCategory == 'RW':
+                g[1] = sql_sum(g[1], r.cLength)
+            else:
+                g[2] = sql_sum(g[2], r.cArea)
+
+    def outputs(self, cYear):
+        headers = ["Country", "Year", "Number", "Number(%)", "Length (km)", "Length(%)", "Area (km^2)", "Area(%)"]
+        rows = [[country, cYear, n, sql_round(sql_percent(n, n)),
+                 sql_round(length), sql_round(sql_percent(length, length)),
+                 sql_round(area), sql_round(sql_percent(area, area))]
+                for country, (n, length, area) in ordered(self.groups)]
+        return [(self.file_name.format(cYear=cYear), headers, rows, None)]
+
+
+class SWB_EcologicalStatus_by_Category:
+    """swEcologicalStatusOrPotential_RW_LW_Category2ndRBMP2016 / swEcologicalStatusOrPotential_Unknown_Category2ndRBMP2016"""
+    columns = ("surfaceWaterBodyCategory", "swEcologicalStatusOrPotentialValue")
+    weighted = True
+
+    def __init__(self, categories, statuses, file_name):
+        self.categories = categories
+        self.statuses = statuses
+        self.file_name = file_name
+        self.groups = {}
+
+    def add(self, r):
+        if r.surfaceWaterBodyCategory in self.categories and r.swEcologicalStatusOrPotentialValue in self.statuses:
+            bump(self.groups, (r.countryCode, r.surfaceWaterBodyCategory, r.swEcologicalStatusOrPotentialValue), r.bodies)
+
+    def outputs(self, cYear):
+        headers = ["Country", "Year", "Surface Water Body Category", "Ecological Status Or Potential Value", "Number"]
+        rows = [[country, cYear, category, status, n]
+                for (country, category, status), n in ordered(self.groups)]
+        return [(self.file_name.format(cYear=cYear), headers, rows, None)]
+
+
+class SWB_Status_by_Country:
+    """swEcologicalStatusOrPotentialChemical_by_Country"""
+    columns = ("naturalAWBHMWB", "swEcologicalStatusOrPotentialValue", "swChemicalStatusValue")
+    weighted = True
+
+    def __init__(self):
+        self.totals = {}
+        self.eco = {}
+        self.chem = {}
+
+    def add(self, r):
+        if known(r.naturalAWBHMWB, 'Unpopulated'):
+            bump(self.totals, r.countryCode, r.bodies)
+            bump(self.eco, (r.countryCode, r.swEcologicalStatusOrPotentialValue), r.bodies)
+            bump(self.chem, (r.countryCode, r.swChemicalStatusValue), r.bodies)
+
+    def outputs(self, cYear):
+        eco_rows = [[country, status, n, sql_round(sql_percent(n, self.totals[country]))]
+                    for (country, status), n in ordered(self.eco)]
+        chem_rows = [[country, status, n, sql_round(sql_percent(n, self.totals[country]))]
+                     for (country, status), n in ordered(self.chem)]
+        return [
+            (f"15.swEcologicalStatusOrPotential_by_Country{cYear}.csv",
+             ["Country", "Ecological Status Or Potential Value", "Number", "Number(%)"], eco_rows, None),
+            (f"15.swChemicalStatusValue_by_Country{cYear}.csv",
+             ["Country", "Chemical Status Value", "Number", "Number(%)"], chem_rows, None),
+        ]
+
+
+class SWB_Status_by_Country_by_Category:
+    """swEcologicalStatusOrPotentialValue_swChemicalStatusValue_by_Country_by_Categ"""
+    columns = ("naturalAWBHMWB", "surfaceWaterBodyCategory",
+               "swEcologicalStatusOrPotentialValue", "swChemicalStatusValue")
+    weighted = True
+
+    def __init__(self):
+        self.eco = {}
+        self.eco_totals = {}
+        self.chem = {}
+        self.chem_totals = {}
+
+    def add(self, r):
+        if not known(r.naturalAWBHMWB, 'Unpopulated') or not known(r.surfaceWaterBodyCategory, 'Unpopulated'):
+            return
+        if r.surfaceWaterBodyCategory in WDF_CODES and r.swEcologicalStatusOrPotentialValue in ECO_STATUS:
+            bump(self.eco, (r.countryCode, r.surfaceWaterBodyCategory, r.swEcologicalStatusOrPotentialValue), r.bodies)
+            bump(self.eco_totals, (r.countryCode, r.surfaceWaterBodyCategory), r.bodies)
+        if r.swChemicalStatusValue in ("2", "3", "unknown"):
+            bump(self.chem, (r.countryCode, r.surfaceWaterBodyCategory, r.swChemicalStatusValue), r.bodies)
+            bump(self.chem_totals, (r.countryCode, r.surfaceWaterBodyCategory), r.bodies)
+
+    def outputs(self, cYear):
+        eco_rows = [[country, cYear, category, status, n,
+                     sql_round(sql_percent(n, self.eco_totals[(country, category)]))]
+                    for (country, category, status), n in ordered(self.eco)]
+        chem_rows = [[country, cYear, category, status, n,
+                      sql_round(sql_percent(n, self.chem_totals[(country, category)]))]
+                     for (country, category, status), n in ordered(self.chem)]
+        return [
+            ("15.swEcologicalStatusOrPotentialValue_swChemicalStatusValue_by_Country_by_Categ.csv",
+             ['Country', 'Year', 'Categories', 'Ecological Status Value', 'Number', 'Number(%)'], eco_rows, None),
+            (f"15.swChemicalStatusValue_by_Country_by_Categ{cYear}.csv",
+             ['Country', 'Year', 'Categories', 'Chemical Status Value', 'Number', 'Number(%)'], chem_rows, None),
+        ]
+
+
+class SWB_Chemical_assessment:
+    """swb_Chemical_assessment_using_monitoring_grouping_or_expert_judgement"""
+    columns = ("swChemicalAssessmentConfidence", "swChemicalMonitoringResults")
+
+    def __init__(self):
+        self.groups = {}
+        self.totals = {}
+
+    def add(self, r):
+        confidence = r.swChemicalAssessmentConfidence
+        if confidence in ("High", "Medium", "Low", "Unknown"):
+            bump(self.totals, (r.countryCode, confidence))
+            if r.swChemicalMonitoringResults in ("Missing", "Expert judgement", "Monitoring", "Grouping"):
+                bump(self.groups, (r.countryCode, confidence, r.swChemicalMonitoringResults))
+
+    def outputs(self, cYear):
+        headers = ["Country", "Year", "Chemical Assessment Confidence", "Chemical Monitoring Results", "Number", "Number(%)"]
+        rows = [[country, cYear, confidence, results, n,
+                 sql_round(sql_percent(n, self.totals[(country, confidence)]))]
+                for (country, confidence, results), n in ordered(self.groups)]
+        return [("39.swb_Chemical_assessment_using_monitoring_grouping_or_expert_judgement2016.csv", headers, rows, None)]
+
+
+class SWB_EcologicalExpectedGoodIn2015:
+    """swEcologicalStatusOrPotentialExpectedGoodIn2015"""
+    columns = ("naturalAWBHMWB", "swEcologicalStatusOrPotentialValue", "swEcologicalStatusOrPotentialExpectedGoodIn2015")
+
+    def __init__(self):
+        self.groups = {}
+        self.totals = {}
+
+    def add(self, r):
+        expected = r.swEcologicalStatusOrPotentialExpectedGoodIn2015
+        if (known(r.naturalAWBHMWB, 'Unpopulated')
+                and known(r.swEcologicalStatusOrPotentialValue, 'inapplicable', 'Unpopulated')
+                and expected in ('Yes', 'No')):
+            bump(self.totals, r.countryCode)
+            bump(self.groups, (r.countryCode, expected))
+
+    def outputs(self, cYear):
+        headers = ["Country", "Ecological Status Or Potential Expected Good In 2015", "Number", "Number(%)"]
+        rows = [[country, expected, n, sql_round(sql_percent(n, self.totals[country]))]
+                for (country, expected), n in ordered(self.groups)]
+        return [("44.swEcologicalStatusOrPotentialExpectedGoodIn2015.csv", headers, rows, None)]
+
+
+class SWB_EcologicalExpectedAchievementDate:
+    """swEcologicalStatusOrPotentialExpectedAchievementDate"""
+    columns = ("euSurfaceWaterBodyCode", "naturalAWBHMWB", "swEcologicalStatusOrPotentialValue",
+               "swEcologicalStatusOrPotentialExpectedGoodIn2015", "swEcologicalStatusOrPotentialExpectedAchievementDate")
+
+    def __init__(self):
+        self.groups = {}
+        self.totals = {}
+
+    def add(self, r):
+        if (known(r.naturalAWBHMWB, 'Unpopulated')
+                and known(r.swEcologicalStatusOrPotentialValue, 'inapplicable', 'Unpopulated')
+                and known(r.swEcologicalStatusOrPotentialExpectedGoodIn2015, 'Unpopulated')):
+            counted = 1 if r.euSurfaceWaterBodyCode is not None else 0
+            bump(self.totals, r.countryCode, counted)
+            if r.swEcologicalStatusOrPotentialExpectedAchievementDate in ACHIEVEMENT_DATES:
+                bump(self.groups, (r.countryCode, r.swEcologicalStatusOrPotentialExpectedAchievementDate), counted)
+
+    def outputs(self, cYear):
+        headers = ["Country", "Year", "Ecological Status Or Potential Expected Achievement Date", "Number", "Number(%)"]
+        rows = [[country, cYear, date, n, sql_round(sql_percent(n, self.totals[country]))]
+                for (country, date), n in ordered(self.groups)]
+        return [("45.swEcologicalStatusOrPotentialExpectedAchievementDate2016.csv", headers, rows, None)]
+
+
+class SWB_ChemicalExpectedGoodIn2015:
+    """swChemicalStatusExpectedGoodIn2015"""
+    columns = ("surfaceWaterBodyCategory", "swChemicalStatusValue", "swChemicalStatusExpectedGoodIn2015")
+
+    def __init__(self):
+        self.groups = {}
+        self.totals = {}
+
+    def add(self, r):
+        expected = r.swChemicalStatusExpectedGoodIn2015
+        if known(r.surfaceWaterBodyCategory, 'Unpopulated') and known(r.swChemicalStatusValue, 'Unpopulated'):
+            if known(expected, 'Unpopulated'):
+                bump(self.totals, r.countryCode)
+            if expected in ("Yes", "No"):
+                bump(self.groups, (r.countryCode, expected))
+
+    def outputs(self, cYear):
+        headers = ["Country", "Chemical Status Expected Good In 2015", "Number", "Number(%)"]
+        rows = [[country, expected, n, sql_round(sql_percent(n, self.totals[country]), 1)]
+                for (country, expected), n in ordered(self.groups)]
+        return [("46.swChemicalStatusExpectedGoodIn2015.csv", headers, rows, None)]
+
+
+class SWB_ChemicalExpectedAchievementDate:
+    """swChemicalStatusExpectedAchievementDate"""
+    columns = ("swChemicalStatusExpectedAchievementDate",)
+
+    def __init__(self):
+        self.groups = {}
+        self.totals = {}
+
+    def add(self, r):
+        date = r.swChemicalStatusExpectedAchievementDate
+        if known(date, 'Unpopulated'):
+            bump(self.totals, r.countryCode)
+            if date in ACHIEVEMENT_DATES:
+                bump(self.groups, (r.countryCode, date))
+
+    def outputs(self, cYear):
+        headers = ["Country", "Year", "Chemical Status Expected Achievement Date", "Number", "Number(%)"]
+        rows = [[country, cYear, date, n, sql_round(sql_percent(n, self.totals[country]))]
+                for (country, date), n in ordered(self.groups)]
+        return [("47.swChemicalStatusExpectedAchievementDate2016.csv", headers, rows, None)]
+
+
+class SWB_Chemical_by_Country:
+    """swChemical_by_Country_2016"""
+    columns = ("naturalAWBHMWB", "swChemicalStatusValue")
+    weighted = True
+
+    def __init__(self):
+        self.groups = {}
+        self.totals = {}
+
+    def add(self, r):
+        if known(r.naturalAWBHMWB, 'Unpopulated'):
+            counted = r.bodies if r.swChemicalStatusValue is not None else 0
+            bump(self.totals, r.countryCode, counted)
+            bump(self.groups, (r.countryCode, r.swChemicalStatusValue), counted)
+
+    def outputs(self, cYear):
+        headers = ["Country", "Year", "Chemical Status Value", "Number", "Number (%)"]
+        rows = [[country, cYear, status, n, sql_round(sql_percent(n, self.totals[country]))]
+                for (country, status), n in ordered(self.groups)]
+        return [("14.swChemical_by_Country.csv", headers, rows, None)]
+
+
+class SWB_Failing_notUnknown_by_Country:
+    """Surface_water_bodies_Failing_notUnknown_by_Country"""
+    columns = ("swChemicalStatusValue", "cArea")
+    weighted = True
+
+    def __init__(self):
+        self.known_area = {}
+        self.failing_area = {}
+
+    def add(self, r):
+        if known(r.swChemicalStatusValue, 'Unpopulated'):
+            self.known_area[r.countryCode] = sql_sum(self.known_area.get(r.countryCode), r.cArea)
+        if r.swChemicalStatusValue == '3':
+            self.failing_area[r.countryCode] = sql_sum(self.failing_area.get(r.countryCode), r.cArea)
+
+    def outputs(self, cYear):
+        headers = ["Country", "Known Status", "Failing Status", "Failing (%)"]
+        rows = []
+        for country, known_area in ordered(self.known_area):
+            failing = self.failing_area.get(country)
+            failing = 0 if failing is None else failing
+            rows.append([country, sql_round(known_area), sql_round(failing),
+                         sql_round(sql_percent(failing, known_area))])
+        return [(f"16.Surface_water_bodies_Failing_notUnknown_by_Country{cYear}.csv", headers, rows, "utf-8")]
+
+
+class SWB_Delineation:
+    """sw_delineation_of_the_management_units_in_the_1st_and_2nd_RBMP"""
+    columns = ("euSurfaceWaterBodyCode", "wiseEvolutionType")
+
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, r):
+        g = self.groups.get(r.countryCode)
+        if g is None:
+            g = self.groups[r.countryCode] = [0, 0, 0]
+        if r.euSurfaceWaterBodyCode is not None:
+            g[0] += 1
+            if r.wiseEvolutionType in ('noChange', 'changeCode', 'change'):
+                g[1] += 1
+            elif r.wiseEvolutionType is not None:
+                g[2] += 1
+
+    def outputs(self, cYear):
+        headers = ['Country', 'Year', 'Unchanged', 'Unchanged (%)', 'Other', 'Other (%)']
+        rows = [[country, cYear, unchanged, sql_round(sql_percent(unchanged, total)),
+                 other, sql_round(sql_percent(other, total))]
+                for country, (total, unchanged, other) in ordered(self.groups)]
+        return [(f"9.1.sw_delineation_of_the_management_units_in_the_1st_and_2nd_RBMP_Unchanged_{cYear}.csv",
+                 headers, rows, "utf-8")]
+
+
+# Report function name -> accumulator factory. The names match the functions in
+# baseline_extraction so callers can ask for a subset of the reports.
+SW_REPORTS = {
+    "WISE_SOW_SurfaceWaterBody_SWB_Table": SWB_Table,
+    "WISE_SOW_SurfaceWaterBody_SWB_Category": SWB_Category,
+    "WISE_SOW_SurfaceWaterBody_SWB_ChemicalStatus_Table": SWB_ChemicalStatus_Table,
+    "SurfaceWaterBody_ChemicalStatus_Table_by_Category": SWB_ChemicalStatus_by_Category,
+    "Surface_water_bodies_Ecological_status_or_potential_groupGoodHigh": lambda: SWB_EcologicalStatusGroup(
+        ("1", "2"), "8.Surface_water_bodies_Ecological_status_or_potential_group_Good_High{cYear}.csv"),
+    "Surface_water_bodies_Ecological_status_or_potential_groupFailling": lambda: SWB_EcologicalStatusGroup(
+        ("3", "4", "5"), "8.Surface_water_bodies_Ecological_status_or_potential_group_Failing{cYear}.csv"),
+    "swEcologicalStatusOrPotential_RW_LW_Category2ndRBMP2016": lambda: SWB_EcologicalStatus_by_Category(
+        WDF_CODES, ECO_STATUS, "8.swEcologicalStatusOrPotential_RW_LW_Category2ndRBMP2016.csv"),
+    "swEcologicalStatusOrPotential_Unknown_Category2ndRBMP2016": lambda: SWB_EcologicalStatus_by_Category(
+        ("RW", "LW", "TW", "CW"), ("unknown",), "9.swEcologicalStatusOrPotential_Unknown_Category2ndRBMP{cYear}.csv"),
+    "swEcologicalStatusOrPotentialChemical_by_Country": SWB_Status_by_Country,
+    "swEcologicalStatusOrPotentialValue_swChemicalStatusValue_by_Country_by_Categ": SWB_Status_by_Country_by_Category,
+    "swb_Chemical_assessment_using_monitoring_grouping_or_expert_judgement": SWB_Chemical_assessment,
+    "swEcologicalStatusOrPotentialExpectedGoodIn2015": SWB_EcologicalExpectedGoodIn2015,
+    "swEcologicalStatusOrPotentialExpectedAchievementDate": SWB_EcologicalExpectedAchievementDate,
+    "swChemicalStatusExpectedGoodIn2015": SWB_ChemicalExpectedGoodIn2015,
+    "swChemicalStatusExpectedAchievementDate": SWB_ChemicalExpectedAchievementDate,
+    "swChemical_by_Country_2016": SWB_Chemical_by_Country,
+    "Surface_water_bodies_Failing_notUnknown_by_Country": SWB_Failing_notUnknown_by_Country,
+    "sw_delineation_of_the_management_units_in_the_1st_and_2nd_RBMP": SWB_Delineation,
+}
+
+
+# ---------------------------------------------------------------------------
+# Groundwater reports over SOW_GWB_GroundWaterBody
+# ---------------------------------------------------------------------------
+
+class GWB_Category:
+    """GroundWaterBodyCategory2016 (the percentages are shares of all requested countries)"""
+    columns = ("groundWaterBodyName", "cArea")
+
+    def __init__(self):
+        self.groups = {}
+        self.total_number = 0
+        self.total_area = None
+
+    def add(self, r):
+        g = self.groups.get(r.countryCode)
+        if g is None:
+            g = self.groups[r.countryCode] = [0, None, []]
+        if r.groundWaterBodyName is not None:
+            g[0] += 1
+            self.total_number += 1
+        g[1] = sql_sum(g[1], r.cArea)
+        self.total_area = sql_sum(self.total_area, r.cArea)
+        if r.cArea is not None:
+            g[2].append(r.cArea)
+
+    def outputs(self, cYear):
+        headers = ["Country", "Year", "Number", "Number(%)", "Area", "Area(%)", "Median Area (km^2)"]
+        rows = []
+        for country, (number, area, areas) in ordered(self.groups):
+            median_area = sql_median(areas)
+            rows.append([country, cYear, number, sql_round(sql_percent(number, self.total_number)),
+                         sql_round(area), sql_round(sql_percent(area, self.total_area)),
+                         sql_round(0 if median_area is None else median_area)])
+        return [(f"2.GroundWaterBodyCategory{cYear}.csv", headers, rows, None)]
+
+
+class GWB_AreaShare:
+    """
+    The common groundwater report shape: SUM(cArea) per value of one column, as a
+    percentage of a per-country TotalArea, optionally with COUNT(DISTINCT euGroundWaterBodyCode).
+    """
+
+    def __init__(self, file_name, headers, column, values, columns=(), total=None, group=None,
+                 percent=True, percent_of_rounded=False, number=False):
+        self.file_name = file_name
+        self.headers = headers
+        self.column = column
+        self.values = values
+        self.columns = (column, "cArea") + (("euGroundWaterBodyCode",) if number else ()) + tuple(columns)
+        self.total = total
+        self.group = group
+        self.percent = percent
+        self.percent_of_rounded = percent_of_rounded
+        self.number = number
+        self.weighted = True
+        self.totals = {}
+        self.groups = {}
+
+    def add(self, r):
+        if self.percent and (self.total is None or self.total(r)):
+            self.totals[r.countryCode] = sql_sum(self.totals.get(r.countryCode), r.cArea)
+        value = getattr(r, self.column)
+        if value in self.values and (self.group is None or self.group(r)):
+            g = self.groups.get((r.countryCode, value))
+            if g is None:
+                g = self.groups[(r.countryCode, value)] = [None, set()]
+            g[0] = sql_sum(g[0], r.cArea)
+            if self.number and r.euGroundWaterBodyCode is not None:
+                g[1].add(r.euGroundWaterBodyCode)
+
+    def outputs(self, cYear):
+        rows = []
+        for (country, value), (area, codes) in ordered(self.groups):
+            row = [country, cYear, value, sql_round(area)]
+            if self.percent:
+                # JOIN TotalArea: countries without a total row are dropped
+                if country not in self.totals:
+                    continue
+                part = sql_round(area) if self.percent_of_rounded else area
+                row.append(sql_round(sql_percent(part, self.totals[country])))
+            if self.number:
+                row.append(len(codes))
+            rows.append(row)
+        return [(self.file_name.format(cYear=cYear), self.headers, rows, None)]
+
+
+class GWB_Quantitative_Chemical_Percent:
+    """gwQuantitativeStatusValue_gwChemicalStatusValue"""
+
+    def __init__(self):
+        self.quantitative = GWB_AreaShare(
+            "22.gwQuantitativeStatusValue_Percent_Country_{cYear}.csv",
+            ["Country", "Year", "Quantitative Status Value", "Area (km^2)", "Area (%)"],
+            "gwQuantitativeStatusValue", ("2", "3", "unknown"), percent_of_rounded=True)
+        self.chemical = GWB_AreaShare(
+            "22.gwChemicalStatusValue_Percent_Country_{cYear}.csv",
+            ["Country", "Year", "Chemical Status Value", "Area (km^2)", "Area (%)"],
+            "gwChemicalStatusValue", ("2", "3"), percent_of_rounded=True)
+        self.columns = self.quantitative.columns + self.chemical.columns
+        self.weighted = True
+
+    def add(self, r):
+        self.quantitative.add(r)
+        self.chemical.add(r)
+
+    def outputs(self, cYear):
+        return self.quantitative.outputs(cYear) + self.chemical.outputs(cYear)
+
+
+class GWB_Number_failing:
+    """Number_of_groundwater_bodies_failing_to_achieve_good_status"""
+    columns = ("euGroundWaterBodyCode", "gwChemicalStatusValue", "gwQuantitativeStatusValue")
+
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, r):
+        g = self.groups.get(r.countryCode)
+        if g is None:
+            g = self.groups[r.countryCode] = [set(), set(), set()]
+        code = r.euGroundWaterBodyCode
+        if code is None:
+            return
+        if r.gwChemicalStatusValue == '2' and r.gwQuantitativeStatusValue == '2':
+            g[0].add(code)
+        if r.gwChemicalStatusValue == '3' or r.gwQuantitativeStatusValue == '3':
+            g[1].add(code)
+        g[2].add(code)
+
+    def outputs(self, cYear):
+        headers = ["Country", "Year", "Good", "Failing", "Number"]
+        rows = [[country, cYear, len(good), len(failing), len(total)]
+                for country, (good, failing, total) in ordered(self.groups)]
+        return [("37.Number_of_groundwater_bodies_failing_to_achieve_good_status.csv", headers, rows, None)]
+
+
+class GWB_GeologicalFormation:
+    """geologicalFormation"""
+    columns = ("geologicalFormation", "gwQuantitativeStatusValue", "cArea")
+    weighted = True
+    formations = ("Porous aquifers - highly productive", "Porous aquifers - moderately productive",
+                  "Fissured aquifers including karst - highly productive",
+                  "Fissured aquifers including karst - moderately productive",
+                  "Fractured aquifers - highly productive", "Fractured aquifers - moderately productive")
+
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, r):
+        if r.geologicalFormation in self.formations and known(r.gwQuantitativeStatusValue, 'unknown'):
+            key = (r.countryCode, r.geologicalFormation)
+            self.groups[key] = sql_sum(self.groups.get(key), r.cArea)
+
+    def outputs(self, cYear):
+        headers = ["Country", "Year", "Geological Formation", "Area (km^2)"]
+        rows = [[country, cYear, formation, sql_round(area)]
+                for (country, formation), area in ordered(self.groups)]
+        return [("38.GWB_geologicalFormation2016.csv", headers, rows, None)]
+
+
+class GWB_Failing_notUnknown_by_Country:
+    """Ground_water_bodies_Failing_notUnknown_by_Country"""
+    columns = ("gwChemicalStatusValue", "gwQuantitativeStatusValue", "cArea")
+    weighted = True
+
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, r):
+        if known(r.gwChemicalStatusValue, 'unknown'):
+            g = self.groups.get(r.countryCode)
+            if g is None:
+                g = self.groups[r.countryCode] = [None, None]
+            g[0] = sql_sum(g[0], r.cArea)
+            failing = r.gwChemicalStatusValue == '3' or r.gwQuantitativeStatusValue == '3'
+            g[1] = sql_sum(g[1], r.cArea if failing else 0)
+
+    def outputs(self, cYear):
+        headers = ["Country", "Known Status", "Failing status", "Failing(%)"]
+        rows = []
+        for country, (total_area, failing) in ordered(self.groups):
+            # Same Python rounding and per-country normalisation as the original report
+            known_status, failing_status = sql_round(total_area), sql_round(failing)
+            failing_percentage = round((failing_status * 100.0) / total_area, 0) if total_area else 0
+            failing_percentage = round((failing_percentage * 100) / failing_percentage, 0) if failing_percentage else 0
+            rows.append([country, known_status, failing_status, failing_percentage])
+        return [(f"23.Ground_water_bodies_Failing_notUnknown_by_Country{cYear}.csv", headers, rows, None)]
+
+
+def _at_risk_quantitative(r):
+    return (known(r.gwEORiskQuantitative, 'Not in WFD2010', 'None', 'Unpopulated')
+            and known(r.gwAtRiskQuantitative, 'Unpopulated')
+            and known(r.gwQuantitativeStatusValue, 'Unpopulated'))
+
+
+def _at_risk_chemical(r):
+    return (known(r.gwEORiskChemical, 'Unpopulated', 'Not in WFD2010')
+            and known(r.gwAtRiskChemical, 'Unpopulated', 'Not in WFD2010')
+            and known(r.gwChemicalStatusValue, 'Unpopulated'))
+
+
+GW_REPORTS = {
+    "GroundWaterBodyCategory2016": GWB_Category,
+    "SOW_GWB_GroundWaterBody_GWB_Chemical_status": lambda: GWB_AreaShare(
+        "20.GroundWaterBodyCategoryChemical_status2016.csv",
+        ["Country", "Year", "Chemical Status Value", "Area (km^2)", "Area (%)", "Number"],
+        "gwChemicalStatusValue", ("2", "3", "unknown"), number=True),
+    "SOW_GWB_GroundWaterBody_GWB_Quantitative_status": lambda: GWB_AreaShare(
+        "18.GroundWaterBodyCategoryQuantitative_status2016.csv",
+        ["Country", "Year", "Quantitative Status Value", "Area (km^2)", "Number"],
+        "gwQuantitativeStatusValue", ("2", "3", "unknown"), percent=False, number=True),
+    "gwQuantitativeStatusValue_gwChemicalStatusValue": GWB_Quantitative_Chemical_Percent,
+    "Groundwater_bodies_At_risk_of_failing_to_achieve_good_quantitative_status": lambda: GWB_AreaShare(
+        "25.Groundwater_bodies_At_risk_of_failing_to_achieve_good_quantitative_status2016.csv",
+        ["Country", "Year", "Quantitative Status Value", "Area (km^2)", "Area (%)", "Number"],
+        "gwAtRiskQuantitative", ("Yes", "No"),
+        columns=("gwEORiskQuantitative", "gwQuantitativeStatusValue"),
+        total=_at_risk_quantitative, group=_at_risk_quantitative, number=True),
+    "gwChemicalStatusValue_Table": lambda: GWB_AreaShare(
+        "26.gwChemicalStatusValue_Table2016.csv",
+        ["Country", "Year", "Chemical Status Value", "Area (km^2)", "Area (%)", "Number"],
+        "gwAtRiskChemical", ("No", "Yes"),
+        columns=("gwEORiskChemical", "gwChemicalStatusValue"),
+        total=_at_risk_chemical, group=_at_risk_chemical, number=True),
+    "gwQuantitativeStatusExpectedGoodIn2015": lambda: GWB_AreaShare(
+        "29.gwQuantitativeStatusExpectedGoodIn2015.csv",
+        ["Country", "Year", "Quantitative Status Expected Good In 2015", "Area (km^2)", "Area(%)"],
+        "gwQuantitativeStatusExpectedGoodIn2015", ("Yes", "No"), columns=("gwQuantitativeStatusValue",),
+        total=lambda r: (known(r.gwQuantitativeStatusValue, 'Unpopulated')
+                         and known(r.gwQuantitativeStatusExpectedGoodIn2015, 'Unpopulated'))),
+    "gwQuantitativeStatusExpectedAchievementDate": lambda: GWB_AreaShare(
+        "30.gwQuantitativeStatusExpectedAchievementDate2016.csv",
+        ["Country", "Year", "Quantitative Status Expected Date", "Area (km^2)", "Area(%)"],
+        "gwQuantitativeStatusExpectedAchievementDate", ACHIEVEMENT_DATES,
+        total=lambda r: known(r.gwQuantitativeStatusExpectedAchievementDate, 'Unpopulated')),
+    "gwChemicalStatusExpectedGoodIn2015": lambda: GWB_AreaShare(
+        "31.gwChemicalStatusExpectedGoodIn2015.csv",
+        ["Country", "Year", "Chemical Status Expected Achievement Date", "Area (km^2)", "Area(%)"],
+        "gwChemicalStatusExpectedGoodIn2015", ("Yes", "No"), columns=("gwChemicalStatusValue",),
+        total=lambda r: (known(r.gwChemicalStatusValue, 'Unpopulated')
+                         and known(r.gwChemicalStatusExpectedGoodIn2015, 'Unpopulated'))),
+    "gwChemicalStatusExpectedAchievementDate": lambda: GWB_AreaShare(
+        "32.gwChemicalStatusExpectedAchievementDate2016.csv",
+        ["Country", "Year", "Chemical Status Expected Achievement Date", "Area (km^2)", "Area(%)"],
+        "gwChemicalStatusExpectedAchievementDate", ACHIEVEMENT_DATES,
+        total=lambda r: known(r.gwChemicalStatusExpectedAchievementDate, 'Unpopulated')),
+    "gwQuantitativeAssessmentConfidence": lambda: GWB_AreaShare(
+        "35.gwQuantitativeAssessmentConfidence2016.csv",
+        ["Country", "Year", "Quantitative Assessment Confidence", "Area (km^2)", "Area(%)"],
+        "gwQuantitativeAssessmentConfidence", ("High", "Medium", "Low", "Unknown"),
+        total=lambda r: known(r.gwQuantitativeAssessmentConfidence, 'Unpopulated')),
+    "gwChemicalAssessmentConfidence": lambda: GWB_AreaShare(
+        "36.gwChemicalAssessmentConfidence2016.csv",
+        ["Country", "Year", "Chemical Assessment Confidence", "Area (km^2)", "Area(%)"],
+        "gwChemicalAssessmentConfidence", ("High", "Medium", "Low", "Unknown"),
+        total=lambda r: known(r.gwChemicalAssessmentConfidence, 'Unpopulated')),
+    "Number_of_groundwater_bodies_failing_to_achieve_good_status": GWB_Number_failing,
+    "geologicalFormation": GWB_GeologicalFormation,
+    "Ground_water_bodies_Failing_notUnknown_by_Country": GWB_Failing_notUnknown_by_Country,
+}
+
+
+# ---------------------------------------------------------------------------
+# Quality element reports over SOW_SWB_QualityElement
+# ---------------------------------------------------------------------------
+
+QE_FAMILIES = ("QE1", "QE2", "QE3-1", "QE3-3")
+QE_MONITORING_RESULTS = ("Monitoring", "Grouping", "Expert judgement", "Unpopulated")
+
+
+@lru_cache(maxsize=None)
+def qe_family(code):
+    """The QE_FAMILIES entry a qeCode belongs to (`qeCode LIKE '<family>%'`), or None"""
+    if code is None:
+        return None
+    code = str(code).upper()
+    return next((family for family in QE_FAMILIES if code.startswith(family)), None)
+
+
+class QE_Assessment:
+    """
+    Surface_water_bodies_QE1_Biological_quality_elements_assessment / QE2 / QE3 / QE3_3:
+    water bodies per monitoring result and code of one quality element family, as a
+    share of the country & code total. QE1 / QE2 round the shares of a group so they add up
+    to 100; QE3 / QE3_3, which only list some of the `results`, round every share on its own.
+
+    With `qualified`, only the codes that have a row with a populated ecological status
+    and natural/AWB/HMWB type in some country of the cycle are reported, so the
+    accumulator observes the rows of every country, not just the requested ones.
+    """
+
+    def __init__(self, family, file_name, encoding=None, digits=0, results=None, qualified=False):
+        self.family = family
+        self.file_name = file_name
+        self.encoding = encoding
+        self.digits = digits
+        self.results = results
+        self.observes = qualified
+        self.observed = set()
+        self.columns = ("qeCode", "qeMonitoringResults", "euSurfaceWaterBodyCode")
+        if qualified:
+            self.columns += ("swEcologicalStatusOrPotentialValue", "naturalAWBHMWB")
+        self.groups = {}
+
+    def observe(self, r):
+        if (qe_family(r.qeCode) == self.family
+                and known(r.swEcologicalStatusOrPotentialValue, 'unpopulated')
+                and known(r.naturalAWBHMWB, 'unpopulated')):
+            self.observed.add(r.qeCode)
+
+    def add(self, r):
+        if qe_family(r.qeCode) == self.family:
+            bump(self.groups, (r.countryCode, r.qeMonitoringResults, r.qeCode),
+                 1 if r.euSurfaceWaterBodyCode is not None else 0)
+
+    def outputs(self, cYear):
+        if self.observes and not self.observed:
+            print(f"⚠️ No {self.family} quality elements found for {cYear}.")
+            return []
+        groups = [(key, n) for key, n in ordered(self.groups) if not self.observes or key[2] in self.observed]
+        if self.results is None:
+            percents = percent_of_group(groups, lambda key: (key[0], key[2]), self.digits)
+        else:
+            # Shares of all the results of the country & code, before the listed ones are kept
+            totals = {}
+            for (country, _, code), n in groups:
+                totals[country, code] = totals.get((country, code), 0) + n
+            percents = [sql_round(sql_percent(n, totals[country, code]), self.digits)
+                        for (country, _, code), n in groups]
+        rows = [[country, result, code, n, percent]
+                for ((country, result, code), n), percent in zip(groups, percents)
+                if self.results is None or result in self.results]
+        headers = ["Country", "Monitoring Results", "Code", "Number", "Number(%)"]
+        return [(self.file_name.format(cYear=cYear), headers, rows, self.encoding)]
+
+
+QE_REPORTS = {
+    "Surface_water_bodies_QE1_Biological_quality_elements_assessment": lambda: QE_Assessment(
+        "QE1", "42.Surface_water_bodies_QE1_Biological_quality_elements_assessment2016.csv"),
+    "Surface_water_bodies_QE2_assessment": lambda: QE_Assessment(
+        "QE2", "42.Surface_water_bodies_QE2_assessment2016.csv"),
+    "Surface_water_bodies_QE3_assessment": lambda: QE_Assessment(
+        "QE3-1", "42.Surface_water_bodies_QE3_assessment{cYear}.csv", "utf-8", digits=1,
+        results=QE_MONITORING_RESULTS, qualified=True),
+    "Surface_water_bodies_QE3_3_assessment": lambda: QE_Assessment(
+        "QE3-3", "42.Surface_water_bodies_QE3_3_assessment{cYear}.csv", "utf-8",
+        results=QE_MONITORING_RESULTS, qualified=True),
+}
+
+
+def run_shared_scan(db_file, table, registry, countryCode, cYear, working_directory, reports=None,
+                    split_countries=False):
+    """
+    Reads the cYear/countryCode slice of `table` once and writes the CSV files of
+    every report in `registry` (or only the ones named in `reports`).
+
+    With split_countries every country gets its own accumulators and its own
+    `working_directory/<country>` folder, so a batch of countries still costs one
+    scan and each folder holds exactly what a single-country run would write.
+    cYear may also be a list of reporting cycles: they are read in the same scan
+    and every cycle is written to its own `<folder>/<cYear>` sub-folder.
+
+    Accumulators that `observe` also need the rows of countries that were not
+    requested; the scan then reads every country of the cycle(s).
+    """
+
+    if not countryCode:
+        print("❌ No country codes provided.")
+        return
+
+    names = list(registry) if reports is None else [name for name in registry if name in reports]
+    per_cycle = isinstance(cYear, (list, tuple))
+    years = list(cYear) if per_cycle else [cYear]
+    targets = {}
+    for country in (countryCode if split_countries else [None]):
+        folder = working_directory if country is None else os.path.join(working_directory, country)
+        for year in years:
+            targets[(country, year)] = os.path.join(folder, str(year)) if per_cycle else folder
+    accumulators = {key: [registry[name]() for name in names] for key in targets}
+
+    conn = create_connection(db_file)
+    if conn is None:
+        print("❌ Database connection failed.")
+        return
+
+    try:
+        # The reports the aggregate cube can answer read its cells, the others the raw rows
+        cube = baseline_cube.CUBES.get(table)
+        use_cube = cube is not None and baseline_cube.cube_available(conn, cube)
+        sample = next(iter(accumulators.values()))
+        from_cube = [use_cube and baseline_cube.serves(cube, acc) for acc in sample]
+
+        for cells in (True, False):
+            served = [i for i, flag in enumerate(from_cube) if flag == cells]
+            if not served:
+                continue
+            columns = ["countryCode", "cYear"]
+            for i in served:
+                columns += [col for col in dict.fromkeys(sample[i].columns) if col not in columns]
+            Row = namedtuple("Row", columns + ["bodies"])
+
+            # One accumulator per observing report and cycle sees the rows of every
+            # country; its siblings in the other country folders share what it observed
+            observers = {}
+            for year in years:
+                for i in served:
+                    if getattr(sample[i], "observes", False):
+                        leader, *siblings = [accs[i] for (_, y), accs in accumulators.items() if y == year]
+                        for sibling in siblings:
+                            sibling.observed = leader.observed
+                        observers.setdefault(year, []).append(leader.observe)
+            wanted = set(countryCode)
+
+            cur = conn.cursor()
+            query = f"""
+                SELECT {', '.join(columns)}, {'bodies' if cells else '1'}
+                FROM {f'derived.{cube.name}' if cells else table}
+                WHERE cYear IN ({','.join('?' * len(years))})
+            """
+            if observers:
+                cur.execute(query, years)
+            else:
+                query += f" AND countryCode IN ({','.join('?' * len(countryCode))})"
+                cur.execute(query, years + list(countryCode))
+
+            adders = {key: [accs[i].add for i in served] for key, accs in accumulators.items()}
+            for values in cur:
+                row = Row._make(values)
+                if observers:
+                    for observe in observers[row.cYear]:
+                        observe(row)
+                    if row.countryCode not in wanted:
+                        continue
+                for add in adders[(row.countryCode if split_countries else None, row.cYear)]:
+                    add(row)
+    finally:
+        conn.close()
+
+    for (country, year), accs in accumulators.items():
+        folder = targets[(country, year)]
+        os.makedirs(folder, exist_ok=True)
+        for acc in accs:
+            for file_name, headers, rows, encoding in acc.outputs(year):
+                write_csv(os.path.join(folder, file_name), headers, rows, encoding)
+
+    served = f", {sum(from_cube)} of them from {cube.name}" if any(from_cube) else ""
+    print(f"✅ {len(names)} reports written from one scan of {table}{served} ({len(targets)} output folder(s))")
+
+
+def SurfaceWaterBody_reports(db_file, countryCode, cYear, working_directory, reports=None, split_countries=False):
+    """Writes all SOW_SWB_SurfaceWaterBody reports from a single scan of the country/year slice."""
+    run_shared_scan(db_file, "SOW_SWB_SurfaceWaterBody", SW_REPORTS, countryCode, cYear, working_directory,
+                    reports, split_countries)
+
+
+def GroundWaterBody_reports(db_file, countryCode, cYear, working_directory, reports=None, split_countries=False):
+    """Writes all SOW_GWB_GroundWaterBody reports from a single scan of the country/year slice."""
+    run_shared_scan(db_file, "SOW_GWB_GroundWaterBody", GW_REPORTS, countryCode, cYear, working_directory,
+                    reports, split_countries)
+
+
+def QualityElement_reports(db_file, countryCode, cYear, working_directory, reports=None, split_countries=False):
+    """Writes the four 42.* quality element reports from a single scan of SOW_SWB_QualityElement."""
+    run_shared_scan(db_file, "SOW_SWB_QualityElement", QE_REPORTS, countryCode, cYear, working_directory,
+                    reports, split_countries)
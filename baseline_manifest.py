@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from baseline_fingerprint import database_fingerprint
+from baseline_registry import reads_all_countries
+from baseline_scheduler import task_key
+
+
+# Run manifest: the checkpoint of an extraction run.
+#
+# Every run keeps wise_run_manifest.json in its output directory, rewritten as soon
+# as a task finishes. It records the database fingerprint and, per task, whether it
+# succeeded, which files it wrote and which tables it read, with a digest of the
+# country/cycle slices of those tables it covers (baseline_cache fingerprints).
+#
+# A --resume run reads it back and only re-executes the tasks that failed, timed out,
+# never finished, whose files have gone missing, or whose input slices changed. The last
+# case is what makes it work across database releases: point a run at the new WISE
+# snapshot with --resume and only the reports reading changed tables, countries or
+# cycles are rebuilt. The slice fingerprints of the previous database are kept in
+# the manifest too, so the run starts with a summary of what changed.
+
+MANIFEST_FILE = "wise_run_manifest.json"
+
+
+def task_id(task):
+    """Stable identity of a task tuple across runs: report|countries|cycles"""
+    return "|".join(task_key(task))
+
+
+def manifest_path(directory):
+    return os.path.join(directory, MANIFEST_FILE)
+
+
+def read_manifest(directory):
+    """The manifest of the last run written to directory, or None"""
+    try:
+        with open(manifest_path(directory), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(directory, manifest):
+    """Replaces the manifest atomically, so a crash never leaves half a file behind"""
+    path = manifest_path(directory)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def start_run(directory, db_file, resume=False):
+    """
+    Manifest of a new run in directory. With resume the tasks (and slice fingerprints) of
+    the previous run are carried over, to be checked against the database; otherwise it starts empty.
+    """
+    previous = read_manifest(directory) if resume else None
+    if resume and previous is None:
+        print(f"⚠️ No {MANIFEST_FILE} in {directory}, running every task")
+
+    manifest = {
+        "database": os.path.abspath(db_file),
+        "fingerprint": database_fingerprint(db_file),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "status": "running",
+        "tasks": previous["tasks"] if previous else {},
+        "slices": previous.get("slices", {}) if previous else {},
+        "previous_fingerprint": previous["fingerprint"] if previous else None,
+    }
+    write_manifest(directory, manifest)
+    return manifest
+
+
+def input_digests(tables, task, fingerprints):
+    """
+    {"schema.table": digest} of the tables a task read: the fingerprints of the slices of its
+    countries and cycles, or of the whole table when it has no countryCode / cYear columns.
+    A task running a report that reads every country (registry all_countries) covers the
+    slices of every country of its cycles.
+    """
+    name, countries, cYears = task_key(task)
+    every_country = reads_all_countries(name)
+    table_fingerprints, slice_fingerprints = fingerprints
+    inputs = {}
+    for schema, table in tables:
+        slices = slice_fingerprints.get((schema, table))
+        if slices is None:
+            inputs[f"{schema}.{table}"] = table_fingerprints.get((schema, table))
+        else:
+            if every_country:
+                covered = [(country, cYear, value) for (country, cYear), value in sorted(slices.items())
+                           if cYear in cYears.split(",")]
+            else:
+                covered = [(country, cYear, slices.get((country, cYear)))
+                           for country in countries.split(",") for cYear in cYears.split(",")]
+            inputs[f"{schema}.{table}"] = hashlib.sha1(repr(covered).encode()).hexdigest()
+    return inputs
+
+
+def is_current(manifest, directory, task, fingerprints):
+    """
+    True when the manifest records the task as done, its files are all still there and
+    none of the slices it read has changed in the database of this run
+    """
+    recorded = manifest["tasks"].get(task_id(task))
+    if recorded is None or recorded["status"] != "done":
+        return False
+    if not all(os.path.isfile(os.path.join(directory, name)) for name in recorded["files"]):
+        return False
+    if recorded.get("inputs") is None or fingerprints is None:
+        # Nothing to compare the inputs with: only the very same database file will do
+        return manifest["previous_fingerprint"] == manifest["fingerprint"]
+    tables = [tuple(name.split(".", 1)) for name in recorded["inputs"]]
+    return input_digests(tables, task, fingerprints) == recorded["inputs"]
+
+
+def table_slices(name, fingerprints):
+    """{"country cycle": fingerprint} of a "schema.table", or {"all rows": fingerprint} for a table without slices"""
+    table_fingerprints, slice_fingerprints = fingerprints
+    key = tuple(name.split(".", 1))
+    if key in slice_fingerprints:
+        return {f"{country} {cYear}": value for (country, cYear), value in slice_fingerprints[key].items()}
+    return {"all rows": table_fingerprints[key]} if key in table_fingerprints else {}
+
+
+def slice_changes(previous, fingerprints):
+    """{"schema.table": (changed, added, removed)} lists of "country cycle" slices since the previous run"""
+    changes = {}
+    for name, old in previous.items():
+        new = table_slices(name, fingerprints)
+        changed = sorted(key for key in old.keys() & new.keys() if old[key] != new[key])
+        added, removed = sorted(new.keys() - old.keys()), sorted(old.keys() - new.keys())
+        if changed or added or removed:
+            changes[name] = (changed, added, removed)
+    return changes
+
+
+def print_change_summary(manifest, fingerprints, tasks, current):
+    """Prints which table slices changed since the previous run and how many tasks they invalidate"""
+    if manifest["previous_fingerprint"] is None or manifest["previous_fingerprint"] == manifest["fingerprint"]:
+        print(f"⏭️ Resuming: {sum(current)} tasks already done, {len(tasks) - sum(current)} to run")
+        return
+
+    print("🔎 The database changed since the last run into this folder")
+    changes = slice_changes(manifest["slices"], fingerprints) if fingerprints else {}
+    for name, (changed, added, removed) in sorted(changes.items()):
+        details = [f"{label} {', '.join(slices)}" for label, slices
+                   in (("changed", changed), ("added", added), ("removed", removed)) if slices]
+        print(f"   {name}: {'; '.join(details)}")
+    if fingerprints and not changes:
+        print("   none of the country/cycle slices the previous run read has changed")
+    print(f"🔁 {len(tasks) - sum(current)} of {len(tasks)} tasks read changed data (or did not finish) and are rebuilt")
+
+
+def record_task(manifest, directory, task, success, info, seconds, files, tables=(), fingerprints=None,
+                timeout=None):
+    """
+    Adds the outcome of a finished task (files relative to directory) and saves the manifest.
+    timeout is the diagnostics of a task interrupted when it ran out of its time budget.
+    """
+    manifest["tasks"][task_id(task)] = {
+        "description": task[0],
+        "status": "done" if success else "timed out" if timeout else "failed",
+        "error": None if success else info,
+        "timeout": timeout,
+        "seconds": round(seconds, 3),
+        "files": sorted(os.path.relpath(path, directory) for path in files),
+        "inputs": input_digests(tables, task, fingerprints) if fingerprints and tables else None,
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    write_manifest(directory, manifest)
+
+
+def finish_run(manifest, directory, fingerprints=None):
+    """Marks the run finished and keeps the slice fingerprints of the tables it read for the next change summary"""
+    failed = sum(1 for task in manifest["tasks"].values() if task["status"] != "done")
+    manifest["status"] = "finished" if not failed else "finished with failures"
+    manifest["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    if fingerprints:
+        read = {name for task in manifest["tasks"].values() for name in (task.get("inputs") or {})}
+        manifest["slices"] = {name: table_slices(name, fingerprints) for name in sorted(read)}
+    write_manifest(directory, manifest)
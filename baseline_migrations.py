@@ -0,0 +1,154 @@
+import sqlite3
+from datetime import datetime
+
+import baseline_bitmap
+import baseline_cache
+import baseline_cube
+import baseline_extraction
+import baseline_queryplan
+from baseline_fingerprint import database_fingerprint, wal_pending
+
+
+# Versioned setup steps.
+#
+# Every run used to rebuild swRBD_Europe_data, re-run the whitespace cleanup and
+# (after a prompt) walk every table for missing indexes. The steps below record
+# what was applied in a setup_migrations table of the sidecar database, so a
+# repeat run skips them. Bump a step's version whenever its function changes.
+#
+#   (name, version, target, function, depends)
+#
+# `depends` names the earlier steps whose tables the step reads or rewrites: when
+# one of them runs again, so does the step. The other steps are left alone.
+#
+# "sidecar" steps only touch the sidecar; once applied they stay valid. "source"
+# steps change the WISE database itself and are tied to its fingerprint, so they
+# run again when the database file is replaced by another one. "derived" steps
+# write the sidecar from the rows of the WISE database, so they are tied to its
+# fingerprint as well.
+
+SETUP_MIGRATIONS = [
+    ("swRBD_Europe_data", 1, "sidecar", baseline_extraction.create_and_populate_swRBD_Europe_data, ()),
+    ("swRBD_Europe_data_whitespace", 1, "sidecar", baseline_extraction.updateTables, ("swRBD_Europe_data",)),
+    ("status_cubes", 1, "derived", baseline_cube.build_cubes, ()),
+    ("bitmap_indexes", 1, "derived", baseline_bitmap.build_bitmap_indexes, ()),
+    ("denominators", 2, "derived", baseline_extraction.build_denominators, ()),
+    # Last, so it also fingerprints the sidecar tables built above
+    ("table_fingerprints", 3, "derived", baseline_cache.build_table_fingerprints,
+     ("swRBD_Europe_data", "swRBD_Europe_data_whitespace", "status_cubes", "bitmap_indexes", "denominators")),
+]
+
+def create_indexes(db_file):
+    """Indexes proposed by the workload-driven advisor (baseline_queryplan)"""
+    baseline_queryplan.create_advised_indexes(db_file)
+
+
+INDEX_MIGRATION = ("indexes", 2, "source", create_indexes, ())
+
+
+def checkpoint_wal(db_file):
+    """
+    Moves the commits in the write-ahead log of db_file into the file itself, so that
+    immutable connections see them and the fingerprint stays the same until the next write
+    """
+    if not wal_pending(db_file):
+        return
+    try:
+        conn = sqlite3.connect(db_file)
+        try:
+            busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        busy = e
+    if busy:
+        print(f"⚠️ Could not checkpoint the write-ahead log of {db_file} ({busy}), reading it without immutable")
+
+
+def _connect_metadata(db_file):
+    conn = sqlite3.connect(baseline_extraction.sidecar_path(db_file))
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS setup_migrations (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            fingerprint TEXT,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    return conn
+
+
+def applied_migrations(db_file):
+    """Returns {name: (version, fingerprint)} of the steps recorded for db_file"""
+    conn = _connect_metadata(db_file)
+    try:
+        return {name: (version, fingerprint)
+                for name, version, fingerprint in conn.execute("SELECT name, version, fingerprint FROM setup_migrations")}
+    finally:
+        conn.close()
+
+
+def is_applied(db_file, migration, applied=None):
+    """True when this version of the step is recorded (for this very database, if it targets the source)"""
+    name, version, target, _, _ = migration
+    if applied is None:
+        applied = applied_migrations(db_file)
+    if name not in applied or applied[name][0] != version:
+        return False
+    return target == "sidecar" or applied[name][1] == database_fingerprint(db_file)
+
+
+def apply_migration(db_file, migration):
+    """Runs a step and records it"""
+    name, version, target, function, _ = migration
+    function(db_file)
+    checkpoint_wal(db_file)
+
+    fingerprint = None if target == "sidecar" else database_fingerprint(db_file)
+    conn = _connect_metadata(db_file)
+    try:
+        conn.execute("INSERT OR REPLACE INTO setup_migrations (name, version, fingerprint, applied_at) VALUES (?, ?, ?, ?)",
+                     (name, version, fingerprint, datetime.now().isoformat(timespec="seconds")))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def apply_setup(db_file):
+    """
+    Brings the sidecar of db_file up to date, skipping the steps that are already applied.
+    Returns the names of the steps that ran.
+    """
+    checkpoint_wal(db_file)
+    applied = applied_migrations(db_file)
+    rerun = []
+    for migration in SETUP_MIGRATIONS:
+        name, version, _, _, depends = migration
+        # A re-applied step invalidates the steps that build on it
+        if any(step in rerun for step in depends) or not is_applied(db_file, migration, applied):
+            apply_migration(db_file, migration)
+            rerun.append(name)
+        else:
+            print(f"⏭️ Setup step '{name}' v{version} already applied")
+    return rerun
+
+
+def indexes_applied(db_file):
+    return is_applied(db_file, INDEX_MIGRATION)
+
+
+def apply_indexes(db_file):
+    """
+    Creates the advised indexes. Indexes do not change what the tables hold, so the steps
+    recorded for the database as it was stay applied: their fingerprint moves along with it
+    """
+    checkpoint_wal(db_file)
+    before = database_fingerprint(db_file)
+    apply_migration(db_file, INDEX_MIGRATION)
+    conn = _connect_metadata(db_file)
+    try:
+        conn.execute("UPDATE setup_migrations SET fingerprint = ? WHERE fingerprint = ?",
+                     (database_fingerprint(db_file), before))
+        conn.commit()
+    finally:
+        conn.close()
@@ -1,7 +1,19 @@
+import csv
 import os
+import shutil
+import sys
+import tempfile
 import time
+import baseline_bitmap
+import baseline_cache
 import baseline_extraction
+import baseline_fusion
+import baseline_manifest
+import baseline_migrations
+import baseline_registry
+import baseline_scheduler
 import argparse
+from functools import partial
 from multiprocessing import Pool, cpu_count
 from tqdm import tqdm # type: ignore
 
@@ -16,120 +28,478 @@ def run_function(task):
         return desc, False, str(e)
 
 
-def run_csv_generation_process_multiprocessing(db_file, countryCode, working_directory):
-    """ Runs all extraction functions in parallel using multiprocessing """
-    
-    os.makedirs(working_directory, exist_ok=True)
+# Files the task a worker is running has opened for writing (None between tasks)
+_written_files = None
+_audit_hook_installed = False
 
-    baseline_extraction.create_and_populate_swRBD_Europe_data(db_file)
-    
-    baseline_extraction.updateTables(db_file)
-
-    functions = [
-        ("Generating RBD Code Names",baseline_extraction.rbdCodeNames, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Body Table",baseline_extraction.WISE_SOW_SurfaceWaterBody_SWB_Table, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Body Categories",baseline_extraction.WISE_SOW_SurfaceWaterBody_SWB_Category, (db_file, countryCode, 2016, working_directory)),
-        ("Ecological Exemptions & Pressures",baseline_extraction.Surface_water_bodies_Ecological_exemptions_and_pressures, (db_file, countryCode, 2016, working_directory)),
-        ("Quality Element Exemption Type",baseline_extraction.Surface_water_bodies_Quality_element_exemptions_Type, (db_file, countryCode, 2016, working_directory)),
-        ("Chemical Exemption Type",baseline_extraction.SWB_Chemical_exemption_type, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Body Chemical Status",baseline_extraction.WISE_SOW_SurfaceWaterBody_SWB_ChemicalStatus_Table, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Body Chemical Status by Category",baseline_extraction.SurfaceWaterBody_ChemicalStatus_Table_by_Category, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Good-High Status",baseline_extraction.Surface_water_bodies_Ecological_status_or_potential_groupGoodHigh, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Failing Status",baseline_extraction.Surface_water_bodies_Ecological_status_or_potential_groupFailling, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Rivers and Lakes Status",baseline_extraction.swEcologicalStatusOrPotential_RW_LW_Category2ndRBMP2016, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Chemical Status by Country by category",baseline_extraction.swEcologicalStatusOrPotentialValue_swChemicalStatusValue_by_Country_by_Categ, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Chemical assesment using monitoring",baseline_extraction.swb_Chemical_assessment_using_monitoring_grouping_or_expert_judgement, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Pollutants",baseline_extraction.swRBsPollutants, (db_file, countryCode, 2016, working_directory)),
-        ("Ecological Expected Good in 2015",baseline_extraction.swEcologicalStatusOrPotentialExpectedGoodIn2015, (db_file, countryCode, 2016, working_directory)),
-        ("Ecological Expected Achievement Date",baseline_extraction.swEcologicalStatusOrPotentialExpectedAchievementDate, (db_file, countryCode, 2016, working_directory)),
-        ("Chemical Expected Good in 2015",baseline_extraction.swChemicalStatusExpectedGoodIn2015, (db_file, countryCode, 2016, working_directory)),
-        ("Chemical Expected Achievement Date",baseline_extraction.swChemicalStatusExpectedAchievementDate, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Body Category 2016",baseline_extraction.GroundWaterBodyCategory2016, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Chemical Exemptions",baseline_extraction.Groundwater_bodies_Chemical_Exemption_Type, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Quantitative Exemption",baseline_extraction.Groundwater_bodies_Quantitative_Exemption_Type, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Chemical Exemptions",baseline_extraction.gwChemical_exemptions_and_pressures, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Quantitative & Pressures",baseline_extraction.Groundwater_bodies_Quantitative_exemptions_and_pressures, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Chemical Status",baseline_extraction.SOW_GWB_GroundWaterBody_GWB_Chemical_status, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Quantitative Status",baseline_extraction.SOW_GWB_GroundWaterBody_GWB_Quantitative_status, (db_file, countryCode, 2016, working_directory)),
-        ("Quantitative vs Chemical Status",baseline_extraction.gwQuantitativeStatusValue_gwChemicalStatusValue, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater At Risk",baseline_extraction.Groundwater_bodies_At_risk_of_failing_to_achieve_good_quantitative_status, (db_file, countryCode, 2016, working_directory)),
-        ("Quantitative vs Chemical Status",baseline_extraction.SOW_GWB_gwQuantitativeReasonsForFailure_Table, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Reason for failure",baseline_extraction.SOW_GWB_gwChemicalReasonsForFailure_Table, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Chemical Status Values",baseline_extraction.gwChemicalStatusValue_Table, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Quantitatives Status",baseline_extraction.gwQuantitativeStatusExpectedGoodIn2015, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Quantitatives Status Expected Achievement Date ",baseline_extraction.gwQuantitativeStatusExpectedAchievementDate, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Chemical Status Expected Good in 2015",baseline_extraction.gwChemicalStatusExpectedGoodIn2015, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Chemical Status Expected Achievement Date",baseline_extraction.gwChemicalStatusExpectedAchievementDate, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Quantitatives Assessment Confidence",baseline_extraction.gwQuantitativeAssessmentConfidence, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Chemical Assessment Confidence",baseline_extraction.gwChemicalAssessmentConfidence, (db_file, countryCode, 2016, working_directory)),
-        ("Number of groundwaters bodies failing to achive good status",baseline_extraction.Number_of_groundwater_bodies_failing_to_achieve_good_status, (db_file, countryCode, 2016, working_directory)),
-        ("Geological Formations",baseline_extraction.geologicalFormation, (db_file, countryCode, 2016, working_directory)),
-        ("Surface water Number of Impacts by Country",baseline_extraction.swNumber_of_Impacts_by_country, (db_file, countryCode, 2016, working_directory)),
-        ("Surface water Presure Type",baseline_extraction.swSignificant_Pressure_Type_Table2016, (db_file, countryCode, 2016, working_directory)),
-        ("Significant Impact Type",baseline_extraction.SignificantImpactType_Table2016, (db_file, countryCode, 2016, working_directory)),
-        ("Surface water Significant Impacts type Other",baseline_extraction.swSignificantImpactType_Table_Other2016, (db_file, countryCode, 2016, working_directory)),
-        ("Surface water Significant Pressure Other",baseline_extraction.swSignificantPressureType_Table_Other, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Significant Impact type",baseline_extraction.gwSignificantImpactTypeByCountry, (db_file, countryCode, 2016, working_directory)),
-        ("Significant Impact Type 2016",baseline_extraction.gwSignificantImpactType2016, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Significant Impact type Other",baseline_extraction.gwSignificantImpactType_Other, (db_file, countryCode, 2016, working_directory)),
-        ("Significant Pressure Type by Country",baseline_extraction.SOW_GWB_gwSignificantPressureType_NumberOfImpact_by_country, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Significant Pressure type",baseline_extraction.gwSignificantPressureType2016, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Significant Pressure type Other",baseline_extraction.gwSignificantPressureType_OtherTable2016, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Pollutants",baseline_extraction.SOW_GWB_gwPollutant_Table, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Significant Pressure type",baseline_extraction.SOW_GWB_gwPollutant_Table_Other, (db_file, countryCode, 2016, working_directory)),
-        ("Surface water specific pollutant reported as Other",baseline_extraction.swRiver_basin_specific_pollutants_reported_as_Other, (db_file, countryCode, 2016, working_directory)),
-        ("Groundwater Bodies Failing by Country",baseline_extraction.Ground_water_bodies_Failing_notUnknown_by_Country, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Bodies Failing by Country",baseline_extraction.Surface_water_bodies_Failing_notUnknown_by_Country, (db_file, countryCode, 2016, working_directory)),
-        ("Surface water QE1",baseline_extraction.Surface_water_bodies_QE1_Biological_quality_elements_assessment, (db_file, countryCode, 2016, working_directory)),
-        ("Surface water QE2",baseline_extraction.Surface_water_bodies_QE2_assessment, (db_file, countryCode, 2016, working_directory)),
-        ("Surface water QE3",baseline_extraction.Surface_water_bodies_QE3_assessment, (db_file, countryCode, 2016, working_directory)),
-        ("Surface water QE3.3",baseline_extraction.Surface_water_bodies_QE3_3_assessment, (db_file, countryCode, 2016, working_directory)),
-        ("Surface water Delineation of the management",baseline_extraction.sw_delineation_of_the_management_units_in_the_1st_and_2nd_RBMP, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Chemical Status by Country",baseline_extraction.swChemical_by_Country_2016, (db_file, countryCode, 2016, working_directory)),
-        ("Ecological Exemption Type",baseline_extraction.Surface_water_bodies_Ecological_exemptions_Type, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Unknown Category",baseline_extraction.swEcologicalStatusOrPotential_Unknown_Category2ndRBMP2016, (db_file, countryCode, 2016, working_directory)),
-        ("Surface Water Chemical Status by Country",baseline_extraction.swEcologicalStatusOrPotentialChemical_by_Country, (db_file, countryCode, 2016, working_directory)),
-        
-    ]
-
-    num_workers = max(1, cpu_count() - 1)
+
+def _record_written_file(event, args):
+    if event == "open" and _written_files is not None:
+        path, mode = args[0], args[1]
+        if isinstance(path, (str, bytes, os.PathLike)) and mode and any(flag in mode for flag in "wax+"):
+            _written_files.add(os.path.abspath(os.fsdecode(path)))
+
+
+def run_scheduled(item):
+    """
+    Runs a (position, task, time budget) item of the scheduler and returns (position, result,
+    seconds, files, tables, timeout): the output files are whatever the task opened for writing
+    that still exists afterwards, the tables are the fingerprinted tables its queries read, and
+    timeout holds the diagnostics of a task whose queries were interrupted at the end of its budget
+    """
+    global _written_files, _audit_hook_installed
+    if not _audit_hook_installed:
+        # A worker runs one task at a time, so every file opened for writing belongs to the current one
+        sys.addaudithook(_record_written_file)
+        _audit_hook_installed = True
+
+    position, task, budget = item
+    _written_files = set()
+    baseline_extraction.pop_tables_read()
+    start = time.perf_counter()
+    baseline_extraction.start_time_budget(budget)
+    try:
+        result = run_function(task)
+        seconds = time.perf_counter() - start
+        files = sorted(path for path in _written_files if os.path.isfile(path))
+    finally:
+        _written_files = None
+        timeout = baseline_extraction.end_time_budget()
+    if timeout is not None:
+        # Whether or not the report let the interruption through, its output is incomplete
+        result = (result[0], False, describe_timeout(timeout))
+    return position, result, seconds, files, baseline_extraction.pop_tables_read(), timeout
+
+
+def describe_timeout(timeout):
+    """One line summary of the diagnostics of a timed-out task"""
+    return (f"timed out after {timeout['elapsed']:.1f}s (budget {timeout['budget']:.1f}s) "
+            f"in {timeout['where'] or '?'}, {timeout['queries']} queries run, "
+            f"interrupted query: {timeout['query'][:120] or '?'}")
+
+
+def extraction_tasks(db_file, countryCode, cYear, working_directory, reports=None):
+    """ Lists the (description, function, arguments) task tuples of the registry reports given by id (default: all) """
+
+    return [(desc, func, (db_file, countryCode, cYear, working_directory))
+            for desc, func in baseline_registry.report_functions(reports)]
+
+
+def worker_count():
+    """ Size of the extraction pool: one core is left to the main process """
+    return max(1, cpu_count() - 1)
+
+
+def shared_tables(tasks, num_workers):
+    """
+    The tables (by the registry) that more tasks read than there are workers, so at
+    least one worker runs two tasks that read them: only those are worth staging
+    """
+    readers = {}
+    for task in tasks:
+        report = baseline_registry.REPORTS_BY_ID.get(baseline_scheduler.task_key(task)[0])
+        for table in (report.tables if report is not None else ()):
+            readers[table] = readers.get(table, 0) + 1
+    return {table for table, count in readers.items() if count > num_workers}
+
+
+def run_tasks(functions, db_file, pragmas=None, immutable=True, stage=None, manifest_directory=None, resume=False,
+              result_cache=baseline_cache.DEFAULT_CAPACITY, timeout=None):
+    """
+    Runs the task tuples in parallel and reports their outcome. With a manifest_directory
+    every finished task is checkpointed there; with resume, the tasks the manifest
+    records as done (with their files still in place) are skipped. result_cache is the
+    size cap in bytes of the query result cache (None or 0 runs every query). timeout is
+    the time budget in seconds of a report per country and cycle (None: no limit): a task
+    that runs out of it has its query interrupted and is reported as timed out.
+    """
+
+    manifest = None
+    fingerprints = baseline_cache.read_fingerprints(db_file)
+    if manifest_directory is not None:
+        manifest = baseline_manifest.start_run(manifest_directory, db_file, resume)
+        if resume:
+            # Only what did not finish, or what reads slices that changed in this database, runs again
+            current = [baseline_manifest.is_current(manifest, manifest_directory, task, fingerprints) for task in functions]
+            baseline_manifest.print_change_summary(manifest, fingerprints, functions, current)
+            functions = [task for task, done in zip(functions, current) if not done]
+
+    if not functions:
+        if manifest is not None:
+            baseline_manifest.finish_run(manifest, manifest_directory, fingerprints)
+        return
+
+    num_workers = worker_count()
     print(f"🔄 Running {len(functions)} tasks with {num_workers} workers...")
 
-    with Pool(processes=num_workers) as pool:
-        results = list(tqdm(pool.imap(run_function, functions), total=len(functions), desc="Processing CSV", unit="task"))
+    # Every worker keeps one tuned connection open for all the tasks it picks up. The setup
+    # steps are done by now, so by default it is opened immutable: reads take no locks at all.
+    # With stage=(countries, cycles) it also stages the run's slice of the tables that two of its tasks may read.
+    # The tasks are handed out one at a time, longest first, so the heavy reports do not form the tail
+    scheduled = baseline_scheduler.schedule(db_file, functions)
+    budgets = baseline_scheduler.time_budgets(db_file, functions, timeout)
+    scheduled = [(position, task, budgets[position]) for position, task in scheduled]
+    if stage is not None:
+        stage = (*stage, shared_tables(functions, num_workers))
+    results = [None] * len(functions)
+    timeouts = [None] * len(functions)
+    runtimes = {}
+    with Pool(processes=num_workers, initializer=baseline_extraction.open_worker_connection,
+              initargs=(db_file, pragmas, immutable, stage, result_cache)) as pool:
+        for position, result, seconds, files, tables, timed_out in tqdm(
+                pool.imap_unordered(run_scheduled, scheduled, chunksize=1),
+                total=len(functions), desc="Processing CSV", unit="task"):
+            results[position] = result
+            timeouts[position] = timed_out
+            if timed_out is not None:
+                tqdm.write(f"⏱️ {result[0]} ran out of its {timed_out['budget']:.1f}s budget, moving on")
+            if result[1]:
+                runtimes[baseline_scheduler.task_key(functions[position])] = seconds
+            if manifest is not None:
+                baseline_manifest.record_task(manifest, manifest_directory, functions[position], result[1], result[2],
+                                              seconds, files, tables, fingerprints, timed_out)
+
+    baseline_scheduler.record_runtimes(db_file, runtimes)
+    if result_cache:
+        baseline_cache.evict(db_file, result_cache)
+    if manifest is not None:
+        baseline_manifest.finish_run(manifest, manifest_directory, fingerprints)
+
+    for (desc, success, info), timed_out in zip(results, timeouts):
+        if success:
+            print(f"✅ {desc} completed.")
+        elif timed_out is not None:
+            print(f"⏱️ {desc} {info}")
+        else:
+            print(f"⚠️ {desc} failed: {info}")
+    timed_out = [timeout for timeout in timeouts if timeout is not None]
+    if timed_out:
+        print(f"⏱️ {len(timed_out)} of {len(functions)} tasks ran out of time. Their diagnostics are in the run "
+              f"manifest; rerun them with --resume and a larger --task-timeout")
+
+
+# Engines that read every country and every cycle they are given in one go
+SHARED_SCAN_REPORTS = {baseline_fusion.SurfaceWaterBody_reports, baseline_fusion.GroundWaterBody_reports,
+                       baseline_fusion.QualityElement_reports, baseline_bitmap.PressureImpact_reports}
+
+# Reports whose percentages are taken over the whole requested country list; when a batch
+# is planned per report they still run once per country so every folder matches a
+# single-country extraction
+COUNTRY_SET_TOTALS = {
+    "SOW_GWB_gwSignificantPressureType_NumberOfImpact_by_country",
+    "gwSignificantImpactType2016",
+    "gwSignificantImpactType_Other",
+}
+
+# Batch granularity: (country, report) units, or one unit per report for all countries
+BATCH_UNITS = ("country", "report")
+
+# The WFD reporting cycles
+REPORTING_CYCLES = [2010, 2016, 2022]
+
+
+def cycle_folder(working_directory, cYear, cYears):
+    """ Folder of one reporting cycle: a <cYear> sub-folder when several cycles are extracted """
+    return os.path.join(working_directory, str(cYear)) if len(cYears) > 1 else working_directory
+
+
+def split_csv_by_country(csv_file, countryCode, output_directory, cycle=""):
+    """ Copies the rows of every country in a multi-country CSV to output_directory/<country>/<cycle> """
+
+    # latin-1 round-trips any byte, so utf-8 and locale-encoded reports are copied unchanged
+    with open(csv_file, newline='', encoding='latin-1') as f:
+        rows = list(csv.reader(f))
+
+    headers = rows[0]
+    column = next((i for i, h in enumerate(headers) if h.strip().lower() in ("country", "countrycode")), None)
+    if column is None:
+        raise ValueError(f"{os.path.basename(csv_file)} has no Country column to split on")
+
+    for country in countryCode:
+        output_file = os.path.join(output_directory, country, cycle, os.path.basename(csv_file))
+        with open(output_file, 'w+', newline='', encoding='latin-1') as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(row for row in rows[1:] if row[column] == country)
+
 
-    for desc, success, info in results:
-        print(f"✅ {desc} completed." if success else f"⚠️ {desc} failed: {info}")
+def split_by_country(func, db_file, countryCode, cYear, output_directory, cycle=""):
+    """ Runs a report once for all countries and fans its CSV files out into per-country folders """
+
+    staging = tempfile.mkdtemp(prefix=f".{func.__name__}.", dir=output_directory)
+    try:
+        func(db_file, countryCode, cYear, staging)
+    except Exception:
+        # Bad data of one country should not cost the others their files: redo it country by country
+        shutil.rmtree(staging, ignore_errors=True)
+        failed = []
+        for country in countryCode:
+            try:
+                func(db_file, [country], cYear, os.path.join(output_directory, country, cycle))
+            except Exception as e:
+                failed.append(f"{country}: {e}")
+        if failed:
+            raise RuntimeError("; ".join(failed))
+        return
+
+    try:
+        for file_name in os.listdir(staging):
+            split_csv_by_country(os.path.join(staging, file_name), countryCode, output_directory, cycle)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def country_groups(db_file, countryCode, cYears, groups):
+    """
+    Splits the countries into at most `groups` lists of about the same number of water
+    body rows (largest country first into the lightest list), for the shared-scan engines
+    """
+
+    conn = baseline_extraction.create_connection(db_file)
+    sizes = dict.fromkeys(countryCode, 0)
+    if conn is not None:
+        try:
+            for table in ("SOW_SWB_SurfaceWaterBody", "SOW_GWB_GroundWaterBody"):
+                for country, rows in conn.execute(f"""
+                    SELECT countryCode, COUNT(*) FROM {table}
+                    WHERE cYear IN ({','.join('?' * len(cYears))})
+                      AND countryCode IN ({','.join('?' * len(countryCode))})
+                    GROUP BY countryCode
+                """, list(cYears) + list(countryCode)):
+                    sizes[country] += rows
+        finally:
+            conn.close()
+
+    bins = [[0, []] for _ in range(max(1, min(groups, len(countryCode))))]
+    for country in sorted(countryCode, key=lambda country: -sizes[country]):
+        lightest = min(bins, key=lambda b: b[0])
+        lightest[0] += sizes[country]
+        lightest[1].append(country)
+    return [sorted(countries) for _, countries in bins]
+
+
+def plan_tasks(db_file, countryCode, cYears, output_directory, batch=False, units="country", groups=None, reports=None):
+    """
+    Turns the task tuples of an extraction (of the given report ids, default: all) into the tasks of a run over several
+    reporting cycles and, in batch mode, several countries written to <output_directory>/<country>.
+
+    A batch is planned as (country, report) units by default: every report runs once per
+    country, straight into that country's folder, and the shared-scan engines once per
+    list of `groups` (all countries in one list by default). With units="report" every
+    report runs once for all countries and its CSV files are split by country.
+    """
+
+    multi_cycle = len(cYears) > 1
+    groups = groups or [countryCode]
+    tasks = []
+    for desc, func, _ in extraction_tasks(db_file, countryCode, cYears[0], output_directory, reports):
+        if getattr(func, "func", func) in SHARED_SCAN_REPORTS:
+            # One scan covers every country of a group and every cycle
+            years = list(cYears) if multi_cycle else cYears[0]
+            for group in (groups if batch else [countryCode]):
+                label = f"{desc} ({', '.join(group)})" if batch and len(groups) > 1 else desc
+                tasks.append((label, partial(func, split_countries=batch), (db_file, group, years, output_directory)))
+            continue
+
+        for cYear in cYears:
+            label = f"{desc} ({cYear})" if multi_cycle else desc
+            if not batch:
+                tasks.append((label, func, (db_file, countryCode, cYear, cycle_folder(output_directory, cYear, cYears))))
+            elif units == "country" or func.__name__ in COUNTRY_SET_TOTALS:
+                tasks += [(f"{label} ({country})", func,
+                           (db_file, [country], cYear, cycle_folder(os.path.join(output_directory, country), cYear, cYears)))
+                          for country in countryCode]
+            else:
+                cycle = str(cYear) if multi_cycle else ""
+                tasks.append((label, split_by_country, (func, db_file, countryCode, cYear, output_directory, cycle)))
+    return tasks
+
+
+def write_cycle_comparison(working_directory, cYears):
+    """
+    Writes side-by-side versions of every report to <working_directory>/cycles: the rows of all
+    cycles in one file, behind a leading Cycle column
+    """
+
+    def report_key(file_name, cYear):
+        # Most file names carry the cycle (or a hard-coded 2016), usually just before the extension
+        stem, extension = os.path.splitext(file_name)
+        for year in (str(cYear), "2016"):
+            head, found, tail = stem.rpartition(year)
+            if found:
+                return head.rstrip("_") + tail + extension
+        return file_name
+
+    reports = {}
+    for cYear in cYears:
+        folder = cycle_folder(working_directory, cYear, cYears)
+        if not os.path.isdir(folder):
+            continue
+        for file_name in sorted(os.listdir(folder)):
+            if file_name.endswith(".csv"):
+                reports.setdefault(report_key(file_name, cYear), []).append((cYear, os.path.join(folder, file_name)))
+
+    comparison_directory = os.path.join(working_directory, "cycles")
+    os.makedirs(comparison_directory, exist_ok=True)
+    for file_name, sources in reports.items():
+        headers, rows = None, []
+        for cYear, csv_file in sources:
+            with open(csv_file, newline='', encoding='latin-1') as f:
+                reader = csv.reader(f)
+                headers = next(reader, headers)
+                rows += [[cYear] + row for row in reader]
+        if headers is None:
+            continue
+        with open(os.path.join(comparison_directory, file_name), 'w+', newline='', encoding='latin-1') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Cycle"] + headers)
+            writer.writerows(rows)
+
+    print(f"📊 {len(reports)} side-by-side cycle reports written to {comparison_directory}")
+
+
+def run_csv_generation_process_multiprocessing(db_file, countryCode, working_directory, cYears=(2016,), compare_cycles=False,
+                                                pragmas=None, immutable=True, stage=False, resume=False,
+                                                result_cache=baseline_cache.DEFAULT_CAPACITY, reports=None, timeout=None):
+    """ Runs the extraction functions of the given report ids (default: all) in parallel using multiprocessing """
+    
+    cYears = list(cYears)
+    for cYear in cYears:
+        os.makedirs(cycle_folder(working_directory, cYear, cYears), exist_ok=True)
+
+    baseline_migrations.apply_setup(db_file)
+
+    run_tasks(plan_tasks(db_file, countryCode, cYears, working_directory, reports=reports), db_file, pragmas, immutable,
+              (countryCode, cYears) if stage else None, working_directory, resume, result_cache, timeout)
+
+    if compare_cycles and len(cYears) > 1:
+        write_cycle_comparison(working_directory, cYears)
+
+
+def run_batch_extraction(db_file, countryCode, output_directory, cYears=(2016,), compare_cycles=False, pragmas=None,
+                         immutable=True, stage=False, units="country", resume=False,
+                         result_cache=baseline_cache.DEFAULT_CAPACITY, reports=None, timeout=None):
+    """
+    Extracts several countries in one run, writing each country to output_directory/<country>.
+    All (country, report) units go to one queue that a single pool drains, longest first.
+    reports limits the run to the given registry report ids.
+    """
+
+    cYears = list(cYears)
+    for country in countryCode:
+        for cYear in cYears:
+            os.makedirs(cycle_folder(os.path.join(output_directory, country), cYear, cYears), exist_ok=True)
+
+    baseline_migrations.apply_setup(db_file)
+
+    print(f"🌍 Batch extraction for {len(countryCode)} countries: {', '.join(countryCode)}")
+    # The shared-scan engines get one group of countries per worker, balanced on row counts
+    groups = country_groups(db_file, countryCode, cYears, worker_count()) if units == "country" else None
+    run_tasks(plan_tasks(db_file, countryCode, cYears, output_directory, batch=True, units=units, groups=groups,
+                         reports=reports),
+              db_file, pragmas, immutable, (countryCode, cYears) if stage else None, output_directory, resume,
+              result_cache, timeout)
+
+    if compare_cycles and len(cYears) > 1:
+        for country in countryCode:
+            write_cycle_comparison(os.path.join(output_directory, country), cYears)
 
 
 # Command-line argument parsing
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Extract data from WISE database and generate CSV reports')
     parser.add_argument('db', help='Path to SQLite DB file')
-    parser.add_argument('country', help='Country Code for extraction')
+    parser.add_argument('country', nargs='*', help='Country Code(s) for extraction (space or comma separated)')
     parser.add_argument('outputdir', help='Directory for CSV outputs (must NOT end with a backslash \\)')
+    parser.add_argument('--all', action='store_true', help='Extract every country reported in the database')
+    parser.add_argument('--years', type=int, nargs='+', default=[2016],
+                        help='Reporting cycle(s) to extract, e.g. --years 2010 2016 2022 (default: 2016)')
+    parser.add_argument('--all-cycles', action='store_true', help=f'Extract all reporting cycles {REPORTING_CYCLES}')
+    parser.add_argument('--compare-cycles', action='store_true',
+                        help='Also write side-by-side versions of every report with the rows of all cycles')
+    parser.add_argument('--mmap-size', type=int, metavar='MB', help='Memory-mapped I/O per worker in MB (default: 256, 0 disables)')
+    parser.add_argument('--cache-size', type=int, metavar='MB', help='SQLite page cache per worker in MB (default: 64)')
+    parser.add_argument('--temp-store', choices=['DEFAULT', 'FILE', 'MEMORY'], help='Where temporary b-trees are kept (default: MEMORY)')
+    parser.add_argument('--pragma', action='append', default=[], metavar='NAME=VALUE',
+                        help='Any other PRAGMA for the worker connections, e.g. --pragma threads=4 (repeatable)')
+    parser.add_argument('--no-immutable', dest='immutable', action='store_false',
+                        help='Open the database normally during extraction (use when another process may write to it)')
+    parser.add_argument('--stage', action='store_true',
+                        help="Copy the run's slice of the tables several tasks filter to in-memory TEMP tables per worker")
+    parser.add_argument('--result-cache', type=int, metavar='MB', default=baseline_cache.DEFAULT_CAPACITY // (1024 * 1024),
+                        help='Size cap of the on-disk query result cache in MB (default: 512)')
+    parser.add_argument('--no-result-cache', dest='result_cache', action='store_const', const=0,
+                        help='Run every query against the database instead of reusing cached results')
+    parser.add_argument('--resume', action='store_true',
+                        help='Only run the tasks the last run into the same output directory did not finish, '
+                             'or whose input tables changed since (e.g. on a new database release)')
+    parser.add_argument('--units', choices=BATCH_UNITS, default="country",
+                        help='Batch work units: one per (country, report), or one per report for all countries '
+                             '(default: country)')
+    parser.add_argument('--task-timeout', type=float, metavar='SECONDS',
+                        help='Time budget of a report per country and cycle (at least 5x its stored runtime); '
+                             'queries past it are interrupted and the task is reported as timed out (default: no limit)')
+    parser.add_argument('--only', nargs='+', default=[], metavar='REPORT',
+                        help='Only run these reports (ids as listed by python baseline_registry.py)')
+    parser.add_argument('--tags', nargs='+', default=[], choices=list(baseline_registry.TAGS), metavar='TAG',
+                        help=f"Only run the reports with one of these tags: {', '.join(baseline_registry.TAGS)}")
+    parser.add_argument('--exclude', nargs='+', default=[], metavar='REPORT_OR_TAG',
+                        help='Skip these reports, given by id or tag')
     
     args = parser.parse_args()
 
     # Define parameters
 
-    countryCode = [args.country]
+    if not os.path.exists(args.db):
+        raise FileNotFoundError(f"Database file not found: {args.db}")
 
-    country = ' '.join(countryCode)
+    cYears = REPORTING_CYCLES if args.all_cycles else sorted(set(args.years))
 
-    working_directory = os.path.join(args.outputdir, country)
+    if args.all:
+        countryCode = sorted({code for cYear in cYears for code in baseline_extraction.reportedCountries(args.db, cYear)})
+    else:
+        countryCode = [code.strip() for arg in args.country for code in arg.split(',') if code.strip()]
 
-    if not os.path.exists(args.db):
-        raise FileNotFoundError(f"Database file not found: {args.db}")
+    if not countryCode:
+        parser.error("give at least one country code or use --all")
+
+    reports = None
+    if args.only or args.tags or args.exclude:
+        try:
+            reports = baseline_registry.select_reports(args.only, args.tags, args.exclude)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"📋 Running {len(reports)} of {len(baseline_registry.REPORTS)} reports")
     
-    input("Do you want to create indexes for database? (y/n): ").strip().lower()
+    if baseline_migrations.indexes_applied(args.db):
+        print("⏭️ Indexes already created for this database")
+    elif input("Do you want to create indexes for database? (y/n): ").strip().lower() == "y":
+        baseline_migrations.apply_indexes(args.db)
 
-    if input("Do you want to create indexes for database? (y/n): ").strip().lower() == "y":
-        baseline_extraction.createIndexies(args.db)
+    pragmas = {}
+    if args.mmap_size is not None:
+        pragmas["mmap_size"] = args.mmap_size * 1024 * 1024
+    if args.cache_size is not None:
+        pragmas["cache_size"] = -args.cache_size * 1024
+    if args.temp_store:
+        pragmas["temp_store"] = args.temp_store
+    for pragma in args.pragma:
+        name, _, value = pragma.partition("=")
+        if not name.strip().isidentifier() or not value.strip().replace("-", "").isalnum():
+            parser.error(f"invalid --pragma {pragma!r}, expected NAME=VALUE")
+        pragmas[name.strip()] = value.strip()
 
     # Run extraction process in parallel
     start_time = time.time()
-    run_csv_generation_process_multiprocessing(args.db, countryCode, working_directory)
+    if len(countryCode) == 1:
+        working_directory = os.path.join(args.outputdir, countryCode[0])
+        run_csv_generation_process_multiprocessing(args.db, countryCode, working_directory, cYears, args.compare_cycles,
+                                                   pragmas, args.immutable, args.stage, args.resume,
+                                                   args.result_cache * 1024 * 1024, reports, args.task_timeout)
+    else:
+        run_batch_extraction(args.db, countryCode, args.outputdir, cYears, args.compare_cycles, pragmas, args.immutable,
+                             args.stage, args.units, args.resume, args.result_cache * 1024 * 1024, reports,
+                             args.task_timeout)
     elapsed_time = time.time() - start_time
 
     print(f"⏳ Total Execution Time: {elapsed_time:.2f} seconds")
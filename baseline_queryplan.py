@@ -0,0 +1,589 @@
+import argparse
+import contextlib
+import csv
+import hashlib
+import io
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import namedtuple
+
+import baseline_extraction
+import baseline_registry
+from baseline_aggregates import register_aggregates
+
+
+# Query-plan tooling: captures the SQL workload of every report in the task list
+# and looks at it through EXPLAIN QUERY PLAN, to audit the plans of the reports
+# or to propose indexes for them, or times it against the real database.
+#
+# The workload is captured against an in-memory clone of the database schema
+# (with the real table sizes as planner statistics), so the reports run in a
+# fraction of a second whatever the size of the WISE database, and candidate
+# indexes can be tried out without touching it.
+
+Statement = namedtuple("Statement", "report sql params")
+
+
+class RecordingCursor(sqlite3.Cursor):
+    """Cursor that records the statements executed while a report is running"""
+
+    def execute(self, sql, parameters=()):
+        if self.connection.report is not None:
+            self.connection.statements.append(Statement(self.connection.report, sql, tuple(parameters)))
+        return super().execute(sql, parameters)
+
+
+class RecordingConnection(baseline_extraction.SharedConnection):
+    """Shared connection whose cursors record the statements of the running report"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.report = None
+        self.statements = []
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or RecordingCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+
+def _schema_sql(conn, schema="main"):
+    return [sql for (sql,) in conn.execute(f"""
+        SELECT sql FROM {schema}.sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END
+    """)]
+
+
+def table_sizes(db_file):
+    """Row count estimate (MAX(rowid)) of every table of db_file"""
+    conn = sqlite3.connect(baseline_extraction.database_uri(db_file, immutable=True), uri=True)
+    try:
+        sizes = {}
+        tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        for table in tables:
+            try:
+                sizes[table] = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+            except sqlite3.OperationalError:  # WITHOUT ROWID
+                sizes[table] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        return sizes
+    finally:
+        conn.close()
+
+
+def clone_schema(db_file, sizes=None):
+    """
+    In-memory database with the schema of db_file (and of its sidecar as `derived`).
+    sqlite_stat1 is copied from the source, or filled with the real table sizes, so the
+    planner makes the same kind of choices it would make on the full database.
+    """
+    source = sqlite3.connect(baseline_extraction.database_uri(db_file, immutable=True), uri=True)
+    clone = sqlite3.connect(":memory:", check_same_thread=False, factory=RecordingConnection)
+    register_aggregates(clone)
+    try:
+        for sql in _schema_sql(source):
+            clone.execute(sql)
+
+        clone.execute("ANALYZE")
+        clone.execute("DELETE FROM sqlite_stat1")
+        has_stats = source.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+        if has_stats:
+            clone.executemany("INSERT INTO sqlite_stat1 VALUES (?, ?, ?)",
+                              source.execute("SELECT tbl, idx, stat FROM sqlite_stat1"))
+        else:
+            sizes = sizes if sizes is not None else table_sizes(db_file)
+            clone.executemany("INSERT INTO sqlite_stat1 VALUES (?, NULL, ?)",
+                              [(table, str(max(rows, 1))) for table, rows in sizes.items()])
+        clone.commit()
+        clone.execute("ANALYZE sqlite_schema")
+    finally:
+        source.close()
+
+    clone.execute("ATTACH DATABASE ':memory:' AS derived")
+    sidecar = baseline_extraction.sidecar_path(db_file)
+    if os.path.exists(sidecar):
+        side = sqlite3.connect(baseline_extraction.database_uri(sidecar, immutable=True), uri=True)
+        try:
+            for sql in _schema_sql(side):
+                clone.execute(re.sub(r"^(CREATE\s+(?:UNIQUE\s+)?(?:TABLE|INDEX|VIEW)\s+(?:IF\s+NOT\s+EXISTS\s+)?)",
+                                     r"\1derived.", sql, flags=re.I))
+        finally:
+            side.close()
+    return clone
+
+
+def capture_workload(db_file, countryCode, cYear=2016, clone=None, reports=None):
+    """
+    Runs every report of the registry (or the report functions in reports, given as
+    functions or as baseline_extraction names) against a schema clone of db_file and
+    returns (clone, statements): the Statement tuples each report executed.
+    """
+    clone = clone or clone_schema(db_file)
+    clone.statements = []
+    scratch = tempfile.mkdtemp(prefix="wise_workload_")
+    if reports is None:
+        tasks = [(desc, func, (db_file, countryCode, cYear, scratch))
+                 for desc, func in baseline_registry.report_functions()]
+    else:
+        reports = [report if callable(report) else getattr(baseline_extraction, report) for report in reports]
+        tasks = [(report.__name__, report, (db_file, countryCode, cYear, scratch)) for report in reports]
+    baseline_extraction.share_connection(db_file, clone)
+    try:
+        for desc, func, args in tasks:
+            clone.report = desc
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    func(*args)
+            except Exception:
+                # Empty tables can trip the Python post-processing; the SQL already ran
+                pass
+    finally:
+        clone.report = None
+        baseline_extraction.share_connection(db_file, None)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    statements = [s for s in clone.statements if re.match(r"\s*(SELECT|WITH)\b", s.sql, re.I)]
+    return clone, statements
+
+
+# ---------------------------------------------------------------------------
+# EXPLAIN QUERY PLAN
+# ---------------------------------------------------------------------------
+
+TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(?:(\w+)\.)?(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+SQL_KEYWORDS = {"WHERE", "JOIN", "LEFT", "RIGHT", "FULL", "INNER", "OUTER", "CROSS", "NATURAL", "ON", "USING",
+                "GROUP", "ORDER", "LIMIT", "UNION", "EXCEPT", "INTERSECT", "HAVING", "WINDOW", "AND", "OR", "AS"}
+PLAN_STEP = re.compile(r"(SCAN|SEARCH) (\w+)(?: AS \w+)?(.*)")
+
+
+def table_aliases(sql):
+    """{name used in the query plan: table} for the tables referenced by a statement"""
+    aliases = {}
+    for schema, table, alias in TABLE_REF.findall(sql):
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias] = table
+        aliases.setdefault(table, table)
+    return aliases
+
+
+def explain(conn, statement):
+    """EXPLAIN QUERY PLAN detail strings of a statement (its parameters stay bound, as in the report)"""
+    try:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + statement.sql, statement.params)]
+    except sqlite3.Error as e:
+        return [f"ERROR {e}"]
+
+
+def plan_cost(plan, aliases, sizes):
+    """
+    Rough number of rows a plan visits: a SCAN reads the whole table, a SEARCH one
+    tenth of it per equality term, and an automatic index first has to be built.
+    """
+    cost = 0
+    for detail in plan:
+        step = PLAN_STEP.match(detail)
+        if not step:
+            continue
+        operation, name, rest = step.groups()
+        rows = sizes.get(aliases.get(name, name), 0)
+        if operation == "SCAN":
+            cost += rows // 2 if "COVERING INDEX" in rest else rows
+        elif "PRIMARY KEY" in rest:
+            cost += 1
+        else:
+            terms = rest[rest.find("(") + 1:rest.rfind(")")].split(" AND ") if "(" in rest else []
+            equalities = sum(1 for term in terms if "=" in term and not term.strip().startswith(("<", ">")))
+            cost += max(1, rows // 10 ** equalities)
+            if "AUTOMATIC" in rest:
+                cost += rows
+    return cost
+
+
+# ---------------------------------------------------------------------------
+# Audit
+# ---------------------------------------------------------------------------
+
+AUDIT_FLAGS = ("SCAN", "USE TEMP B-TREE", "AUTOMATIC INDEX")
+
+
+def plan_flags(plan, aliases, sizes):
+    """The AUDIT_FLAGS steps of a plan: full scans of base tables, temp B-trees and automatic indexes"""
+    flags = {flag: [] for flag in AUDIT_FLAGS}
+    for detail in plan:
+        step = PLAN_STEP.match(detail)
+        if step and step.group(1) == "SCAN" and aliases.get(step.group(2), step.group(2)) in sizes:
+            flags["SCAN"].append(detail)
+        if detail.startswith("USE TEMP B-TREE"):
+            flags["USE TEMP B-TREE"].append(detail)
+        if "AUTOMATIC" in detail:
+            flags["AUTOMATIC INDEX"].append(detail)
+    return flags
+
+
+def audit_queries(db_file, countryCode, cYear=2016):
+    """
+    EXPLAIN QUERY PLAN of every report query, run against db_file itself (with its
+    sidecar attached) so the plans reflect the indexes that actually exist.
+    Returns one dict per statement, most expensive report first.
+    """
+    sizes = table_sizes(db_file)
+    clone, statements = capture_workload(db_file, countryCode, cYear, clone_schema(db_file, sizes))
+    clone.close()
+
+    conn = sqlite3.connect(baseline_extraction.database_uri(db_file, immutable=True), uri=True)
+    try:
+        register_aggregates(conn)
+        baseline_extraction.attach_sidecar(conn, db_file, immutable=True)
+        findings = []
+        for number, statement in enumerate(statements, 1):
+            aliases = table_aliases(statement.sql)
+            plan = explain(conn, statement)
+            findings.append({
+                "report": statement.report,
+                "statement": number,
+                "cost": plan_cost(plan, aliases, sizes),
+                "flags": plan_flags(plan, aliases, sizes),
+                "plan": plan,
+                "sql": statement.sql,
+            })
+    finally:
+        conn.close()
+
+    report_cost = {}
+    for finding in findings:
+        report_cost[finding["report"]] = report_cost.get(finding["report"], 0) + finding["cost"]
+    findings.sort(key=lambda f: (-report_cost[f["report"]], f["report"], -f["cost"], f["statement"]))
+    return findings
+
+
+def write_audit_report(findings, output_file):
+    """Writes the ranked audit (one row per statement) to a CSV file"""
+    headers = ["Rank", "Report", "Statement", "Estimated rows visited"] + list(AUDIT_FLAGS) + ["Query plan", "SQL"]
+    ranks = {}
+    rows = []
+    for finding in findings:
+        rank = ranks.setdefault(finding["report"], len(ranks) + 1)
+        rows.append([rank, finding["report"], finding["statement"], finding["cost"]]
+                    + ["; ".join(finding["flags"][flag]) for flag in AUDIT_FLAGS]
+                    + [" | ".join(finding["plan"]), " ".join(finding["sql"].split())])
+    baseline_extraction.write_csv(output_file, headers, rows)
+
+
+def print_audit(findings, top=10):
+    """Prints the flag counts and the most expensive reports"""
+    per_report = {}
+    for finding in findings:
+        totals = per_report.setdefault(finding["report"], {"cost": 0, **{flag: 0 for flag in AUDIT_FLAGS}})
+        totals["cost"] += finding["cost"]
+        for flag in AUDIT_FLAGS:
+            totals[flag] += len(finding["flags"][flag])
+
+    print(f"📋 {len(findings)} statements from {len(per_report)} reports")
+    for flag in AUDIT_FLAGS:
+        flagged = sum(1 for totals in per_report.values() if totals[flag])
+        print(f"   {flag}: {sum(t[flag] for t in per_report.values())} steps in {flagged} reports")
+    print("💸 Most expensive reports:")
+    for report, totals in list(per_report.items())[:top]:
+        flags = ", ".join(f"{totals[flag]} {flag}" for flag in AUDIT_FLAGS if totals[flag])
+        print(f"   ~{totals['cost']:,} rows  {report}" + (f"  ({flags})" if flags else ""))
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def benchmark_queries(db_file, countryCode, cYear=2016, reports=None, repeat=3):
+    """
+    Times the captured report queries against db_file itself (with its sidecar
+    attached). Returns {report: (statements, seconds)}, where seconds is the sum
+    over the report's statements of the best of `repeat` runs.
+    """
+    clone, statements = capture_workload(db_file, countryCode, cYear, clone_schema(db_file), reports)
+    clone.close()
+
+    conn = sqlite3.connect(baseline_extraction.database_uri(db_file, immutable=True), uri=True)
+    try:
+        register_aggregates(conn)
+        baseline_extraction.attach_sidecar(conn, db_file, immutable=True)
+        timings = {}
+        for statement in statements:
+            best = None
+            for _ in range(max(1, repeat)):
+                start = time.perf_counter()
+                conn.execute(statement.sql, statement.params).fetchall()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            count, seconds = timings.get(statement.report, (0, 0.0))
+            timings[statement.report] = (count + 1, seconds + best)
+    finally:
+        conn.close()
+    return timings
+
+
+def write_benchmark(timings, output_file):
+    """Writes the timings (one row per report) to a CSV file"""
+    baseline_extraction.write_csv(output_file, ["Report", "Statements", "Seconds"],
+                                  [[report, count, f"{seconds:.6f}"] for report, (count, seconds) in timings.items()])
+
+
+def read_benchmark(output_file):
+    """Reads a file written by write_benchmark back into {report: (statements, seconds)}"""
+    with open(output_file, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return {report: (int(count), float(seconds)) for report, count, seconds in reader}
+
+
+def print_benchmark(timings, baseline=None):
+    """Prints the timings, side by side with those of an earlier run when given"""
+    width = max([len(report) for report in list(timings) + list(baseline or {})] + [6])
+    if baseline is None:
+        print(f"⏱️ {'Report':<{width}}  {'Queries':>7}  {'Seconds':>10}")
+        for report, (count, seconds) in timings.items():
+            print(f"   {report:<{width}}  {count:>7}  {seconds:>10.4f}")
+        print(f"   {'Total':<{width}}  {sum(c for c, _ in timings.values()):>7}  {sum(s for _, s in timings.values()):>10.4f}")
+        return
+
+    print(f"⏱️ {'Report':<{width}}  {'Before':>14}  {'After':>14}  {'Speedup':>8}")
+    def cell(entry):
+        return f"{entry[1]:>10.4f} ({entry[0]})" if entry else f"{'-':>14}"
+    for report in list(timings) + [report for report in baseline if report not in timings]:
+        before, after = baseline.get(report), timings.get(report)
+        speedup = f"{before[1] / after[1]:>7.2f}x" if before and after and after[1] else f"{'-':>8}"
+        print(f"   {report:<{width}}  {cell(before)}  {cell(after)}  {speedup}")
+    common = [report for report in timings if report in baseline]
+    before = sum(baseline[report][1] for report in common)
+    after = sum(timings[report][1] for report in common)
+    if after:
+        print(f"   {'Total (reports in both runs)':<{width}}  {before:>14.4f}  {after:>14.4f}  {before / after:>7.2f}x")
+
+
+# ---------------------------------------------------------------------------
+# Index advisor
+# ---------------------------------------------------------------------------
+
+Candidate = namedtuple("Candidate", "table columns where")
+
+EQUALITY = re.compile(r"(?:(\w+)\.)?(\w+)\s*(?:=(?!=)|==|\bIN\s*\()", re.I)
+JOINED = re.compile(r"=\s*(?:(\w+)\.)?(\w+)")
+FILTER = re.compile(r"(?:(\w+)\.)?(\w+)\s*(?:<>|!=|>=?|<=?|\bNOT\s+IN\b|\bNOT\s+LIKE\b|\bLIKE\b|\bIS\b)", re.I)
+GROUP_BY = re.compile(r"\bGROUP\s+BY\s+(.*?)(?=\bHAVING\b|\bORDER\b|\bLIMIT\b|\bWINDOW\b|\)|;|$)", re.I | re.S)
+COLUMN = re.compile(r"(?:(\w+)\.)?(\w+)")
+
+# Widest index the advisor proposes; wider column sets get a key-only index
+MAX_INDEX_COLUMNS = 10
+LEADING_COLUMNS = ("cYear", "countryCode")
+
+
+def index_name(candidate):
+    digest = hashlib.sha1(repr(candidate).encode()).hexdigest()[:8]
+    return f"idx_advised_{candidate.table}_{digest}"
+
+
+def create_index_sql(candidate):
+    columns = ", ".join(candidate.columns)
+    where = f" WHERE {candidate.where}" if candidate.where else ""
+    return f"CREATE INDEX IF NOT EXISTS {index_name(candidate)} ON {candidate.table} ({columns}){where};"
+
+
+def statement_candidates(statement, columns_of, partial_cycle=None):
+    """Index candidates (one per base table) for the predicates and GROUP BY keys of a statement"""
+    sql = re.sub(r"'(?:[^']|'')*'", "''", statement.sql)
+    aliases = table_aliases(sql)
+    tables = {table for table in aliases.values() if table in columns_of}
+
+    def owned(matches, table):
+        names = {name for name, t in aliases.items() if t == table}
+        found = []
+        for qualifier, column in matches:
+            if column in columns_of[table] and (not qualifier or qualifier in names) and column not in found:
+                found.append(column)
+        return found
+
+    candidates = []
+    for table in tables:
+        equalities = owned(EQUALITY.findall(sql) + JOINED.findall(sql), table)
+        filters = owned(FILTER.findall(sql), table)
+        group_by = owned([m for clause in GROUP_BY.findall(sql) for m in COLUMN.findall(clause)], table)
+        referenced = owned(COLUMN.findall(sql), table)
+        if not equalities and not group_by:
+            continue
+
+        where = None
+        leading = [c for c in LEADING_COLUMNS if c in equalities]
+        if partial_cycle is not None and "cYear" in equalities:
+            where = f"cYear = {int(partial_cycle)}"
+            leading.remove("cYear")
+        key = leading + [c for c in equalities if c not in LEADING_COLUMNS]
+        key += [c for c in group_by if c not in key]
+        key += [c for c in filters if c not in key and c != "cYear"]
+        if where is None:
+            key = key[:MAX_INDEX_COLUMNS]
+        covering = key + sorted(c for c in referenced if c not in key and not (where and c == "cYear"))
+        candidates.append(Candidate(table, tuple(covering if len(covering) <= MAX_INDEX_COLUMNS else key), where))
+    return candidates
+
+
+def advise_indexes(db_file, countryCode, cYear=2016, partial_cycle=None, max_per_table=4):
+    """
+    Proposes indexes for the workload of all reports. Returns a dict with the workload
+    statements, their plans and estimated cost before and after, and the chosen indexes.
+    """
+    sizes = table_sizes(db_file)
+    clone, statements = capture_workload(db_file, countryCode, cYear, clone_schema(db_file, sizes))
+    columns_of = {table: {row[1] for row in clone.execute(f'PRAGMA main.table_info("{table}")')} for table in sizes}
+    plans = [(statement, table_aliases(statement.sql)) for statement in statements]
+
+    before = [explain(clone, statement) for statement in statements]
+    before_cost = [plan_cost(plan, aliases, sizes) for plan, (_, aliases) in zip(before, plans)]
+
+    # Try every candidate at once and let the planner pick; keep the ones it uses most
+    candidates = []
+    for statement in statements:
+        candidates += [c for c in statement_candidates(statement, columns_of, partial_cycle) if c not in candidates]
+    existing = [Candidate(table, tuple(row[2] for row in clone.execute(f'PRAGMA index_info("{index}")')), None)
+                for table in sizes for (_, index, *_) in clone.execute(f'PRAGMA main.index_list("{table}")')]
+    candidates = [c for c in candidates
+                  if not any(o != c and o.table == c.table and o.where == c.where
+                             and o.columns[:len(c.columns)] == c.columns for o in candidates + existing)]
+    for candidate in candidates:
+        clone.execute(create_index_sql(candidate))
+
+    gains = {index_name(c): 0 for c in candidates}
+    for statement, (_, aliases), cost in zip(statements, plans, before_cost):
+        plan = explain(clone, statement)
+        saved = cost - plan_cost(plan, aliases, sizes)
+        for name in gains:
+            if any(name in detail for detail in plan):
+                gains[name] += max(saved, 0) + 1
+
+    chosen = []
+    for table in sorted({c.table for c in candidates}):
+        ranked = sorted((c for c in candidates if c.table == table and gains[index_name(c)] > 0),
+                        key=lambda c: -gains[index_name(c)])
+        chosen += ranked[:max_per_table]
+    for candidate in candidates:
+        if candidate not in chosen:
+            clone.execute(f"DROP INDEX {index_name(candidate)}")
+
+    after = [explain(clone, statement) for statement in statements]
+    after_cost = [plan_cost(plan, aliases, sizes) for plan, (_, aliases) in zip(after, plans)]
+    clone.close()
+
+    return {
+        "statements": statements,
+        "before": list(zip(before, before_cost)),
+        "after": list(zip(after, after_cost)),
+        "indexes": chosen,
+    }
+
+
+def print_advice(advice):
+    """Prints the proposed indexes and the estimated gain per report"""
+    per_report = {}
+    for statement, (_, cost_before), (_, cost_after) in zip(advice["statements"], advice["before"], advice["after"]):
+        totals = per_report.setdefault(statement.report, [0, 0])
+        totals[0] += cost_before
+        totals[1] += cost_after
+
+    print(f"📋 {len(advice['statements'])} statements from {len(per_report)} reports")
+    for report, (cost_before, cost_after) in sorted(per_report.items(), key=lambda item: item[1][1] - item[1][0]):
+        if cost_after < cost_before:
+            print(f"   {report}: ~{cost_before:,} → ~{cost_after:,} rows visited")
+
+    total_before = sum(cost for _, cost in advice["before"])
+    total_after = sum(cost for _, cost in advice["after"])
+    gain = 100.0 * (total_before - total_after) / total_before if total_before else 0
+    print(f"📉 Estimated rows visited: {total_before:,} → {total_after:,} ({gain:.0f}% less)")
+
+    print(f"🗂️ {len(advice['indexes'])} proposed indexes:")
+    for candidate in advice["indexes"]:
+        print(f"   {create_index_sql(candidate)}")
+
+
+def apply_indexes(db_file, indexes):
+    """Creates the proposed indexes in db_file"""
+    conn = sqlite3.connect(db_file)
+    try:
+        for candidate in indexes:
+            conn.execute(create_index_sql(candidate))
+            print(f"Created index on {candidate.table}: {', '.join(candidate.columns)}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def create_advised_indexes(db_file, countryCode=None, cYear=2016):
+    """Setup step: creates the indexes the advisor proposes for the current report workload"""
+    countryCode = countryCode or baseline_extraction.reportedCountries(db_file, cYear)[:1] or ["XX"]
+    advice = advise_indexes(db_file, countryCode, cYear)
+    print_advice(advice)
+    apply_indexes(db_file, advice["indexes"])
+    print("Index process completed")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query plan tools for the WISE report workload')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    advise = commands.add_parser('advise', help='Propose (and optionally create) indexes for the report workload')
+    advise.add_argument('db', help='Path to SQLite DB file')
+    advise.add_argument('country', nargs='?', help='Country Code the workload is captured for (default: first reported)')
+    advise.add_argument('--year', type=int, default=2016, help='Reporting cycle (default: 2016)')
+    advise.add_argument('--partial-cycle', type=int, metavar='YEAR',
+                        help='Propose partial indexes WHERE cYear = YEAR (only used by queries with that literal year)')
+    advise.add_argument('--max-per-table', type=int, default=4, help='Most indexes proposed per table (default: 4)')
+    advise.add_argument('--apply', action='store_true', help='Create the proposed indexes in the database')
+    advise.add_argument('--sql', metavar='FILE', help='Write the CREATE INDEX statements to FILE')
+
+    audit = commands.add_parser('audit', help='Flag full scans, temp B-trees and automatic indexes in the report queries')
+    audit.add_argument('db', help='Path to SQLite DB file')
+    audit.add_argument('country', nargs='?', help='Country Code the workload is captured for (default: first reported)')
+    audit.add_argument('--year', type=int, default=2016, help='Reporting cycle (default: 2016)')
+    audit.add_argument('--output', default='query_plan_audit.csv', help='Ranked report file (default: query_plan_audit.csv)')
+    audit.add_argument('--top', type=int, default=10, help='Reports listed in the summary (default: 10)')
+
+    bench = commands.add_parser('bench', help='Time the report queries, optionally side by side with an earlier run')
+    bench.add_argument('db', help='Path to SQLite DB file')
+    bench.add_argument('country', nargs='?', help='Country Code the workload is captured for (default: first reported)')
+    bench.add_argument('--year', type=int, default=2016, help='Reporting cycle (default: 2016)')
+    bench.add_argument('--reports', nargs='+', metavar='FUNCTION',
+                       help='Time these baseline_extraction report functions instead of the task list')
+    bench.add_argument('--repeat', type=int, default=3, help='Runs per query, the best one counts (default: 3)')
+    bench.add_argument('--output', default='query_benchmark.csv', help='Timings file (default: query_benchmark.csv)')
+    bench.add_argument('--compare', metavar='FILE', help='Timings file of an earlier run to compare with')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise FileNotFoundError(f"Database file not found: {args.db}")
+
+    if args.command == 'advise':
+        countryCode = [args.country] if args.country else baseline_extraction.reportedCountries(args.db, args.year)[:1]
+        advice = advise_indexes(args.db, countryCode or ["XX"], args.year, args.partial_cycle, args.max_per_table)
+        print_advice(advice)
+        if args.sql:
+            with open(args.sql, 'w') as f:
+                f.writelines(create_index_sql(candidate) + "\n" for candidate in advice["indexes"])
+        if args.apply:
+            apply_indexes(args.db, advice["indexes"])
+
+    elif args.command == 'audit':
+        countryCode = [args.country] if args.country else baseline_extraction.reportedCountries(args.db, args.year)[:1]
+        findings = audit_queries(args.db, countryCode or ["XX"], args.year)
+        print_audit(findings, args.top)
+        write_audit_report(findings, args.output)
+        print(f"✅ Audit written to {args.output}")
+
+    elif args.command == 'bench':
+        countryCode = [args.country] if args.country else baseline_extraction.reportedCountries(args.db, args.year)[:1]
+        timings = benchmark_queries(args.db, countryCode or ["XX"], args.year, args.reports, args.repeat)
+        print_benchmark(timings, read_benchmark(args.compare) if args.compare else None)
+        write_benchmark(timings, args.output)
+        print(f"✅ Timings written to {args.output}")
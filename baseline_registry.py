@@ -0,0 +1,310 @@
+import difflib
+from collections import namedtuple
+from functools import partial
+
+import baseline_bitmap
+import baseline_extraction
+import baseline_fusion
+
+
+# Report registry.
+#
+# Every CSV report the tool writes is declared here once: its id (the name of its
+# function in baseline_extraction, or of its entry in a shared-scan engine), a
+# description, the domain tags it can be selected by, the WISE tables it reads and
+# the files it writes ({cYear} stands for the reporting cycle; the other names are
+# fixed, whatever the cycle). The list is in extraction order.
+#
+# A run can be limited to some of the reports (--only, --tags, --exclude). The
+# reports an engine answers in one scan still run in one task, given only the
+# selected ones, so a partial refresh costs just what it writes.
+#
+# A report flagged all_countries also reads the rows of the countries it does not
+# write (e.g. which codes any country of the cycle reports), so a --resume run
+# rebuilds it when any country's slice of its tables changes.
+
+Report = namedtuple("Report", "id description tags tables outputs engine all_countries", defaults=(None, False))
+
+TAGS = {
+    "sw": "surface water bodies",
+    "gw": "groundwater bodies",
+    "status": "ecological, chemical and quantitative status",
+    "pressure": "significant pressures and impacts",
+    "impact": "significant impacts only",
+    "exemption": "exemptions (Article 4)",
+    "pollutant": "pollutants and river basin specific pollutants",
+    "qe": "quality elements",
+}
+
+# Shared-scan engine -> task description
+ENGINES = {
+    baseline_fusion.SurfaceWaterBody_reports: "Surface Water Body reports (shared scan)",
+    baseline_fusion.GroundWaterBody_reports: "Groundwater Body reports (shared scan)",
+    baseline_bitmap.PressureImpact_reports: "Surface water Pressure & Impact reports (bitmap index)",
+    baseline_fusion.QualityElement_reports: "Quality Element reports (shared scan)",
+}
+
+SWB = ("SOW_SWB_SurfaceWaterBody",)
+GWB = ("SOW_GWB_GroundWaterBody",)
+QE = ("SOW_SWB_QualityElement",)
+SW_ENGINE = baseline_fusion.SurfaceWaterBody_reports
+GW_ENGINE = baseline_fusion.GroundWaterBody_reports
+QE_ENGINE = baseline_fusion.QualityElement_reports
+BITMAP_ENGINE = baseline_bitmap.PressureImpact_reports
+
+REPORTS = [
+    Report("rbdCodeNames", "River basin district code names", ("sw",),
+           ("swRBD_Europe_data",), ("rbdCodeNames{cYear}.csv",)),
+
+    Report("WISE_SOW_SurfaceWaterBody_SWB_Table", "Surface water body number and size", ("sw",),
+           SWB, ("1.surfaceWaterBodyNumberAndSite{cYear}.csv",), SW_ENGINE),
+    Report("WISE_SOW_SurfaceWaterBody_SWB_Category", "Surface water body category", ("sw",),
+           SWB, ("3.surfaceWaterBodyCategory{cYear}.csv",), SW_ENGINE),
+    Report("WISE_SOW_SurfaceWaterBody_SWB_ChemicalStatus_Table", "Surface water chemical status", ("sw", "status"),
+           SWB, ("12.surfaceWaterBodyChemicalStatusGood{cYear}.csv",), SW_ENGINE),
+    Report("SurfaceWaterBody_ChemicalStatus_Table_by_Category", "Surface water chemical status by category",
+           ("sw", "status"), SWB, ("12.SurfaceWaterBody_SWB_ChemicalStatus_Table_by_Category{cYear}.csv",), SW_ENGINE),
+    Report("Surface_water_bodies_Ecological_status_or_potential_groupGoodHigh",
+           "Surface water ecological status: good or high", ("sw", "status"),
+           SWB, ("8.Surface_water_bodies_Ecological_status_or_potential_group_Good_High{cYear}.csv",), SW_ENGINE),
+    Report("Surface_water_bodies_Ecological_status_or_potential_groupFailling",
+           "Surface water ecological status: failing", ("sw", "status"),
+           SWB, ("8.Surface_water_bodies_Ecological_status_or_potential_group_Failing{cYear}.csv",), SW_ENGINE),
+    Report("swEcologicalStatusOrPotential_RW_LW_Category2ndRBMP2016",
+           "Surface water ecological status by category", ("sw", "status"),
+           SWB, ("8.swEcologicalStatusOrPotential_RW_LW_Category2ndRBMP2016.csv",), SW_ENGINE),
+    Report("swEcologicalStatusOrPotential_Unknown_Category2ndRBMP2016",
+           "Surface water unknown ecological status by category", ("sw", "status"),
+           SWB, ("9.swEcologicalStatusOrPotential_Unknown_Category2ndRBMP{cYear}.csv",), SW_ENGINE),
+    Report("swEcologicalStatusOrPotentialChemical_by_Country",
+           "Surface water ecological and chemical status by country", ("sw", "status"),
+           SWB, ("15.swChemicalStatusValue_by_Country{cYear}.csv", "15.swEcologicalStatusOrPotential_by_Country{cYear}.csv"),
+           SW_ENGINE),
+    Report("swEcologicalStatusOrPotentialValue_swChemicalStatusValue_by_Country_by_Categ",
+           "Surface water ecological and chemical status by country and category", ("sw", "status"),
+           SWB, ("15.swChemicalStatusValue_by_Country_by_Categ{cYear}.csv",
+                 "15.swEcologicalStatusOrPotentialValue_swChemicalStatusValue_by_Country_by_Categ.csv"), SW_ENGINE),
+    Report("swb_Chemical_assessment_using_monitoring_grouping_or_expert_judgement",
+           "Surface water chemical assessment method", ("sw", "status"),
+           SWB, ("39.swb_Chemical_assessment_using_monitoring_grouping_or_expert_judgement2016.csv",), SW_ENGINE),
+    Report("swEcologicalStatusOrPotentialExpectedGoodIn2015", "Surface water ecological status expected good in 2015",
+           ("sw", "status"), SWB, ("44.swEcologicalStatusOrPotentialExpectedGoodIn2015.csv",), SW_ENGINE),
+    Report("swEcologicalStatusOrPotentialExpectedAchievementDate",
+           "Surface water ecological status expected achievement date", ("sw", "status"),
+           SWB, ("45.swEcologicalStatusOrPotentialExpectedAchievementDate2016.csv",), SW_ENGINE),
+    Report("swChemicalStatusExpectedGoodIn2015", "Surface water chemical status expected good in 2015", ("sw", "status"),
+           SWB, ("46.swChemicalStatusExpectedGoodIn2015.csv",), SW_ENGINE),
+    Report("swChemicalStatusExpectedAchievementDate", "Surface water chemical status expected achievement date",
+           ("sw", "status"), SWB, ("47.swChemicalStatusExpectedAchievementDate2016.csv",), SW_ENGINE),
+    Report("swChemical_by_Country_2016", "Surface water chemical status by country (2016 cycle)", ("sw", "status"),
+           SWB, ("14.swChemical_by_Country.csv",), SW_ENGINE),
+    Report("Surface_water_bodies_Failing_notUnknown_by_Country",
+           "Surface water bodies failing, without unknown, by country", ("sw", "status"),
+           SWB, ("16.Surface_water_bodies_Failing_notUnknown_by_Country{cYear}.csv",), SW_ENGINE),
+    Report("sw_delineation_of_the_management_units_in_the_1st_and_2nd_RBMP",
+           "Surface water management units unchanged since the 1st RBMP", ("sw",),
+           SWB, ("9.1.sw_delineation_of_the_management_units_in_the_1st_and_2nd_RBMP_Unchanged_{cYear}.csv",), SW_ENGINE),
+
+    Report("Surface_water_bodies_Ecological_exemptions_and_pressures", "Ecological Exemptions & Pressures",
+           ("sw", "exemption", "pressure"), ("SOW_SWB_SWE_swEcologicalExemptionPressure",),
+           ("6.Surface_water_bodies_Ecological_exemptions_and_pressures{cYear}.csv",)),
+    Report("Surface_water_bodies_Quality_element_exemptions_Type", "Quality Element Exemption Type",
+           ("sw", "exemption", "qe"), ("SOW_SWB_QE_qeEcologicalExemptionType",),
+           ("6.Surface_water_bodies_Quality_element_exemptions_Type{cYear}.csv",)),
+    Report("SWB_Chemical_exemption_type", "Chemical Exemption Type", ("sw", "exemption"),
+           ("SOW_SWB_SWP_SWChemicalExemptionType",), ("6.swChemical_exemption_type{cYear}.csv",)),
+    Report("swRBsPollutants", "Surface Water Pollutants", ("sw", "pollutant"),
+           ("SOW_SWB_FailingRBSP",), ("40.swRBsPollutants.csv",)),
+
+    Report("GroundWaterBodyCategory2016", "Groundwater body category", ("gw",),
+           GWB, ("2.GroundWaterBodyCategory{cYear}.csv",), GW_ENGINE),
+    Report("SOW_GWB_GroundWaterBody_GWB_Chemical_status", "Groundwater chemical status", ("gw", "status"),
+           GWB, ("20.GroundWaterBodyCategoryChemical_status2016.csv",), GW_ENGINE),
+    Report("SOW_GWB_GroundWaterBody_GWB_Quantitative_status", "Groundwater quantitative status", ("gw", "status"),
+           GWB, ("18.GroundWaterBodyCategoryQuantitative_status2016.csv",), GW_ENGINE),
+    Report("gwQuantitativeStatusValue_gwChemicalStatusValue", "Groundwater quantitative and chemical status by country",
+           ("gw", "status"), GWB, ("22.gwChemicalStatusValue_Percent_Country_{cYear}.csv",
+                                   "22.gwQuantitativeStatusValue_Percent_Country_{cYear}.csv"), GW_ENGINE),
+    Report("Groundwater_bodies_At_risk_of_failing_to_achieve_good_quantitative_status",
+           "Groundwater bodies at risk of failing good status", ("gw", "status"),
+           GWB, ("25.Groundwater_bodies_At_risk_of_failing_to_achieve_good_quantitative_status2016.csv",), GW_ENGINE),
+    Report("gwChemicalStatusValue_Table", "Groundwater chemical status table", ("gw", "status"),
+           GWB, ("26.gwChemicalStatusValue_Table2016.csv",), GW_ENGINE),
+    Report("gwQuantitativeStatusExpectedGoodIn2015", "Groundwater quantitative status expected good in 2015",
+           ("gw", "status"), GWB, ("29.gwQuantitativeStatusExpectedGoodIn2015.csv",), GW_ENGINE),
+    Report("gwQuantitativeStatusExpectedAchievementDate", "Groundwater quantitative status expected achievement date",
+           ("gw", "status"), GWB, ("30.gwQuantitativeStatusExpectedAchievementDate2016.csv",), GW_ENGINE),
+    Report("gwChemicalStatusExpectedGoodIn2015", "Groundwater chemical status expected good in 2015", ("gw", "status"),
+           GWB, ("31.gwChemicalStatusExpectedGoodIn2015.csv",), GW_ENGINE),
+    Report("gwChemicalStatusExpectedAchievementDate", "Groundwater chemical status expected achievement date",
+           ("gw", "status"), GWB, ("32.gwChemicalStatusExpectedAchievementDate2016.csv",), GW_ENGINE),
+    Report("gwQuantitativeAssessmentConfidence", "Groundwater quantitative assessment confidence", ("gw", "status"),
+           GWB, ("35.gwQuantitativeAssessmentConfidence2016.csv",), GW_ENGINE),
+    Report("gwChemicalAssessmentConfidence", "Groundwater chemical assessment confidence", ("gw", "status"),
+           GWB, ("36.gwChemicalAssessmentConfidence2016.csv",), GW_ENGINE),
+    Report("Number_of_groundwater_bodies_failing_to_achieve_good_status",
+           "Number of groundwater bodies failing good status", ("gw", "status"),
+           GWB, ("37.Number_of_groundwater_bodies_failing_to_achieve_good_status.csv",), GW_ENGINE),
+    Report("geologicalFormation", "Groundwater body geological formation", ("gw",),
+           GWB, ("38.GWB_geologicalFormation2016.csv",), GW_ENGINE),
+    Report("Ground_water_bodies_Failing_notUnknown_by_Country",
+           "Groundwater bodies failing, without unknown, by country", ("gw", "status"),
+           GWB, ("23.Ground_water_bodies_Failing_notUnknown_by_Country{cYear}.csv",), GW_ENGINE),
+
+    Report("Groundwater_bodies_Chemical_Exemption_Type", "Groundwater Chemical Exemption Type", ("gw", "exemption"),
+           ("SOW_GWB_GWP_GWChemicalExemptionType",), ("7.Groundwater_bodies_Chemical_Exemption_Type{cYear}.csv",)),
+    Report("Groundwater_bodies_Quantitative_Exemption_Type", "Groundwater Quantitative Exemption Type",
+           ("gw", "exemption"), ("SOW_GWB_gwQuantitativeExemptionPressure",),
+           ("7.Groundwater_bodies_Quantitative_Exemption_Type2016.csv",)),
+    Report("gwChemical_exemptions_and_pressures", "Groundwater Chemical Exemptions & Pressures",
+           ("gw", "exemption", "pressure"), ("SOW_GWB_GWP_GWC_gwChemicalExemptionPressure",),
+           ("7.gwChemical_exemptions_and_pressures.csv",)),
+    Report("Groundwater_bodies_Quantitative_exemptions_and_pressures", "Groundwater Quantitative Exemptions & Pressures",
+           ("gw", "exemption", "pressure"), ("SOW_GWB_gwQuantitativeExemptionPressure",),
+           ("7.Groundwater_bodies_Quantitative_exemptions_and_pressures2016.csv",)),
+    Report("SOW_GWB_gwQuantitativeReasonsForFailure_Table", "Groundwater Quantitative Reasons for Failure",
+           ("gw", "status"), ("SOW_GWB_gwQuantitativeReasonsForFailure",),
+           ("25.SOW_GWB_gwQuantitativeReasonsForFailure_Table2016.csv",)),
+    Report("SOW_GWB_gwChemicalReasonsForFailure_Table", "Groundwater Chemical Reasons for Failure", ("gw", "status"),
+           ("SOW_GWB_gwChemicalReasonsForFailure",), ("26.gwChemicalReasonsForFailure_Table2016.csv",)),
+
+    Report("swSignificant_Pressure_Type_Table2016", "Surface water Significant Pressure Type", ("sw", "pressure"),
+           (baseline_bitmap.SW_PRESSURE_INDEX.source,), ("4.swSignificant_Pressure_Type_Table2016.csv",), BITMAP_ENGINE),
+    Report("SignificantImpactType_Table2016", "Surface water Significant Impact Type", ("sw", "pressure", "impact"),
+           (baseline_bitmap.SW_IMPACT_INDEX.source,), ("4.SignificantImpactType_Table2016.csv",), BITMAP_ENGINE),
+    Report("swNumber_of_Impacts_by_country", "Surface water Number of Impacts by Country", ("sw", "pressure", "impact"),
+           (baseline_bitmap.SW_IMPACT_ROWS_INDEX.source,), ("NewDash.7.swNumber_of_impacts_by_country_2016.csv",),
+           BITMAP_ENGINE),
+
+    Report("swSignificantImpactType_Table_Other2016", "Surface water Significant Impacts type Other",
+           ("sw", "pressure", "impact"), ("SOW_SWB_swSignificantImpactOther",),
+           ("4.swSignificantImpactType_Table_Other2016.csv",)),
+    Report("swSignificantPressureType_Table_Other", "Surface water Significant Pressure Other", ("sw", "pressure"),
+           ("SOW_SWB_swSignificantPressureOther",), ("4.swSignificantPressureType_Table_Other.csv",)),
+    Report("gwSignificantImpactTypeByCountry", "Groundwater Significant Impact type by Country",
+           ("gw", "pressure", "impact"), ("SOW_GWB_gwSignificantImpactType",),
+           ("5.1.gwSignificantImpactTypeByCountry.csv",)),
+    Report("gwSignificantImpactType2016", "Groundwater Significant Impact Type", ("gw", "pressure", "impact"),
+           ("SOW_GWB_gwSignificantImpactType",), ("5.gwSignificantImpactType2016.csv",)),
+    Report("gwSignificantImpactType_Other", "Groundwater Significant Impact type Other", ("gw", "pressure", "impact"),
+           ("SOW_GWB_gwSignificantImpactOther",), ("5.gwSignificantImpactType_Other.csv",)),
+    Report("SOW_GWB_gwSignificantPressureType_NumberOfImpact_by_country",
+           "Groundwater Significant Pressure Type by Country", ("gw", "pressure"),
+           ("SOW_GWB_gwSignificantPressureOther",), ("5.SOW_GWB_gwSignificantPressureType_NumberOfImpact_by_country.csv",)),
+    Report("gwSignificantPressureType2016", "Groundwater Significant Pressure type", ("gw", "pressure"),
+           ("SOW_GWB_gwSignificantPressureType",), ("5.gwSignificantPressureType2016.csv",)),
+    Report("gwSignificantPressureType_OtherTable2016", "Groundwater Significant Pressure type Other", ("gw", "pressure"),
+           ("SOW_GWB_gwSignificantPressureOther",), ("5.gwSignificantPressureType_OtherTable{cYear}.csv",)),
+    Report("SOW_GWB_gwPollutant_Table", "Groundwater Pollutants", ("gw", "pollutant"),
+           ("SOW_GWB_gwPollutant",), ("21.SOW_GWB_gwPollutant_Table2016.csv",)),
+    Report("SOW_GWB_gwPollutant_Table_Other", "Groundwater Pollutants reported as Other", ("gw", "pollutant"),
+           ("SOW_GWB_gwPollutantOther",), ("21.SOW_GWB_gwPollutant_Table{cYear}_Other.csv",)),
+    Report("swRiver_basin_specific_pollutants_reported_as_Other", "Surface water specific pollutant reported as Other",
+           ("sw", "pollutant"), ("SOW_SWB_FailingRBSPOther",),
+           ("40.Surface_water_bodies_River_basin_specific_pollutants_reported_as_Other{cYear}.csv",)),
+
+    Report("Surface_water_bodies_QE1_Biological_quality_elements_assessment",
+           "Biological quality elements (QE1) assessment", ("sw", "qe"),
+           QE, ("42.Surface_water_bodies_QE1_Biological_quality_elements_assessment2016.csv",), QE_ENGINE),
+    Report("Surface_water_bodies_QE2_assessment", "Hydromorphological quality elements (QE2) assessment", ("sw", "qe"),
+           QE, ("42.Surface_water_bodies_QE2_assessment2016.csv",), QE_ENGINE),
+    Report("Surface_water_bodies_QE3_assessment", "Physico-chemical quality elements (QE3) assessment", ("sw", "qe"),
+           QE, ("42.Surface_water_bodies_QE3_assessment{cYear}.csv",), QE_ENGINE, all_countries=True),
+    Report("Surface_water_bodies_QE3_3_assessment", "River basin specific pollutants (QE3-3) assessment",
+           ("sw", "qe", "pollutant"), QE, ("42.Surface_water_bodies_QE3_3_assessment{cYear}.csv",), QE_ENGINE,
+           all_countries=True),
+
+    Report("Surface_water_bodies_Ecological_exemptions_Type", "Ecological Exemption Type", ("sw", "exemption"),
+           ("SOW_SWB_SWEcologicalExemptionType",), ("6.Surface_water_bodies_Ecological_exemptions_Type{cYear}.csv",)),
+]
+
+REPORTS_BY_ID = {report.id: report for report in REPORTS}
+
+
+def _check_names(kind, names, known):
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        hints = [f"{name} (did you mean {', '.join(matches)}?)" if matches else name for name in unknown
+                 for matches in [difflib.get_close_matches(name, known, n=2)]]
+        raise ValueError(f"Unknown {kind}: {'; '.join(hints)}. List them with: python baseline_registry.py")
+
+
+def select_reports(only=None, tags=None, exclude=None):
+    """
+    Ids of the reports of a partial run, in registry order: the reports named in `only` plus
+    the reports carrying any of `tags` (all of them when neither is given), minus the reports
+    named or tagged in `exclude`. Raises ValueError for unknown ids/tags or an empty selection.
+    """
+    only, tags, exclude = set(only or ()), set(tags or ()), set(exclude or ())
+    _check_names("report id(s)", sorted(only), list(REPORTS_BY_ID))
+    _check_names("tag(s)", sorted(tags), list(TAGS))
+    _check_names("report id(s) or tag(s)", sorted(exclude), list(REPORTS_BY_ID) + list(TAGS))
+
+    selected = [report for report in REPORTS
+                if (not only and not tags) or report.id in only or tags & set(report.tags)]
+    selected = [report.id for report in selected if report.id not in exclude and not exclude & set(report.tags)]
+    if not selected:
+        raise ValueError("No report matches the selection")
+    return selected
+
+
+def reads_all_countries(name):
+    """
+    True when the task of this name (a report id, a shared-scan engine or "engine:report+report",
+    as baseline_scheduler.task_key names them) runs a report flagged all_countries
+    """
+    engine, _, reports = name.partition(":")
+    if reports:
+        ids = reports.split("+")
+    elif engine in REPORTS_BY_ID:
+        ids = [engine]
+    else:
+        ids = [report.id for report in REPORTS if report.engine is not None and report.engine.__name__ == engine]
+    return any(REPORTS_BY_ID[report_id].all_countries for report_id in ids if report_id in REPORTS_BY_ID)
+
+
+def report_functions(reports=None):
+    """
+    (description, function) pairs that write the given report ids (default: all), in
+    registry order. The reports of a shared-scan engine make one pair, at the place of
+    the first of them; when only some are selected the engine is told which.
+    """
+    selected = REPORTS if reports is None else [report for report in REPORTS if report.id in set(reports)]
+    functions = []
+    engines = {}
+    for report in selected:
+        if report.engine is None:
+            functions.append((report.description, getattr(baseline_extraction, report.id)))
+        elif report.engine not in engines:
+            engines[report.engine] = len(functions)
+            functions.append(None)
+
+    for engine, position in engines.items():
+        served = [report.id for report in selected if report.engine == engine]
+        every = [report.id for report in REPORTS if report.engine == engine]
+        if served == every:
+            functions[position] = (ENGINES[engine], engine)
+        else:
+            functions[position] = (f"{ENGINES[engine]}, {len(served)} of {len(every)}", partial(engine, reports=served))
+    return functions
+
+
+# Lists the registry: python baseline_registry.py [--tags sw pressure ...]
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='List the reports of the WISE extraction')
+    parser.add_argument('--tags', nargs='+', default=[], help='Only the reports carrying one of these tags')
+    args = parser.parse_args()
+
+    try:
+        reports = select_reports(tags=args.tags)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for report in (REPORTS_BY_ID[report_id] for report_id in reports):
+        engine = f"  [{report.engine.__name__}]" if report.engine else ""
+        print(f"{report.id}  ({', '.join(report.tags)}){engine}")
+        print(f"    {report.description}; reads {', '.join(report.tables)}")
+        print(f"    writes {', '.join(report.outputs)}")
+    print(f"\n{len(reports)} of {len(REPORTS)} reports. Tags: " + "; ".join(f"{tag} = {text}" for tag, text in TAGS.items()))
@@ -0,0 +1,166 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import baseline_queryplan
+from baseline_extraction import sidecar_path
+
+
+# Cost-aware task scheduling.
+#
+# The pool used to take the tasks in list order, so the heavy reports (pressures,
+# quality elements, medians) often started last and left one worker running long
+# after the others were idle. The scheduler instead hands them out longest first
+# (LPT): every free worker picks up the most expensive task still waiting.
+#
+# The cost of a task is its runtime in earlier runs, stored per report, country
+# list and cycle in the sidecar's task_runtimes table. Without one (the first run
+# on a database or for a country) it is estimated from row counts: the rows of
+# every table the report's queries read, taken from the captured workload.
+#
+# The stored runtimes also set the time budgets of a run with a task timeout: a
+# report known to be slow gets a multiple of its usual runtime, so the timeout
+# catches runaway queries rather than the reports that are always heavy.
+
+# A task's time budget is at least this many times its stored runtime
+BUDGET_HEADROOM = 5
+
+
+def task_key(task):
+    """
+    (report, countries, cycles) of a task tuple: the key of its stored runtime. A shared-scan
+    engine limited to some of its reports is keyed "engine:report+report"
+    """
+    _, func, args = task
+    if args and callable(args[0]):  # split_by_country(report, db_file, countryCode, cYear, ...)
+        func, args = args[0], args[1:]
+    reports = getattr(func, "keywords", {}).get("reports")
+    func = getattr(func, "func", func)  # functools.partial of the shared-scan engines
+    name = func.__name__ if reports is None else f"{func.__name__}:{'+'.join(reports)}"
+    _, countryCode, cYears = args[:3]
+    cYears = cYears if isinstance(cYears, list) else [cYears]
+    return name, ",".join(countryCode), ",".join(str(cYear) for cYear in cYears)
+
+
+def _report_function(task):
+    _, func, args = task
+    if args and callable(args[0]):
+        func = args[0]
+    return getattr(func, "func", func)
+
+
+def _connect_runtimes(db_file):
+    conn = sqlite3.connect(sidecar_path(db_file))
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS task_runtimes (
+            report TEXT NOT NULL,
+            countryCode TEXT NOT NULL,
+            cYear TEXT NOT NULL,
+            seconds REAL NOT NULL,
+            recorded_at TEXT NOT NULL,
+            PRIMARY KEY (report, countryCode, cYear)
+        )
+    """)
+    return conn
+
+
+def stored_runtimes(db_file):
+    """Returns {(report, countries, cycles): seconds} of the earlier runs on db_file"""
+    conn = _connect_runtimes(db_file)
+    try:
+        return {(report, countryCode, cYear): seconds for report, countryCode, cYear, seconds
+                in conn.execute("SELECT report, countryCode, cYear, seconds FROM task_runtimes")}
+    finally:
+        conn.close()
+
+
+def record_runtimes(db_file, runtimes):
+    """Stores the {task key: seconds} runtimes of a run, replacing the earlier ones"""
+    recorded_at = datetime.now().isoformat(timespec="seconds")
+    conn = _connect_runtimes(db_file)
+    try:
+        conn.executemany("INSERT OR REPLACE INTO task_runtimes (report, countryCode, cYear, seconds, recorded_at) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         [key + (seconds, recorded_at) for key, seconds in runtimes.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def rows_read(db_file, reports, countryCode, cYear):
+    """
+    Cold-start cost of the report functions: {report name: rows}, the sum over the
+    statements a report executes of the rows of the tables each statement reads.
+    """
+    sizes = baseline_queryplan.table_sizes(db_file)
+    sidecar = sidecar_path(db_file)
+    derived_sizes = baseline_queryplan.table_sizes(sidecar) if os.path.exists(sidecar) else {}
+    clone, statements = baseline_queryplan.capture_workload(
+        db_file, countryCode, cYear, baseline_queryplan.clone_schema(db_file, sizes), reports)
+    clone.close()
+
+    rows = {report.__name__: 0 for report in reports}
+    for statement in statements:
+        tables = {(schema.lower() or "main", table) for schema, table, _
+                  in baseline_queryplan.TABLE_REF.findall(statement.sql)}
+        rows[statement.report] = rows.get(statement.report, 0) + sum(
+            (sizes if schema == "main" else derived_sizes).get(table, 0)
+            for schema, table in tables if schema in ("main", "derived"))
+    return rows
+
+
+def estimate_costs(db_file, tasks):
+    """
+    Estimated runtime in seconds of every task: the stored runtime when there is one,
+    otherwise its row count estimate converted with the seconds per row of the tasks
+    that have both (or left in rows when none has).
+    """
+    history = stored_runtimes(db_file)
+    keys = [task_key(task) for task in tasks]
+    missing = [i for i, key in enumerate(keys) if key not in history]
+    if not missing:
+        return [history[key] for key in keys], 0
+
+    reports = list({_report_function(tasks[i]): None for i in range(len(tasks))})
+    countryCode = sorted({country for key in keys for country in key[1].split(",")})
+    cYear = int(keys[0][2].split(",")[0])
+    try:
+        rows = rows_read(db_file, reports, countryCode, cYear)
+    except Exception as e:
+        print(f"⚠️ Could not estimate the task costs from row counts: {e}")
+        rows = {}
+    # A task covering several countries or cycles reads that many slices of its tables
+    estimates = [rows.get(_report_function(task).__name__, 0) * len(key[1].split(",")) * len(key[2].split(","))
+                 for task, key in zip(tasks, keys)]
+
+    known = [i for i, key in enumerate(keys) if key in history and estimates[i]]
+    seconds_per_row = (sum(history[keys[i]] for i in known) / sum(estimates[i] for i in known)) if known else 1.0
+    costs = [history[key] if key in history else estimates[i] * seconds_per_row for i, key in enumerate(keys)]
+    return costs, len(missing)
+
+
+def time_budgets(db_file, tasks, timeout):
+    """
+    Time budget in seconds of every task, given the timeout of a report per country and
+    cycle: timeout times the country/cycle slices of the task, or BUDGET_HEADROOM times
+    its stored runtime when that is longer. None for every task without a timeout.
+    """
+    if timeout is None:
+        return [None] * len(tasks)
+    history = stored_runtimes(db_file)
+    budgets = []
+    for task in tasks:
+        key = task_key(task)
+        slices = len(key[1].split(",")) * len(key[2].split(","))
+        budgets.append(max(timeout * slices, BUDGET_HEADROOM * history.get(key, 0)))
+    return budgets
+
+
+def schedule(db_file, tasks):
+    """Orders the task tuples longest first and returns them as (position in tasks, task) pairs"""
+    costs, estimated = estimate_costs(db_file, tasks)
+    order = sorted(range(len(tasks)), key=lambda i: -costs[i])
+    print(f"📐 Scheduling {len(tasks)} tasks longest first "
+          f"({len(tasks) - estimated} from stored runtimes, {estimated} estimated from row counts)")
+    return [(i, tasks[i]) for i in order]
+
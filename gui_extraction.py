@@ -2,10 +2,12 @@ import os
 import time
 import ttkbootstrap as ttk  # ✅ Use ttkbootstrap for a modern UI
 from ttkbootstrap import Style
-from tkinter import filedialog, messagebox
+from tkinter import BooleanVar, filedialog, messagebox
 from multiprocessing import Process, Queue, freeze_support
 import baseline_extraction
+import baseline_migrations
 import baseline_processing
+import baseline_registry
 
 # ✅ Function to Browse Database File
 def browse_db():
@@ -28,28 +30,49 @@ def create_indexes():
         messagebox.showerror("Error", "Invalid Database File! Please select a valid .sqlite file.")
         return
 
+    if baseline_migrations.indexes_applied(db_file):
+        messagebox.showinfo("Create Indexes", "Indexes are already created for this database.")
+        return
+
     if messagebox.askyesno("Create Indexes", "Do you want to create indexes for the database?"):
-        baseline_extraction.createIndexies(db_file)
+        baseline_migrations.apply_indexes(db_file)
         messagebox.showinfo("Success", "Indexes created successfully!")
 
 # ✅ Start Extraction in a Separate Process
 def run_extraction():
     """Starts extraction in a separate process to avoid blocking the GUI."""
     db_file = db_entry.get()
-    countryCode = country_entry.get().strip()
+    countryCodes = country_entry.get().replace(",", " ").split()
+    cycles = cycles_entry.get().replace(",", " ").split()
     output_dir = output_entry.get()
 
     if not db_file or not os.path.exists(db_file):
         messagebox.showerror("Error", "Invalid Database File!")
         return
-    if not countryCode:
+    if not cycles or not all(cycle.isdigit() for cycle in cycles):
+        messagebox.showerror("Error", "Reporting cycles must be years (e.g., 2016 or 2010, 2016, 2022)!")
+        return
+    cYears = sorted({int(cycle) for cycle in cycles})
+    if all_countries_var.get():
+        countryCodes = sorted({code for cYear in cYears for code in baseline_extraction.reportedCountries(db_file, cYear)})
+    if not countryCodes:
         messagebox.showerror("Error", "Country Code is required!")
         return
     if not output_dir or not os.path.isdir(output_dir):
         messagebox.showerror("Error", "Invalid Output Directory!")
         return
 
-    working_directory = os.path.join(output_dir, countryCode)
+    only, tags, exclude = (entry.get().replace(",", " ").split() for entry in (only_entry, tags_entry, exclude_entry))
+    reports = None
+    if only or tags or exclude:
+        try:
+            reports = baseline_registry.select_reports(only, tags, exclude)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        log_text.insert(ttk.END, f"📋 Running {len(reports)} of {len(baseline_registry.REPORTS)} reports\n")
+
+    countryCode = ", ".join(countryCodes)
 
     log_text.insert(ttk.END, f"📂 Starting Extraction for {countryCode}...\n")
     log_text.update_idletasks()
@@ -58,19 +81,26 @@ def run_extraction():
     progress_bar.start(10)
 
     queue = Queue()
-    process = Process(target=run_extraction_process, args=(db_file, countryCode, working_directory, queue))
+    process = Process(target=run_extraction_process, args=(db_file, countryCodes, output_dir, cYears, compare_cycles_var.get(),
+                                                           resume_var.get(), reports, queue))
     process.start()
 
     root.after(100, check_queue, queue)
 
 # ✅ Run Extraction Process (Multiprocessing)
-def run_extraction_process(db_file, countryCode, working_directory, queue):
+def run_extraction_process(db_file, countryCodes, output_dir, cYears, compare_cycles, resume, reports, queue):
     """Runs the extraction process and sends completion status."""
     start_time = time.time()
-    baseline_processing.run_csv_generation_process_multiprocessing(db_file, [countryCode], working_directory)
+    if len(countryCodes) == 1:
+        working_directory = os.path.join(output_dir, countryCodes[0])
+        baseline_processing.run_csv_generation_process_multiprocessing(db_file, countryCodes, working_directory, cYears, compare_cycles,
+                                                                       resume=resume, reports=reports)
+    else:
+        baseline_processing.run_batch_extraction(db_file, countryCodes, output_dir, cYears, compare_cycles, resume=resume,
+                                                 reports=reports)
     elapsed_time = time.time() - start_time
 
-    queue.put((countryCode, elapsed_time))
+    queue.put((", ".join(countryCodes), elapsed_time))
 
 # ✅ Check Queue for Extraction Completion
 def check_queue(queue):
@@ -100,13 +130,14 @@ def exit_application():
 
 # ✅ GUI Setup
 def create_gui():
-    global root, db_entry, country_entry, output_entry, log_text, progress_bar
+    global root, db_entry, country_entry, all_countries_var, cycles_entry, compare_cycles_var, output_entry, resume_var, log_text, progress_bar
+    global only_entry, tags_entry, exclude_entry
 
     root = ttk.Window(themename="lumen")  # ✅ Modern UI theme
     style = Style(theme="lumen")
 
     root.title("WISE Database Extraction Tool")
-    root.geometry("600x900")
+    root.geometry("600x1000")
 
     font = ("Arial", 10, "bold")
 
@@ -119,9 +150,33 @@ def create_gui():
 
     # ✅ Country Code Entry
     ttk.Label(root, text="Country Code", font=font).pack(pady=5)
-    ttk.Label(root, text="Enter the country code (e.g., 'DE' for Germany, 'FR' for France).", foreground="gray").pack()
-    country_entry = ttk.Entry(root, width=10)
+    ttk.Label(root, text="Enter one or more country codes (e.g., 'DE' or 'DE, FR, IT').", foreground="gray").pack()
+    country_entry = ttk.Entry(root, width=30)
     country_entry.pack(pady=2)
+    all_countries_var = BooleanVar(value=False)
+    ttk.Checkbutton(root, text="All countries in the database", variable=all_countries_var, bootstyle="round-toggle").pack(pady=2)
+
+    # ✅ Reporting Cycle Entry
+    ttk.Label(root, text="Reporting Cycle(s)", font=font).pack(pady=5)
+    ttk.Label(root, text="Enter one or more reporting years (e.g., '2016' or '2010, 2016, 2022').", foreground="gray").pack()
+    cycles_entry = ttk.Entry(root, width=30)
+    cycles_entry.insert(0, "2016")
+    cycles_entry.pack(pady=2)
+    compare_cycles_var = BooleanVar(value=False)
+    ttk.Checkbutton(root, text="Side-by-side cycle reports", variable=compare_cycles_var, bootstyle="round-toggle").pack(pady=2)
+
+    # ✅ Report Selection
+    ttk.Label(root, text="Reports", font=font).pack(pady=5)
+    ttk.Label(root, text=f"Leave empty for all reports. Tags: {', '.join(baseline_registry.TAGS)}.", foreground="gray").pack()
+    selection_frame = ttk.Frame(root)
+    selection_frame.pack(pady=2)
+    entries = []
+    for row, text in enumerate(("Only report ids", "Tags", "Exclude (ids or tags)")):
+        ttk.Label(selection_frame, text=text).grid(row=row, column=0, sticky="w", padx=5, pady=1)
+        entry = ttk.Entry(selection_frame, width=40)
+        entry.grid(row=row, column=1, pady=1)
+        entries.append(entry)
+    only_entry, tags_entry, exclude_entry = entries
 
     # ✅ Output Directory Selection
     ttk.Label(root, text="Output Directory", font=font).pack(pady=5)
@@ -129,6 +184,8 @@ def create_gui():
     output_entry = ttk.Entry(root, width=50)
     output_entry.pack(pady=2)
     ttk.Button(root, text="Browse", bootstyle="primary", command=browse_output).pack(pady=5)
+    resume_var = BooleanVar(value=False)
+    ttk.Checkbutton(root, text="Resume an interrupted run in this folder", variable=resume_var, bootstyle="round-toggle").pack(pady=2)
 
     # ✅ Buttons
     ttk.Button(root, text="Create Indexes", bootstyle="info", command=create_indexes).pack(pady=10)
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import baseline_migrations  # noqa: E402
+import wise_fixture  # noqa: E402
+
+
+def build_database(path):
+    """A fixture database with its setup steps applied, ready for extraction"""
+    wise_fixture.build(str(path), scale=0.2)
+    baseline_migrations.apply_setup(str(path))
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def wise_db(tmp_path_factory):
+    """A fixture database shared by the tests that only read it"""
+    return build_database(tmp_path_factory.mktemp("wise") / "wise.sqlite")
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    """A fixture database of the test's own, for the tests that change it"""
+    return build_database(tmp_path / "wise.sqlite")
@@ -0,0 +1,124 @@
+import filecmp
+import sqlite3
+
+import pytest
+
+import baseline_cache
+import baseline_extraction
+import baseline_migrations
+import baseline_processing
+
+
+SW_COUNT = "SELECT countryCode, cYear, COUNT(*) FROM SOW_SWB_SurfaceWaterBody GROUP BY countryCode, cYear"
+GW_COUNT = "SELECT countryCode, cYear, COUNT(*) FROM SOW_GWB_GroundWaterBody GROUP BY countryCode, cYear"
+
+
+@pytest.fixture
+def worker(fresh_db):
+    """Opens the worker connection of fresh_db with a result cache, like a pool worker does"""
+    opened = []
+
+    def open_connection():
+        baseline_extraction.open_worker_connection(fresh_db, result_cache=baseline_cache.DEFAULT_CAPACITY)
+        opened.append(baseline_extraction.create_connection(fresh_db))
+        return opened[-1]
+
+    yield open_connection
+    baseline_extraction.share_connection(fresh_db, None)
+    for conn in opened:
+        conn.query_cache.conn.close()
+        sqlite3.Connection.close(conn)
+
+
+def served(cursor):
+    return cursor._served is not None
+
+
+def test_select_is_stored_then_served(worker):
+    conn = worker()
+    cursor = conn.execute(SW_COUNT)
+    rows = list(cursor)
+    assert not served(cursor)
+
+    cursor = conn.execute(" ".join(SW_COUNT.split()) + " ;")
+    assert served(cursor)
+    assert list(cursor) == rows
+    assert [column[0] for column in cursor.description] == ["countryCode", "cYear", "COUNT(*)"]
+
+
+def test_parameters_are_part_of_the_key(worker):
+    conn = worker()
+    query = "SELECT COUNT(*) FROM SOW_SWB_SurfaceWaterBody WHERE countryCode = ?"
+    de = conn.execute(query, ("DE",)).fetchall()
+    cursor = conn.execute(query, ("MT",))
+    assert not served(cursor)
+    assert cursor.fetchall() != de
+    assert served(conn.execute(query, ("DE",)))
+
+
+def test_uncacheable_statements_run(worker):
+    conn = worker()
+    for _ in range(2):
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        assert not served(cursor)
+        cursor.fetchall()
+
+
+def test_results_past_the_row_cap_are_streamed_not_stored(worker, monkeypatch):
+    monkeypatch.setattr(baseline_cache, "MAX_CACHED_ROWS", 10)
+    conn = worker()
+    query = "SELECT euSurfaceWaterBodyCode FROM SOW_SWB_SurfaceWaterBody ORDER BY rowid"
+    expected = sqlite3.Connection.execute(conn, query).fetchall()
+    assert len(expected) > 10
+
+    assert list(conn.execute(query)) == expected
+    cursor = conn.execute(query)
+    assert not served(cursor)
+    assert list(cursor) == expected
+
+
+def test_changed_table_invalidates_only_its_queries(fresh_db, worker):
+    conn = worker()
+    sw, gw = conn.execute(SW_COUNT).fetchall(), conn.execute(GW_COUNT).fetchall()
+    baseline_extraction.share_connection(fresh_db, None)
+
+    source = sqlite3.connect(fresh_db)
+    source.execute("DELETE FROM SOW_SWB_SurfaceWaterBody WHERE countryCode = 'MT' AND cYear = 2016")
+    source.commit()
+    source.close()
+    baseline_migrations.apply_setup(fresh_db)
+
+    conn = worker()
+    cursor = conn.execute(SW_COUNT)
+    assert not served(cursor)
+    changed = cursor.fetchall()
+    assert ("MT", 2016) not in [row[:2] for row in changed]
+    assert [row for row in changed if row[:2] != ("MT", 2016)] == [row for row in sw if row[:2] != ("MT", 2016)]
+
+    cursor = conn.execute(GW_COUNT)
+    assert served(cursor)
+    assert cursor.fetchall() == gw
+
+
+def test_cached_run_writes_the_same_files(fresh_db, tmp_path):
+    first, second, uncached = tmp_path / "first", tmp_path / "second", tmp_path / "uncached"
+    for directory in (first, second):
+        baseline_processing.run_batch_extraction(fresh_db, ["DE", "MT"], str(directory), [2010, 2016])
+    baseline_processing.run_batch_extraction(fresh_db, ["DE", "MT"], str(uncached), [2010, 2016], result_cache=0)
+
+    conn = sqlite3.connect(baseline_cache.cache_path(fresh_db))
+    entries, hits = conn.execute("SELECT COUNT(*), SUM(hits) FROM query_cache").fetchone()
+    conn.close()
+    assert entries and hits
+
+    for directory in (second, uncached):
+        comparison = filecmp.dircmp(first, directory, ignore=["wise_run_manifest.json"])
+        assert_same_tree(comparison)
+
+
+def assert_same_tree(comparison):
+    assert not comparison.left_only and not comparison.right_only
+    _, mismatch, errors = filecmp.cmpfiles(comparison.left, comparison.right, comparison.common_files, shallow=False)
+    assert not mismatch and not errors, mismatch
+    for sub in comparison.subdirs.values():
+        assert_same_tree(sub)
@@ -0,0 +1,74 @@
+import filecmp
+import os
+
+import pytest
+
+import baseline_extraction
+import baseline_registry
+
+
+# The shared-scan and bitmap engines replace the per-report SQL functions, which
+# are kept in baseline_extraction. Both must write the very same files.
+# tests/baseline_output holds what the QE3 reports wrote before the engines, on the fixture
+# database. Their shares are still rounded one by one, so they must not change at all.
+
+BASELINE_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_output")
+
+ENGINE_REPORTS = [report for report in baseline_registry.REPORTS if report.engine is not None]
+QE3_REPORTS = [baseline_registry.REPORTS_BY_ID[id]
+               for id in ("Surface_water_bodies_QE3_assessment", "Surface_water_bodies_QE3_3_assessment")]
+
+CASES = [(["DE"], 2016), (["MT"], 2010), (["SE"], 2022), (["DE", "FR"], 2016)]
+
+
+def output_files(directory):
+    return sorted(os.listdir(directory))
+
+
+def assert_same_files(expected, actual):
+    assert output_files(actual) == output_files(expected)
+    for name in output_files(expected):
+        assert filecmp.cmp(os.path.join(expected, name), os.path.join(actual, name), shallow=False), name
+
+
+@pytest.mark.parametrize("countryCode, cYear", CASES, ids=lambda value: str(value))
+@pytest.mark.parametrize("report", ENGINE_REPORTS, ids=lambda report: report.id)
+def test_engine_matches_report_sql(wise_db, tmp_path, report, countryCode, cYear):
+    expected, actual = tmp_path / "sql", tmp_path / "engine"
+    expected.mkdir()
+    actual.mkdir()
+
+    getattr(baseline_extraction, report.id)(wise_db, countryCode, cYear, str(expected))
+    report.engine(wise_db, countryCode, cYear, str(actual), reports=[report.id])
+
+    assert output_files(expected)
+    assert_same_files(expected, actual)
+
+
+@pytest.mark.parametrize("countryCode, cYear", CASES, ids=lambda value: str(value))
+def test_qe3_reports_match_baseline_output(wise_db, tmp_path, countryCode, cYear):
+    expected = os.path.join(BASELINE_OUTPUT, f"{'-'.join(countryCode)}-{cYear}")
+    sql, engine = tmp_path / "sql", tmp_path / "engine"
+    sql.mkdir()
+    engine.mkdir()
+
+    for report in QE3_REPORTS:
+        getattr(baseline_extraction, report.id)(wise_db, countryCode, cYear, str(sql))
+    baseline_registry.QE_ENGINE(wise_db, countryCode, cYear, str(engine), reports=[report.id for report in QE3_REPORTS])
+
+    assert_same_files(expected, sql)
+    assert_same_files(expected, engine)
+
+
+@pytest.mark.parametrize("engine", list(baseline_registry.ENGINES), ids=lambda engine: engine.__name__)
+def test_engine_split_countries_matches_single_country_runs(wise_db, tmp_path, engine):
+    countries, years = ["DE", "EL", "MT"], [2010, 2016]
+    engine(wise_db, countries, years, str(tmp_path / "batch"), split_countries=True)
+
+    for country in countries:
+        for cYear in years:
+            single = tmp_path / "single" / country / str(cYear)
+            single.mkdir(parents=True)
+            engine(wise_db, [country], cYear, str(single))
+            assert output_files(single)
+            assert_same_files(single, tmp_path / "batch" / country / str(cYear))
@@ -0,0 +1,21 @@
+import glob
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob(os.path.join(ROOT, "*.py")))
+# Optional dependencies: a module needing one is only imported where it is installed
+REQUIRES = {"gui_extraction": "ttkbootstrap"}
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_module_imports_on_its_own(module):
+    if module in REQUIRES and importlib.util.find_spec(REQUIRES[module]) is None:
+        pytest.skip(f"{REQUIRES[module]} is not installed")
+    result = subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,26 @@
+import pytest
+
+import baseline_migrations
+
+
+def bump(name):
+    """SETUP_MIGRATIONS with a new version of the step `name`"""
+    return [(step, version + (step == name), target, function, depends)
+            for step, version, target, function, depends in baseline_migrations.SETUP_MIGRATIONS]
+
+
+def test_applied_setup_runs_nothing(fresh_db):
+    assert baseline_migrations.apply_setup(fresh_db) == []
+
+
+@pytest.mark.parametrize("name, rerun", [
+    ("status_cubes", ["status_cubes", "table_fingerprints"]),
+    ("denominators", ["denominators", "table_fingerprints"]),
+    ("swRBD_Europe_data", ["swRBD_Europe_data", "swRBD_Europe_data_whitespace", "table_fingerprints"]),
+    ("table_fingerprints", ["table_fingerprints"]),
+])
+def test_new_step_version_reruns_only_its_dependents(fresh_db, monkeypatch, name, rerun):
+    monkeypatch.setattr(baseline_migrations, "SETUP_MIGRATIONS", bump(name))
+
+    assert baseline_migrations.apply_setup(fresh_db) == rerun
+    assert baseline_migrations.apply_setup(fresh_db) == []
@@ -0,0 +1,48 @@
+import csv
+import sqlite3
+
+import pytest
+
+import baseline_extraction
+import baseline_registry
+
+
+QE3_FILE = "42.Surface_water_bodies_QE3_assessment2016.csv"
+# Monitoring 24/114 = 21.05%. Largest-remainder rounding over every result would give the
+# rounding unit to Missing (79/114 = 69.30%), which the report does not list, and write 21.0
+COUNTS = {"Monitoring": 24, "Grouping": 1, "Expert judgement": 10, "Missing": 79}
+
+
+@pytest.fixture
+def qe3_db(fresh_db):
+    conn = sqlite3.connect(fresh_db)
+    conn.execute("DELETE FROM SOW_SWB_QualityElement WHERE countryCode = 'DE' AND cYear = 2016 AND qeCode LIKE 'QE3-1-1%'")
+    for result, count in COUNTS.items():
+        conn.executemany(
+            "INSERT INTO SOW_SWB_QualityElement (countryCode, cYear, euRBDCode, euSurfaceWaterBodyCode, "
+            "naturalAWBHMWB, swEcologicalStatusOrPotentialValue, qeCode, qeMonitoringResults) "
+            "VALUES ('DE', 2016, 'DE1', ?, 'Natural water body', '2', 'QE3-1-1 - Transparency', ?)",
+            [(f"DESW9{result[:2]}{i:03d}", result) for i in range(count)])
+    conn.commit()
+    conn.close()
+    return fresh_db
+
+
+def transparency_rows(directory):
+    with open(directory / QE3_FILE, newline='', encoding="utf-8") as f:
+        return [row for row in csv.reader(f) if row[0] == "DE" and row[2] == "QE3-1-1 - Transparency"]
+
+
+@pytest.mark.parametrize("engine", [False, True], ids=["sql", "engine"])
+def test_qe3_shares_are_rounded_one_by_one(qe3_db, tmp_path, engine):
+    report = baseline_registry.REPORTS_BY_ID["Surface_water_bodies_QE3_assessment"]
+    if engine:
+        report.engine(qe3_db, ["DE"], 2016, str(tmp_path), reports=[report.id])
+    else:
+        baseline_extraction.Surface_water_bodies_QE3_assessment(qe3_db, ["DE"], 2016, str(tmp_path))
+
+    assert transparency_rows(tmp_path) == [
+        ["DE", "Expert judgement", "QE3-1-1 - Transparency", "10", "8.8"],
+        ["DE", "Grouping", "QE3-1-1 - Transparency", "1", "0.9"],
+        ["DE", "Monitoring", "QE3-1-1 - Transparency", "24", "21.1"],
+    ]
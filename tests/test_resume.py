@@ -0,0 +1,83 @@
+import os
+import sqlite3
+
+import baseline_processing
+
+
+QE3_FILE = "42.Surface_water_bodies_QE3_assessment2016.csv"
+SW_FILE = "1.surfaceWaterBodyNumberAndSite2016.csv"
+
+
+def add_rows(db_file, table, rows):
+    conn = sqlite3.connect(db_file)
+    for row in rows:
+        conn.execute(f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})", list(row.values()))
+    conn.commit()
+    conn.close()
+
+
+def quality_element(country, status, awb_hmwb):
+    return dict(countryCode=country, cYear=2016, euRBDCode=f"{country}1", euSurfaceWaterBodyCode=f"{country}SW99999",
+                surfaceWaterBodyCategory="RW", naturalAWBHMWB=awb_hmwb, swEcologicalStatusOrPotentialValue=status,
+                qeCode="QE3-1-9", qeMonitoringResults="Monitoring")
+
+
+def extract(db_file, directory, resume=False):
+    baseline_processing.run_csv_generation_process_multiprocessing(db_file, ["DE"], directory, [2016], resume=resume)
+
+
+def modified(directory):
+    """{file: modification time} of the report files in directory"""
+    return {name: os.stat(os.path.join(directory, name)).st_mtime_ns for name in os.listdir(directory)
+            if name.endswith(".csv")}
+
+
+def read(directory, name):
+    with open(os.path.join(directory, name), encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_resume_rebuilds_qe3_when_another_country_qualifies_a_code(fresh_db, tmp_path):
+    # DE reports QE3-1-9, but on a water body without a status: on its own, the code is not listed
+    add_rows(fresh_db, "SOW_SWB_QualityElement", [quality_element("DE", "unpopulated", "unpopulated")])
+    directory = str(tmp_path / "DE")
+    extract(fresh_db, directory)
+    assert not any("QE3-1-9" in line for line in read(directory, QE3_FILE))
+    before = modified(directory)
+
+    # Another country reports it with a status, which makes the code part of every country's QE3 report
+    add_rows(fresh_db, "SOW_SWB_QualityElement", [quality_element("XX", "2", "Natural water body")])
+    extract(fresh_db, directory, resume=True)
+
+    assert "DE,Monitoring,QE3-1-9,1,100.0" in read(directory, QE3_FILE)
+    after = modified(directory)
+    assert after[QE3_FILE] != before[QE3_FILE]
+    # The reports that read only their own countries' slices were not run again
+    assert after[SW_FILE] == before[SW_FILE]
+
+
+def test_resume_skips_changes_in_other_countries_slices(fresh_db, tmp_path):
+    directory = str(tmp_path / "DE")
+    extract(fresh_db, directory)
+    before = modified(directory)
+
+    add_rows(fresh_db, "SOW_SWB_SurfaceWaterBody", [dict(countryCode="FR", cYear=2016, euRBDCode="FR1",
+                                                         euSurfaceWaterBodyCode="FRSW99999", cArea=1.5)])
+    extract(fresh_db, directory, resume=True)
+
+    assert modified(directory) == before
+
+
+def test_resume_rebuilds_changes_in_own_slices(fresh_db, tmp_path):
+    directory = str(tmp_path / "DE")
+    extract(fresh_db, directory)
+    before = modified(directory)
+
+    add_rows(fresh_db, "SOW_SWB_SurfaceWaterBody", [dict(countryCode="DE", cYear=2016, euRBDCode="DE1",
+                                                         euSurfaceWaterBodyCode="DESW99999", cArea=1.5,
+                                                         surfaceWaterBodyCategory="LW")])
+    extract(fresh_db, directory, resume=True)
+
+    after = modified(directory)
+    assert after[SW_FILE] != before[SW_FILE]
+    assert after[QE3_FILE] == before[QE3_FILE]
@@ -0,0 +1,157 @@
+import os
+import random
+import sqlite3
+import sys
+
+
+# Synthetic WISE-WFD database for the tests.
+#
+# The tables and columns the reports read, filled with random but reproducible
+# rows (seeded) for five countries and the three reporting cycles. The values
+# include the awkward ones the real database has: NULLs, "Unpopulated", codes in
+# another case, duplicated child rows, integer and real areas, non-ASCII text.
+
+def pick(rng, values, null=0.03):
+    if rng.random() < null:
+        return None
+    return rng.choice(values)
+
+def num(rng, lo, hi, null=0.05, intp=0.15):
+    r = rng.random()
+    if r < null:
+        return None
+    if r < null + intp:
+        return rng.randint(int(lo), int(hi))
+    return round(rng.uniform(lo, hi), rng.choice([1, 2, 3, 6]))
+
+CAT = ["RW", "LW", "TW", "CW", "TeW", "Unpopulated"]
+NAT = ["Natural water body", "Heavily modified water body", "Artificial water body", "Unpopulated", "Unknown"]
+ECO = ["1", "2", "3", "4", "5", "unknown", "inapplicable", "Unpopulated", "Other"]
+CHEM = ["2", "3", "unknown", "Unpopulated"]
+CONF = ["High", "Medium", "Low", "Unknown", "Unpopulated"]
+MON = ["Missing", "Expert judgement", "Monitoring", "Grouping", "Unpopulated"]
+YN = ["Yes", "No", "Unpopulated"]
+DATES = ["Good status already achieved", "Less stringent objectives already achieved", "2016--2021", "2022--2027", "Beyond 2027", "Unknown", "Unpopulated"]
+EVO = ["noChange", "changeCode", "change", "creation", "splitting", "aggregation", "deletion"]
+GEO = ["Porous aquifers - highly productive", "Porous aquifers - moderately productive",
+       "Fissured aquifers including karst - highly productive", "Fissured aquifers including karst - moderately productive",
+       "Fractured aquifers - highly productive", "Fractured aquifers - moderately productive",
+       "Missing", "Unknown", "Insignificant aquifers - local and limited groundwater", "unpopulated"]
+GWSTAT = ["2", "3", "unknown", "Unpopulated", "missing"]
+RISK = ["Yes", "No", "Unpopulated", "Not in WFD2010", "None", "Annex 0"]
+PGROUP = ["P1 - Point sources", "P2 - Diffuse sources", "P2-7 - Diffuse - Atmospheric deposition ",
+          "P3 - Abstraction", "P4 - Hydromorphology", "P5 - Introduced species and litter",
+          "P6 - Groundwater recharge or water level", "P7 - Anthropogenic pressure - Other",
+          "P8 - Anthropogenic pressure - Unknown", "P9 - Anthropogenic pressure - Historical pollution",
+          "P0 - No significant anthropogenic pressure", "Unpopulated"]
+IMPACT = ["ACID", "CHEM", "ECOS", "HHYC", "HMOC", "LITT", "MICR", "NUTR", "ORGA", "OTHE", "SALI", "TEMP", "UNKN", "None", "Unpopulated"]
+EXGROUP = ["Article4(4)", "Article4(5)", "Article4(6)", "Article4(7)", "None", "Unpopulated"]
+EXTYPE = ["Technical feasibility", "Natural conditions", "Disproportionate costs", "None"]
+QE = ["QE1-1 - Phytoplankton", "QE1-2 - Other aquatic flora", "QE1-3 - Benthic invertebrates", "qe1-4 - Fish",
+      "QE2-1 - Hydrological regime", "QE2-2 - River continuity", "QE3-1-1 - Transparency", "QE3-1-2 - Thermal",
+      "QE3-1-3 - Oxygenation", "QE3-3 - River basin specific pollutants", "QE3-3-1 - Other", "QE4 - Other"]
+QEMON = ["Monitoring", "Grouping", "Expert judgement", "Unpopulated", "Missing"]
+
+COUNTRIES = ["DE", "FR", "EL", "SE", "MT"]
+YEARS = [2010, 2016, 2022]
+
+
+def build(path, seed=7, scale=1.0):
+    """Writes a synthetic WISE database to path; scale multiplies the number of water bodies per country"""
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    cur = conn.cursor()
+    sizes = {"DE": 900, "FR": 700, "EL": 250, "SE": 1200, "MT": 12}
+    tables = {}
+
+    def table(name, cols, rows):
+        tables.setdefault(name, (cols, []))[1].extend(rows)
+
+    for year in YEARS:
+        for cc in COUNTRIES:
+            n = int(sizes[cc] * scale)
+            rbds = [f"{cc}{i}" for i in range(1, 5)]
+            swbs = []
+            for i in range(n):
+                code = f"{cc}SW{i:05d}"
+                cat = pick(rng, CAT)
+                row = dict(countryCode=cc, cYear=year, euRBDCode=rng.choice(rbds), euSurfaceWaterBodyCode=code if rng.random() > 0.01 else None,
+                           surfaceWaterBodyCategory=cat, naturalAWBHMWB=pick(rng, NAT),
+                           swEcologicalStatusOrPotentialValue=pick(rng, ECO), swChemicalStatusValue=pick(rng, CHEM),
+                           cLength=num(rng, 0.1, 120) if cat == "RW" or rng.random() < 0.1 else None,
+                           cArea=num(rng, 0.01, 900) if cat != "RW" or rng.random() < 0.2 else None,
+                           swChemicalAssessmentConfidence=pick(rng, CONF), swChemicalMonitoringResults=pick(rng, MON),
+                           swEcologicalStatusOrPotentialExpectedGoodIn2015=pick(rng, YN),
+                           swEcologicalStatusOrPotentialExpectedAchievementDate=pick(rng, DATES),
+                           swChemicalStatusExpectedGoodIn2015=pick(rng, YN),
+                           swChemicalStatusExpectedAchievementDate=pick(rng, DATES),
+                           wiseEvolutionType=pick(rng, EVO))
+                swbs.append(row)
+            cols = list(swbs[0].keys())
+            table("SOW_SWB_SurfaceWaterBody", cols, [tuple(r[c] for c in cols) for r in swbs])
+            gwbs = []
+            for i in range(max(3, n // 4)):
+                row = dict(countryCode=cc, cYear=year, euRBDCode=rng.choice(rbds), euGroundWaterBodyCode=f"{cc}GW{i:05d}",
+                           groundWaterBodyName=f"GWB {cc} {i}" if rng.random() > 0.02 else None, cArea=num(rng, 1, 3000),
+                           gwChemicalStatusValue=pick(rng, GWSTAT), gwQuantitativeStatusValue=pick(rng, GWSTAT),
+                           gwEORiskQuantitative=pick(rng, RISK), gwAtRiskQuantitative=pick(rng, RISK),
+                           gwAssociatedProtectedArea=pick(rng, YN), gwEORiskChemical=pick(rng, RISK), gwAtRiskChemical=pick(rng, RISK),
+                           gwQuantitativeStatusExpectedGoodIn2015=pick(rng, YN), gwQuantitativeStatusExpectedAchievementDate=pick(rng, DATES),
+                           gwChemicalStatusExpectedGoodIn2015=pick(rng, YN), gwChemicalStatusExpectedAchievementDate=pick(rng, DATES),
+                           gwQuantitativeAssessmentConfidence=pick(rng, CONF), gwChemicalAssessmentConfidence=pick(rng, CONF),
+                           geologicalFormation=pick(rng, GEO))
+                gwbs.append(row)
+            cols = list(gwbs[0].keys())
+            table("SOW_GWB_GroundWaterBody", cols, [tuple(r[c] for c in cols) for r in gwbs])
+
+            def many(name, base, extra_fn, k=(0, 4), base_cols=()):
+                rows = []
+                for b in base:
+                    for _ in range(rng.randint(*k)):
+                        r = dict(countryCode=cc, cYear=year, euRBDCode=b["euRBDCode"])
+                        for bc in base_cols:
+                            r[bc] = b.get(bc)
+                        r.update(extra_fn(b))
+                        rows.append(r)
+                        if rng.random() < 0.05:
+                            rows.append(dict(r))
+                if rows:
+                    cols = list(rows[0].keys())
+                    table(name, cols, [tuple(r[c] for c in cols) for r in rows])
+
+            swcols = ("euSurfaceWaterBodyCode", "surfaceWaterBodyCategory", "naturalAWBHMWB", "swEcologicalStatusOrPotentialValue", "swChemicalStatusValue", "cArea")
+            many("SOW_SWB_SWE_swEcologicalExemptionPressure", swbs, lambda b: dict(swEcologicalExemptionTypeGroup=pick(rng, EXGROUP), swEcologicalExemptionType=pick(rng, EXTYPE), swEcologicalExemptionPressureGroup=pick(rng, PGROUP), swEcologicalExemptionPressure=pick(rng, ["P1-1", "P2-2", "P4-3", "None"])), (0, 2), swcols)
+            many("SOW_SWB_SWEcologicalExemptionType", swbs, lambda b: dict(swEcologicalExemptionTypeGroup=pick(rng, EXGROUP), swEcologicalExemptionType=pick(rng, EXTYPE)), (0, 2), swcols)
+            many("SOW_SWB_QE_qeEcologicalExemptionType", swbs, lambda b: dict(qeEcologicalExemptionTypeGroup=pick(rng, EXGROUP), qeEcologicalExemptionType=pick(rng, EXTYPE)), (0, 2), swcols)
+            many("SOW_SWB_SWP_SWChemicalExemptionType", swbs, lambda b: dict(swChemicalExemptionTypeGroup=pick(rng, EXGROUP), swChemicalExemptionType=pick(rng, EXTYPE)), (0, 2), swcols)
+            many("SOW_SWB_FailingRBSP", swbs, lambda b: dict(swFailingRBSP=pick(rng, ["CAS_7440-50-8", "CAS_7440-66-6", "CAS_14797-55-8", "None"])), (0, 2), swcols)
+            many("SOW_SWB_FailingRBSPOther", swbs, lambda b: dict(swFailingRBSP=pick(rng, ["EEA_3-01-9", "Other"]), swFailingRBSPOther=pick(rng, ["Zinc", "Copper", "Ammonium", "Phosphate"])), (0, 1), swcols)
+            many("SOW_SWB_SWB_swSignificantImpactType", swbs, lambda b: dict(swSignificantImpactType=pick(rng, IMPACT)), (1, 6), swcols)
+            many("SOW_SWB_SWB_swSignificantPressureType", swbs, lambda b: dict(swSignificantPressureTypeGroup=pick(rng, PGROUP), swSignificantPressureType=pick(rng, ["1.1 - Urban waste water", "2.2 - Agricultural", "4.1.1 - Flood protection", "None"])), (1, 5), swcols)
+            many("SOW_SWB_swSignificantImpactOther", swbs, lambda b: dict(swSignificantImpactOther=pick(rng, ["Urban run-off", "Adverse effects on ecological indices", "Hydrological alteration", "Sediment"])), (0, 1), swcols)
+            many("SOW_SWB_swSignificantPressureOther", swbs, lambda b: dict(swSignificantPressureOther=pick(rng, ["Fish farming", "Peat extraction", "Navigation", "Ūkis"])), (0, 1), swcols)
+            many("SOW_SWB_QualityElement", swbs, lambda b: dict(qeCode=pick(rng, QE), qeMonitoringResults=pick(rng, QEMON)), (1, 8), swcols)
+            gwcols = ("euGroundWaterBodyCode", "cArea", "gwChemicalStatusValue", "gwQuantitativeStatusValue", "gwAtRiskChemical")
+            many("SOW_GWB_GWP_GWChemicalExemptionType", gwbs, lambda b: dict(gwChemicalExemptionTypeGroup=pick(rng, EXGROUP), gwChemicalExemptionType=pick(rng, EXTYPE)), (0, 2), gwcols)
+            many("SOW_GWB_gwQuantitativeExemptionPressure", gwbs, lambda b: dict(gwQuantitativeExemptionTypeGroup=pick(rng, EXGROUP), gwQuantitativeExemptionType=pick(rng, EXTYPE), gwQuantitativeExemptionPressureGroup=pick(rng, PGROUP), gwQuantitativeExemptionPressure=pick(rng, ["P3-1", "P6-1", "None"])), (0, 2), gwcols)
+            many("SOW_GWB_GWP_GWC_gwChemicalExemptionPressure", gwbs, lambda b: dict(gwChemicalExemptionTypeGroup=pick(rng, EXGROUP), gwChemicalExemptionType=pick(rng, EXTYPE), gwChemicalExemptionPressureGroup=pick(rng, PGROUP), gwChemicalExemptionPressure=pick(rng, ["P1-1", "P2-1", "None"])), (0, 2), gwcols)
+            many("SOW_GWB_gwQuantitativeReasonsForFailure", gwbs, lambda b: dict(gwQuantitativeReasonsForFailure=pick(rng, ["Good status already achieved", "Water balance / Lowering water table", "Saline or other intrusion", "Dependent terrestrial ecosystems", "Associated surface waters", "Unpopulated"])), (0, 3), gwcols)
+            many("SOW_GWB_gwChemicalReasonsForFailure", gwbs, lambda b: dict(gwChemicalReasonsForFailure=pick(rng, ["Drinking water protected area", "General assessment", "Saline intrusion"])), (0, 3), gwcols)
+            many("SOW_GWB_gwSignificantImpactType", gwbs, lambda b: dict(gwSignificantImpactType=pick(rng, IMPACT)), (1, 4), gwcols)
+            many("SOW_GWB_gwSignificantImpactOther", gwbs, lambda b: dict(gwSignificantImpactOther=pick(rng, ["Dewatering", "Mine drainage", "Unpopulated"])), (0, 1), gwcols)
+            many("SOW_GWB_gwSignificantPressureOther", gwbs, lambda b: dict(gwSignificantPressureOther=pick(rng, ["Quarry", "Landfill", "Unpopulated"])), (0, 1), gwcols)
+            many("SOW_GWB_gwSignificantPressureType", gwbs, lambda b: dict(gwSignificantPressureTypeGroup=pick(rng, PGROUP), gwSignificantPressureType=pick(rng, ["1.1 - Urban waste water", "2.2 - Agricultural", "3.1 - Abstraction", "Unpopulated"])), (1, 4), gwcols)
+            many("SOW_GWB_gwPollutant", gwbs, lambda b: dict(gwPollutantCausingFailure=pick(rng, ["Yes", "No"]), gwPollutantCode=pick(rng, ["CAS_14797-55-8", "CAS_7664-41-7", "EEA_33-57-6", "CAS_1912-24-9"])), (0, 3), gwcols)
+            many("SOW_GWB_gwPollutantOther", gwbs, lambda b: dict(gwPollutantCausingFailure=pick(rng, ["Yes", "No"]), gwPollutantOther=pick(rng, ["Boron", "Fluoride", "Manganese"])), (0, 2), gwcols)
+
+    for name, (cols, rows) in tables.items():
+        cur.execute(f"CREATE TABLE {name} ({', '.join(cols)})")
+        cur.executemany(f"INSERT INTO {name} VALUES ({', '.join('?' * len(cols))})", rows)
+    conn.commit()
+    conn.close()
+
+# Writes the fixture to a file: python tests/wise_fixture.py wise.sqlite [scale]
+if __name__ == "__main__":
+    build(sys.argv[1], scale=float(sys.argv[2]) if len(sys.argv) > 2 else 1.0)